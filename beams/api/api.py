@@ -1,8 +1,9 @@
 import frappe
+import hashlib
 import json
 import re
 from frappe import _
-from frappe.utils import getdate, now_datetime, time_diff
+from frappe.utils import cint, getdate, now_datetime, time_diff
 from hrms.api.roster import get_shifts
 
 
@@ -94,35 +95,122 @@ def get_region_list(start=0, page_length=20, region=None):
 		return response('No Regions found', region_list, True, 200)
 
 @frappe.whitelist()
-def get_agency_list(start=0, page_length=20, agency_name=None):
+def get_agency_list(start=0, page_length=20, agency_name=None, after=None, modified_since=None, cursor=0):
 	'''
 		API to get List of Agency
+		args:
+			cursor : 1 to start a cursor pagination walk, pages are then ordered by agency_id
+			after : agency_id of the last agency of the previous page (the `next_cursor` returned), for cursor pagination
+			modified_since : only agencies changed (or whose address changed) since this datetime
 	'''
-	agency_fields = ['name as agency_id', 'customer_name as agency_name', 'region', 'gstin', 'pan as pan_no', 'default_currency as currency', 'is_edited']
-	filters = { 'is_agent':1 }
-	if agency_name:
-		filters = { 'is_agent':1, 'customer_name':['like', '%{0}%'.format(agency_name)] }
-	agency_list = frappe.db.get_all('Customer', filters=filters, fields=agency_fields, start=start, page_length=page_length)
+	agency_list = get_customer_page(1, 'agency', start, page_length, agency_name, after, modified_since, cursor)
+	if agency_list is None:
+		return
 	if agency_list:
-		return response('Data get successfully', get_customer_address(agency_list, 1), True, 200)
+		return response('Data get successfully', agency_list, True, 200)
 	else:
 		return response('No Agencies found', agency_list, True, 200)
 
 @frappe.whitelist()
-def get_client_list(start=0, page_length=20, client_name=None):
+def get_client_list(start=0, page_length=20, client_name=None, after=None, modified_since=None, cursor=0):
 	'''
 		API to get List of Client
+		args:
+			cursor : 1 to start a cursor pagination walk, pages are then ordered by client_id
+			after : client_id of the last client of the previous page (the `next_cursor` returned), for cursor pagination
+			modified_since : only clients changed (or whose address changed) since this datetime
 	'''
-	client_fields = ['name as client_id', 'customer_name as client_name', 'region', 'gstin', 'pan as pan_no', 'default_currency as currency', 'is_edited']
-	filters = { 'is_agent':0 }
-	if client_name:
-		filters = { 'is_agent':0, 'customer_name':['like', '%{0}%'.format(client_name)] }
-	client_list = frappe.db.get_all('Customer', filters=filters, fields=client_fields, start=start, page_length=page_length)
+	client_list = get_customer_page(0, 'client', start, page_length, client_name, after, modified_since, cursor)
+	if client_list is None:
+		return
 	if client_list:
-		return response('Data get successfully', get_customer_address(client_list), True, 200)
+		return response('Data get successfully', client_list, True, 200)
 	else:
 		return response('No Clients found', client_list, True, 200)
 
+def get_customer_page(is_agent, prefix, start=0, page_length=20, customer_name=None, after=None, modified_since=None, cursor=0):
+	'''
+		Method fetches a page of agencies or clients along with their address in one query
+		Args:
+			is_agent (int): 1 for agencies, 0 for clients
+			prefix (str): 'agency' or 'client', used for the id and name keys
+			after (str, optional): cursor, the id of the last customer of the previous page
+			modified_since (str, optional): only customers or addresses modified after this datetime
+			cursor (int, optional): 1 to fetch the first page of a cursor walk
+			With `cursor`, `after` or `modified_since`, pages are ordered by id and the next page starts after `next_cursor`.
+		Returns:
+			list of dicts, or None when the page matches the ETag sent by the client (304 Not Modified).
+			The ETag is sent as the ETag header and in the body; in cursor mode `next_cursor` is set on the response.
+	'''
+	conditions = ['c.is_agent = %(is_agent)s']
+	values = {'is_agent': is_agent, 'page_length': int(page_length), 'start': int(start)}
+	if customer_name:
+		conditions.append('c.customer_name LIKE %(customer_name)s')
+		values['customer_name'] = '%{0}%'.format(customer_name)
+	if after:
+		conditions.append('c.name > %(after)s')
+		values['after'] = after
+	if modified_since:
+		conditions.append('(c.modified > %(modified_since)s OR a.modified > %(modified_since)s)')
+		values['modified_since'] = modified_since
+
+	# Keyset pagination orders by id, offset pagination keeps the default latest first order
+	keyset = bool(cint(cursor) or after or modified_since)
+	if keyset:
+		order_by = 'c.name ASC'
+		limit = 'LIMIT %(page_length)s'
+	else:
+		order_by = 'c.modified DESC'
+		limit = 'LIMIT %(start)s, %(page_length)s'
+
+	customer_list = frappe.db.sql('''
+		SELECT
+			c.name AS {prefix}_id,
+			c.customer_name AS {prefix}_name,
+			c.region,
+			c.gstin,
+			c.pan AS pan_no,
+			c.default_currency AS currency,
+			c.is_edited,
+			IFNULL(a.address_line1, '') AS address_line_1,
+			IFNULL(a.address_line2, '') AS address_line_2,
+			IFNULL(a.city, '') AS address_line_3,
+			IFNULL(a.state, '') AS address_line_4,
+			IFNULL(a.pincode, '') AS pincode
+		FROM
+			`tabCustomer` c
+			LEFT JOIN `tabAddress` a ON a.name = (
+				SELECT dl.parent
+				FROM `tabDynamic Link` dl
+				WHERE dl.parenttype = 'Address'
+					AND dl.link_doctype = 'Customer'
+					AND dl.link_name = c.name
+				ORDER BY dl.modified DESC
+				LIMIT 1
+			)
+		WHERE
+			{conditions}
+		ORDER BY {order_by}
+		{limit}
+	'''.format(prefix=prefix, conditions=' AND '.join(conditions), order_by=order_by, limit=limit), values, as_dict=True)
+
+	etag = '"{0}"'.format(hashlib.md5(frappe.as_json(customer_list).encode()).hexdigest())
+	frappe.local.response['etag'] = etag
+	frappe.flags.response_etag = etag
+	if keyset:
+		frappe.local.response['next_cursor'] = customer_list[-1]['{0}_id'.format(prefix)] if len(customer_list) == int(page_length) else None
+	if frappe.request and frappe.request.headers.get('If-None-Match') == etag:
+		frappe.local.response['http_status_code'] = 304
+		return None
+	return customer_list
+
+def set_etag_header(response=None, request=None):
+	'''
+		after_request hook sending the ETag of a listing API as a response header, for `If-None-Match` clients
+	'''
+	if response is not None and frappe.flags.get('response_etag'):
+		response.headers['ETag'] = frappe.flags.response_etag
+
 @frappe.whitelist()
 def get_customer_address(customer_list, agency=0):
 	'''
@@ -133,18 +221,38 @@ def get_customer_address(customer_list, agency=0):
 		Returns:
 			list of dicts: customer list of dicts with address keys
 	'''
+	id_key = 'client_id' if not agency else 'agency_id'
+	customers = [customer.get(id_key) for customer in customer_list]
+	addresses = {}
+	if customers:
+		# Ordered by modified so that the latest address of a customer is kept
+		for address in frappe.db.sql('''
+			SELECT
+				dl.link_name AS customer,
+				a.address_line1 AS address_line_1,
+				a.address_line2 AS address_line_2,
+				a.city AS address_line_3,
+				a.state AS address_line_4,
+				a.pincode
+			FROM
+				`tabDynamic Link` dl
+				INNER JOIN `tabAddress` a ON a.name = dl.parent
+			WHERE
+				dl.parenttype = 'Address'
+				AND dl.link_doctype = 'Customer'
+				AND dl.link_name IN %(customers)s
+			ORDER BY dl.modified ASC
+		''', {'customers': customers}, as_dict=True):
+			addresses[address.customer] = address
+
 	for customer in customer_list:
-		dynamic_link = frappe.db.exists('Dynamic Link', { 'parenttype':'Address', 'link_doctype':'Customer', 'link_name':customer.get('client_id') if not agency else customer.get('agency_id')})
-		address = "" if not dynamic_link else frappe.db.get_value('Dynamic Link', dynamic_link, 'parent')
-		address_data = {
+		address_data = addresses.get(customer.get(id_key)) or {
 			"address_line_1": "",
 			"address_line_2": "",
 			"address_line_3": "",
 			"address_line_4": "",
 			"pincode": ""
 		}
-		if address:
-			address_data = frappe.db.get_all('Address', filters={ 'name':address }, fields=['address_line1 as address_line_1', 'address_line2 as address_line_2', 'city as address_line_3', 'state as address_line_4', 'pincode'])[0]
 		customer["address_line_1"] = address_data.get('address_line_1')
 		customer["address_line_2"] = address_data.get('address_line_2')
 		customer["address_line_3"] = address_data.get('address_line_3')
@@ -235,90 +343,214 @@ def create_release_order():
 		if not albatross_service_item:
 			return response('`albatross_service_item` is not configured in Albatross Settings', {}, False, 400)
 
-		if not input_data.get('bill_to'):
-			return response('`bill_to` is reuqired to create Release Order', {}, False, 400)
-		else:
-			if not input_data.get('bill_to') in ['A', 'C']:
-				return response('`bill_to` should be either `A` or `C`', {}, False, 400)
+		error = validate_release_order(input_data, get_release_order_masters([input_data]))
+		if error:
+			return response(error[0], {}, False, error[1])
 
-		# Checking Mandatory fields
-		if not input_data.get('client_id'):
-			return response('`client_id` is reuqired to create Release Order', {}, False, 400)
-		else:
-			if not frappe.db.exists('Customer', input_data.get('client_id')):
-				return response('Client : `{0}` does not exists'.format(input_data.get('client_id')), {}, False, 404)
+		# Creating Release Order
+		ro_doc = make_release_order(input_data, albatross_service_item)
+		frappe.clear_messages()
+		return response('Created Release Order Successfully', ro_doc.as_dict(), True, 201)
+
+	except (frappe.DuplicateEntryError, frappe.UniqueValidationError):
+		frappe.db.rollback()
+		return response('Release Order `{0}` already exists'.format(input_data.get('ror_no')), {}, False, 409)
+
+	except frappe.exceptions.CharacterLengthExceededError as e:
+		frappe.log_error("Character Length Exceeded", "Error in Release Order creation: " + str(e)[:120])
+		return response('Character Length Exceeded in Error Log', {}, False, 400)
+
+	except Exception as exception:
+		frappe.log_error(frappe.get_traceback(), "Release Order Creation Error")
+		clean_exception_message = strip_html_tags(str(exception))
+		return response(f"An error occurred: {clean_exception_message}", {}, False, 400)
 
-		if input_data.get('bill_to') == 'A':
-			if not input_data.get('agency_id'):
-				return response('`agency_id` is reuqired to create Release Order', {}, False, 400)
+RELEASE_ORDER_CHUNK_SIZE = 100
+RELEASE_ORDER_MASTERS = {
+	'Customer': ['client_id', 'agency_id'],
+	'Employee': ['executive_id'],
+	'Region': ['region'],
+	'Currency': ['currency']
+}
+
+@frappe.whitelist()
+def create_release_orders(release_orders=None):
+	'''
+		API to create Release Orders in bulk
+		args:
+			release_orders : JSON array of RO data, each in the format accepted by `create_release_order`
+		Returns a status per RO, in the order received:
+			queued : validated and queued for creation
+			exists : a Release Order with the same `ror_no` already exists (or repeats in the batch)
+			error : validation failed, with the message
+		The queued ROs are created in background jobs; `get_quotation_from_ro_id` returns them once created.
+	'''
+	try:
+		release_orders = release_orders or frappe.form_dict.get('release_orders')
+		if isinstance(release_orders, str):
+			release_orders = json.loads(release_orders)
+		if not isinstance(release_orders, list) or not release_orders:
+			return response('`release_orders` should be a non-empty list', {}, False, 400)
+
+		albatross_service_item = frappe.db.get_single_value('Albatross Settings', 'albatross_service_item')
+		if not albatross_service_item:
+			return response('`albatross_service_item` is not configured in Albatross Settings', {}, False, 400)
+
+		release_orders = [frappe._dict(release_order) for release_order in release_orders]
+		masters = get_release_order_masters(release_orders)
+		existing_ros = get_existing_release_orders([release_order.get('ror_no') for release_order in release_orders])
+
+		status_report, queue = [], []
+		for release_order in release_orders:
+			ror_no = release_order.get('ror_no')
+			error = validate_release_order(release_order, masters)
+			if error:
+				status_report.append({'ror_no': ror_no, 'status': 'error', 'message': error[0]})
+			elif ror_no in existing_ros:
+				status_report.append({'ror_no': ror_no, 'status': 'exists', 'quotation': existing_ros[ror_no]})
 			else:
-				if not frappe.db.exists('Customer', input_data.get('agency_id')):
-					return response('Agency : `{0}` does not exists'.format(input_data.get('agency_id')), {}, False, 404)
+				existing_ros[ror_no] = None
+				queue.append(release_order)
+				status_report.append({'ror_no': ror_no, 'status': 'queued'})
+
+		for start in range(0, len(queue), RELEASE_ORDER_CHUNK_SIZE):
+			frappe.enqueue(
+				insert_release_orders,
+				queue='long',
+				release_orders=queue[start:start + RELEASE_ORDER_CHUNK_SIZE],
+				albatross_service_item=albatross_service_item
+			)
+		return response('Release Orders queued Successfully', status_report, True, 202)
 
-		if not input_data.get('ror_no'):
-			return response('`ror_no` is reuqired to create Release Order', {}, False, 400)
+	except Exception as exception:
+		frappe.log_error(frappe.get_traceback(), "Release Order Creation Error")
+		clean_exception_message = strip_html_tags(str(exception))
+		return response(f"An error occurred: {clean_exception_message}", {}, False, 400)
 
-		if not input_data.get('ror_date'):
-			return response('`ror_date` is reuqired to create Release Order', {}, False, 400)
+def insert_release_orders(release_orders, albatross_service_item):
+	'''
+		Background job creating a chunk of validated Release Orders, skipping the ones created in the meantime.
+		Each RO is checked right before its insert, and the unique `albatross_ro_id` rejects one created concurrently.
+	'''
+	for release_order in release_orders:
+		if frappe.db.exists('Quotation', {'albatross_ro_id': release_order.get('ror_no')}):
+			continue
+		try:
+			make_release_order(frappe._dict(release_order), albatross_service_item)
+			frappe.db.commit()
+		except (frappe.DuplicateEntryError, frappe.UniqueValidationError):
+			# Created by a concurrent job or request
+			frappe.db.rollback()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(), "Release Order Creation Error: {0}".format(release_order.get('ror_no')))
+
+def get_release_order_masters(release_orders):
+	'''
+		Method returns the existing masters referenced by the Release Orders, loaded with one query per doctype
+	'''
+	masters = {}
+	for doctype, fields in RELEASE_ORDER_MASTERS.items():
+		names = list({release_order.get(field) for release_order in release_orders for field in fields if release_order.get(field)})
+		masters[doctype] = set(frappe.get_all(doctype, filters={'name': ['in', names]}, pluck='name')) if names else set()
+	return masters
 
-		if not input_data.get('ro_date'):
-			return response('`ror_date` is reuqired to create Release Order', {}, False, 400)
+def get_existing_release_orders(ror_nos):
+	'''
+		Method returns the Quotations already created for the given `ror_no`s
+	'''
+	ror_nos = [ror_no for ror_no in ror_nos if ror_no]
+	if not ror_nos:
+		return {}
+	return dict(frappe.get_all(
+		'Quotation',
+		filters={'albatross_ro_id': ['in', ror_nos]},
+		fields=['albatross_ro_id', 'name'],
+		as_list=True
+	))
+
+def validate_release_order(input_data, masters):
+	'''
+		Method validates the RO data against the existing masters
+		Returns a tuple of the error message and the status code, or None if valid
+	'''
+	if not input_data.get('bill_to'):
+		return ('`bill_to` is reuqired to create Release Order', 400)
+	else:
+		if not input_data.get('bill_to') in ['A', 'C']:
+			return ('`bill_to` should be either `A` or `C`', 400)
 
-		if not input_data.get('option'):
-			return response('`option` is reuqired to create Release Order', {}, False, 400)
+	# Checking Mandatory fields
+	if not input_data.get('client_id'):
+		return ('`client_id` is reuqired to create Release Order', 400)
+	else:
+		if not input_data.get('client_id') in masters['Customer']:
+			return ('Client : `{0}` does not exists'.format(input_data.get('client_id')), 404)
 
-		if input_data.get('executive_id') and not frappe.db.exists('Employee', input_data.get('executive_id')):
-			return response('Employee : `{0}` does not exists'.format(input_data.get('executive_id')), {}, False, 400)
+	if input_data.get('bill_to') == 'A':
+		if not input_data.get('agency_id'):
+			return ('`agency_id` is reuqired to create Release Order', 400)
+		else:
+			if not input_data.get('agency_id') in masters['Customer']:
+				return ('Agency : `{0}` does not exists'.format(input_data.get('agency_id')), 404)
 
-		if not input_data.get('region_revenue_percentage'):
-			return response('`region_revenue_percentage` is reuqired to create Release Order', {}, False, 400)
+	if not input_data.get('ror_no'):
+		return ('`ror_no` is reuqired to create Release Order', 400)
 
-		if input_data.get('region') and not frappe.db.exists('Region', input_data.get('region')):
-			return response('Region : `{0}` does not exists'.format(input_data.get('region')), {}, False, 400)
+	if not input_data.get('ror_date'):
+		return ('`ror_date` is reuqired to create Release Order', 400)
 
-		if input_data.get('currency') and not frappe.db.exists('Currency', input_data.get('currency')):
-			return response('Currency : `{0}` does not exists'.format(input_data.get('currency')), {}, False, 400)
+	if not input_data.get('ro_date'):
+		return ('`ror_date` is reuqired to create Release Order', 400)
 
-		# Creating Release Order
-		ro_doc = frappe.new_doc('Quotation')
-		ro_doc.transaction_date = getdate(input_data.get('ror_date'))
-		ro_doc.quotation_to = 'Customer'
-		if input_data.get('bill_to') == 'A':
-			ro_doc.party_name = input_data.get('agency_id')
-			ro_doc.actual_customer = input_data.get('client_id')
-		elif input_data.get('bill_to') == 'C':
-			ro_doc.party_name = input_data.get('client_id')
-		ro_doc.region = input_data.get('region')
-		ro_doc.executive = input_data.get('executive_id') or ''
-		ro_doc.executive_name = input_data.get('executive_name') or ''
-		ro_doc.albatross_ro_id = input_data.get('ror_no') or ''
-		ro_doc.ro_no = input_data.get('ro_no') or ''
-		ro_doc.ro_date = getdate(input_data.get('ro_date'))
-		ro_doc.product_name = input_data.get('product_name') or ''
-		ro_doc.program_name = input_data.get('program_name') or ''
-		ro_doc.ro_option = input_data.get('option') or ''
-		ro_doc.no_of_eps = input_data.get('no_of_eps') or 0
-		ro_doc.commission_per = input_data.get('commission_per') or 0
-		ro_doc.fct_total = input_data.get('fct_total') or 0
-		ro_doc.region_revenue_percentage = input_data.get('region_revenue_percentage') or 0
-		ro_item_row = ro_doc.append('items')
-		ro_item_row.qty = 1
-		ro_item_row.item_code = albatross_service_item
-		ro_item_row.rate = float(input_data.get('amount') or 0)
-		ro_item_row.base_rate = float(input_data.get('amount') or 0)
-		ro_doc.ignore_mandatory = True
-		ro_doc.save(ignore_permissions=True)
-		frappe.clear_messages()
-		return response('Created Release Order Successfully', ro_doc.as_dict(), True, 201)
+	if not input_data.get('option'):
+		return ('`option` is reuqired to create Release Order', 400)
 
-	except frappe.exceptions.CharacterLengthExceededError as e:
-		frappe.log_error("Character Length Exceeded", "Error in Release Order creation: " + str(e)[:120])
-		return response('Character Length Exceeded in Error Log', {}, False, 400)
+	if input_data.get('executive_id') and not input_data.get('executive_id') in masters['Employee']:
+		return ('Employee : `{0}` does not exists'.format(input_data.get('executive_id')), 400)
 
-	except Exception as exception:
-		frappe.log_error(frappe.get_traceback(), "Release Order Creation Error")
-		clean_exception_message = strip_html_tags(str(exception))
-		return response(f"An error occurred: {clean_exception_message}", {}, False, 400)
+	if not input_data.get('region_revenue_percentage'):
+		return ('`region_revenue_percentage` is reuqired to create Release Order', 400)
+
+	if input_data.get('region') and not input_data.get('region') in masters['Region']:
+		return ('Region : `{0}` does not exists'.format(input_data.get('region')), 400)
+
+	if input_data.get('currency') and not input_data.get('currency') in masters['Currency']:
+		return ('Currency : `{0}` does not exists'.format(input_data.get('currency')), 400)
+
+def make_release_order(input_data, albatross_service_item):
+	'''
+		Method creates the Release Order (Quotation) from validated RO data
+	'''
+	ro_doc = frappe.new_doc('Quotation')
+	ro_doc.transaction_date = getdate(input_data.get('ror_date'))
+	ro_doc.quotation_to = 'Customer'
+	if input_data.get('bill_to') == 'A':
+		ro_doc.party_name = input_data.get('agency_id')
+		ro_doc.actual_customer = input_data.get('client_id')
+	elif input_data.get('bill_to') == 'C':
+		ro_doc.party_name = input_data.get('client_id')
+	ro_doc.region = input_data.get('region')
+	ro_doc.executive = input_data.get('executive_id') or ''
+	ro_doc.executive_name = input_data.get('executive_name') or ''
+	ro_doc.albatross_ro_id = input_data.get('ror_no') or None
+	ro_doc.ro_no = input_data.get('ro_no') or ''
+	ro_doc.ro_date = getdate(input_data.get('ro_date'))
+	ro_doc.product_name = input_data.get('product_name') or ''
+	ro_doc.program_name = input_data.get('program_name') or ''
+	ro_doc.ro_option = input_data.get('option') or ''
+	ro_doc.no_of_eps = input_data.get('no_of_eps') or 0
+	ro_doc.commission_per = input_data.get('commission_per') or 0
+	ro_doc.fct_total = input_data.get('fct_total') or 0
+	ro_doc.region_revenue_percentage = input_data.get('region_revenue_percentage') or 0
+	ro_item_row = ro_doc.append('items')
+	ro_item_row.qty = 1
+	ro_item_row.item_code = albatross_service_item
+	ro_item_row.rate = float(input_data.get('amount') or 0)
+	ro_item_row.base_rate = float(input_data.get('amount') or 0)
+	ro_doc.ignore_mandatory = True
+	ro_doc.save(ignore_permissions=True)
+	return ro_doc
 
 @frappe.whitelist()
 def create_sales_order():
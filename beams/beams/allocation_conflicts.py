@@ -0,0 +1,192 @@
+# Copyright (c) 2026, efeone and contributors
+# For license information, please see license.txt
+
+import random
+import time
+from bisect import bisect_right
+
+import frappe
+
+# Child tables holding resource allocations, by resource type
+ALLOCATION_SOURCES = {
+	"employee": frappe._dict(
+		doctype="Allocated Manpower Detail",
+		resource_field="employee",
+		from_field="assigned_from",
+		to_field="assigned_to",
+	),
+	"substitute": frappe._dict(
+		doctype="Substitution Bill Date",
+		parent_doctype="Substitute Booking",
+		resource_field="substituting_for",
+		resource_on_parent=True,
+		from_field="date",
+		to_field="date",
+	),
+}
+
+
+class IntervalIndex:
+	'''
+		In-memory interval index keyed by resource.
+		The intervals of each resource are sorted by start with a running maximum of their ends,
+		so the intervals overlapping [from, to] are found with a bisect and a scan of the candidates only.
+	'''
+	def __init__(self, intervals=None):
+		self.resources = {}
+		for resource, start, end, data in intervals or []:
+			self.resources.setdefault(resource, []).append((start, end, data))
+
+		self.index = {}
+		for resource, resource_intervals in self.resources.items():
+			resource_intervals.sort(key=lambda interval: interval[0])
+			max_ends, max_end = [], None
+			for start, end, data in resource_intervals:
+				max_end = end if max_end is None or end > max_end else max_end
+				max_ends.append(max_end)
+			self.index[resource] = ([interval[0] for interval in resource_intervals], max_ends)
+
+	def get_overlaps(self, resource, from_date, to_date):
+		'''
+			Returns the data of the intervals of a resource overlapping [from_date, to_date], ordered by start
+		'''
+		if resource not in self.index:
+			return []
+		starts, max_ends = self.index[resource]
+		intervals = self.resources[resource]
+
+		overlaps = []
+		position = bisect_right(starts, to_date) - 1
+		while position >= 0 and max_ends[position] >= from_date:
+			if intervals[position][1] >= from_date:
+				overlaps.append(intervals[position][2])
+			position -= 1
+		overlaps.reverse()
+		return overlaps
+
+	def get_first_overlap(self, resource, from_date, to_date):
+		overlaps = self.get_overlaps(resource, from_date, to_date)
+		return overlaps[0] if overlaps else None
+
+
+def get_allocation_index(resource_type, resources, from_date, to_date, exclude_parent=None):
+	'''
+		Loads the allocations of a batch of resources overlapping [from_date, to_date] with one range-bounded
+		query, excluding the allocations of `exclude_parent`, and returns them as an IntervalIndex.
+		The data of each interval holds the parent, the resource and the allocation's from and to dates.
+	'''
+	resources = [resource for resource in set(resources) if resource]
+	if not resources or not from_date or not to_date:
+		return IntervalIndex()
+
+	source = ALLOCATION_SOURCES[resource_type]
+	resource_column = "parent_doc.`{0}`".format(source.resource_field) if source.resource_on_parent else "child.`{0}`".format(source.resource_field)
+	parent_join = "INNER JOIN `tab{0}` parent_doc ON parent_doc.name = child.parent".format(source.parent_doctype) if source.parent_doctype else ""
+	conditions = ""
+	if source.parent_doctype:
+		conditions += " AND child.parenttype = %(parent_doctype)s"
+	if exclude_parent:
+		conditions += " AND child.parent != %(exclude_parent)s"
+
+	allocations = frappe.db.sql("""
+		SELECT
+			child.parent,
+			{resource_column} AS resource,
+			child.`{from_field}` AS from_date,
+			child.`{to_field}` AS to_date
+		FROM
+			`tab{doctype}` child
+			{parent_join}
+		WHERE
+			{resource_column} IN %(resources)s
+			AND child.`{from_field}` <= %(to_date)s
+			AND child.`{to_field}` >= %(from_date)s
+			{conditions}
+	""".format(
+		resource_column=resource_column,
+		from_field=source.from_field,
+		to_field=source.to_field,
+		doctype=source.doctype,
+		parent_join=parent_join,
+		conditions=conditions,
+	), {
+		"resources": resources,
+		"from_date": from_date,
+		"to_date": to_date,
+		"parent_doctype": source.parent_doctype,
+		"exclude_parent": exclude_parent,
+	}, as_dict=True)
+
+	return IntervalIndex(
+		(allocation.resource, allocation.from_date, allocation.to_date, allocation) for allocation in allocations
+	)
+
+
+def get_overlapping_rows(rows, resource_field, from_field, to_field):
+	'''
+		Checks the rows of a document against each other.
+		Returns the first (row, earlier_row) pair of the same resource with overlapping periods, in row order,
+		or None. Rows without a resource or a period are ignored.
+	'''
+	rows = [
+		row for row in rows
+		if row.get(resource_field) and row.get(from_field) and row.get(to_field)
+	]
+	index = IntervalIndex(
+		(row.get(resource_field), row.get(from_field), row.get(to_field), position) for position, row in enumerate(rows)
+	)
+	conflicts = []
+	for position, row in enumerate(rows):
+		earlier = [
+			overlap for overlap in index.get_overlaps(row.get(resource_field), row.get(from_field), row.get(to_field))
+			if overlap < position
+		]
+		if earlier:
+			conflicts.append((position, earlier[0]))
+
+	if not conflicts:
+		return None
+	position, earlier = min(conflicts)
+	return rows[position], rows[earlier]
+
+
+def benchmark_interval_index(rows=100000, resources=2000, queries=10000, seed=42):
+	'''
+		Compares the IntervalIndex with the nested loop scan it replaces on synthetic allocation rows.
+		Run with: bench execute beams.beams.allocation_conflicts.benchmark_interval_index
+	'''
+	generator = random.Random(seed)
+	intervals = []
+	for row in range(rows):
+		start = generator.randint(0, 365 * 24)
+		intervals.append(("R{0}".format(generator.randrange(resources)), start, start + generator.randint(1, 72), row))
+	checks = []
+	for query in range(queries):
+		start = generator.randint(0, 365 * 24)
+		checks.append(("R{0}".format(generator.randrange(resources)), start, start + generator.randint(1, 72)))
+
+	started = time.monotonic()
+	index = IntervalIndex(intervals)
+	build_time = time.monotonic() - started
+
+	started = time.monotonic()
+	indexed = [len(index.get_overlaps(resource, start, end)) for resource, start, end in checks]
+	index_time = time.monotonic() - started
+
+	# The nested loop is timed on a sample of the queries and scaled, as it scans every row per query
+	sample = checks[:max(1, queries // 100)]
+	started = time.monotonic()
+	scanned = [
+		len([1 for row in intervals if row[0] == resource and row[1] <= end and row[2] >= start])
+		for resource, start, end in sample
+	]
+	scan_time = (time.monotonic() - started) * len(checks) / len(sample)
+
+	return {
+		"rows": rows,
+		"queries": queries,
+		"matches_agree": indexed[:len(sample)] == scanned,
+		"index_build_s": round(build_time, 4),
+		"index_query_s": round(index_time, 4),
+		"nested_loop_s": round(scan_time, 4),
+	}
@@ -3,11 +3,9 @@
 
 import frappe
 from frappe.model.document import Document
-import os
-import io
 import json
-from pyqrcode import create
 from frappe.utils import getdate, add_months, nowdate
+from beams.beams.qr_service import enqueue_qr_code
 
 
 @frappe.whitelist()
@@ -15,25 +13,7 @@ def generate_asset_qr(doc,method = None):
     qr_code = doc.get("qr_code")
     if qr_code and frappe.db.exists({"doctype": "File", "file_url": qr_code}):
         return
-    doc_url = get_si_json(doc)
-    qr_image = io.BytesIO()
-    url = create(doc_url, error="L")
-    url.png(qr_image, scale=4, quiet_zone=1)
-    name = frappe.generate_hash(doc.name, 5)
-    filename = f"QRCode-{name}.png".replace(os.path.sep, "__")
-    _file = frappe.get_doc(
-        {
-            "doctype": "File",
-            "file_name": filename,
-            "is_private": 0,
-            "content": qr_image.getvalue(),
-            "attached_to_doctype": doc.get("doctype"),
-            "attached_to_name": doc.get("name"),
-            "attached_to_field": "qr_code",
-        }
-    )
-    _file.save()
-    doc.db_set("qr_code", _file.file_url)
+    enqueue_qr_code(doc.doctype, doc.name, "qr_code", get_si_json(doc))
 
 def get_si_json(doc):
     """Return a simple unique asset identifier instead of JSON"""
@@ -45,25 +25,7 @@ def generate_asset_details_qr(doc,method = None):
     asset_details = doc.get("asset_details")
     if asset_details and frappe.db.exists({"doctype": "File", "file_url": asset_details}):
         return
-    doc_url = get_si_json_data(doc)
-    qr_image = io.BytesIO()
-    url = create(doc_url, error="L")
-    url.png(qr_image, scale=4, quiet_zone=1)
-    name = frappe.generate_hash(doc.name, 5)
-    filename = f"QRCode-{name}.png".replace(os.path.sep, "__")
-    _file = frappe.get_doc(
-        {
-            "doctype": "File",
-            "file_name": filename,
-            "is_private": 0,
-            "content": qr_image.getvalue(),
-            "attached_to_doctype": doc.get("doctype"),
-            "attached_to_name": doc.get("name"),
-            "attached_to_field": "asset_details",
-        }
-    )
-    _file.save()
-    doc.db_set("asset_details", _file.file_url)
+    enqueue_qr_code(doc.doctype, doc.name, "asset_details", get_si_json_data(doc))
 
 def get_si_json_data(doc):
     essential_fields = [
@@ -79,12 +41,18 @@ def get_si_json_data(doc):
     json_data = json.dumps(item_data, indent=4)
     return json_data
 
+ASSET_NOTIFICATION_CHUNK_SIZE = 100
+
 @frappe.whitelist()
 def asset_notifications():
-    """Send asset notifications based on the selected frequency and start month."""
+    """
+        Send asset notifications based on the selected frequency and start month.
+        Item settings and custodian users are prefetched in bulk, each email template is compiled once,
+        assets are grouped into one digest per custodian and template, and the digests are sent from
+        background jobs in chunks.
+    """
     today = getdate(nowdate())
     current_month = today.month
-    current_year = today.year
     beams_settings = frappe.get_single("BEAMS Admin Settings")
     default_notification_enabled = beams_settings.asset_audit_notification
     default_frequency = beams_settings.notifcation_frequency
@@ -95,44 +63,95 @@ def asset_notifications():
         "July": 7, "August": 8, "September": 9, "October": 10, "November": 11, "December": 12
     }
     global_start_month_num = month_map.get(default_start_month, None)
-    assets = frappe.get_all("Asset", fields=["name", "item_code", "custodian"])
+    assets = frappe.get_all("Asset", filters={"custodian": ["is", "set"]}, fields=["name", "item_code", "custodian"])
+
+    item_codes = list({asset.item_code for asset in assets if asset.item_code})
+    items = {
+        item.name: item
+        for item in frappe.get_all(
+            "Item",
+            filters={"name": ["in", item_codes]},
+            fields=["name", "item_audit_notification", "item_notification_frequency", "item_notification_template", "start_notification_from"]
+        )
+    } if item_codes else {}
+
+    custodians = list({asset.custodian for asset in assets})
+    custodian_users = dict(
+        frappe.get_all(
+            "Employee",
+            filters={"name": ["in", custodians], "user_id": ["is", "set"]},
+            fields=["name", "user_id"],
+            as_list=True
+        )
+    ) if custodians else {}
+
+    # Assets grouped per (recipient, email template)
+    digests = {}
     for asset in assets:
-        item = frappe.db.get_value(
-            "Item", asset.item_code,
-            ["item_audit_notification", "item_notification_frequency", "item_notification_template", "start_notification_from"],
-            as_dict=True
-        ) if asset.item_code else {}
+        recipient = custodian_users.get(asset.custodian)
+        if not recipient:
+            continue
+        item = items.get(asset.item_code, {})
         notify_enabled = item.get("item_audit_notification") or default_notification_enabled
         frequency = item.get("item_notification_frequency") or default_frequency
         email_template = item.get("item_notification_template") or default_email_template
-        item_start_month = item.get("start_notification_from")
-        item_start_month_num = month_map.get(item_start_month, None)
+        item_start_month_num = month_map.get(item.get("start_notification_from"), None)
         if not notify_enabled or not email_template:
             continue
         start_month_num = item_start_month_num if item_start_month_num else global_start_month_num
         if not start_month_num:
             continue
-        send_notification = False
-        if frequency == "Monthly":
-            send_notification = True
-        elif frequency == "Trimonthly":
-            send_notification = (current_month - start_month_num) % 3 == 0 if current_month >= start_month_num else (start_month_num - current_month) % 3 == 0
-        elif frequency == "Quarterly":
-            send_notification = (current_month - start_month_num) % 4 == 0 if current_month >= start_month_num else (start_month_num - current_month) % 4 == 0
-        elif frequency == "Half Yearly":
-            send_notification = (current_month - start_month_num) % 6 == 0 if current_month >= start_month_num else (start_month_num - current_month) % 6 == 0
-        elif frequency == "Yearly":
-            send_notification = current_month == start_month_num
-        if not send_notification:
-            continue
-        recipient = frappe.db.get_value("Employee", asset.custodian, "user_id")
-        if not recipient:
+        if not is_asset_notification_due(frequency, start_month_num, current_month):
             continue
-        email_template_doc = frappe.get_doc("Email Template", email_template)
-        message = frappe.render_template(email_template_doc.response, {"asset": asset})
+        digests.setdefault((recipient, email_template), []).append(asset)
+
+    digests = [
+        {"recipient": recipient, "email_template": email_template, "assets": assets}
+        for (recipient, email_template), assets in digests.items()
+    ]
+    for start in range(0, len(digests), ASSET_NOTIFICATION_CHUNK_SIZE):
+        frappe.enqueue(
+            send_asset_notification_digests,
+            queue="long",
+            digests=digests[start:start + ASSET_NOTIFICATION_CHUNK_SIZE]
+        )
+
+def is_asset_notification_due(frequency, start_month_num, current_month):
+    """
+        Check whether an asset notification with the given frequency and start month is due this month
+    """
+    if frequency == "Monthly":
+        return True
+    elif frequency == "Trimonthly":
+        return (current_month - start_month_num) % 3 == 0 if current_month >= start_month_num else (start_month_num - current_month) % 3 == 0
+    elif frequency == "Quarterly":
+        return (current_month - start_month_num) % 4 == 0 if current_month >= start_month_num else (start_month_num - current_month) % 4 == 0
+    elif frequency == "Half Yearly":
+        return (current_month - start_month_num) % 6 == 0 if current_month >= start_month_num else (start_month_num - current_month) % 6 == 0
+    elif frequency == "Yearly":
+        return current_month == start_month_num
+    return False
+
+def send_asset_notification_digests(digests):
+    """
+        Send one email per digest, rendering the template once for every asset of the digest.
+        Templates are loaded and compiled once per job.
+    """
+    templates = {}
+    for digest in digests:
+        if digest["email_template"] not in templates:
+            email_template_doc = frappe.get_cached_doc("Email Template", digest["email_template"])
+            templates[digest["email_template"]] = (
+                email_template_doc.subject,
+                frappe.get_jenv().from_string(email_template_doc.response or "")
+            )
+        subject, template = templates[digest["email_template"]]
+        message = "<hr>".join(
+            template.render({"asset": frappe._dict(asset)}) for asset in digest["assets"]
+        )
         frappe.sendmail(
-            recipients=[recipient],
-            subject=email_template_doc.subject,
+            recipients=[digest["recipient"]],
+            subject=subject,
             message=message
         )
 
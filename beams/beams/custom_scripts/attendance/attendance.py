@@ -1,10 +1,13 @@
 import frappe
 from frappe.utils import nowdate, add_days, format_date
 
+LEAVE_APPLICATION_CHUNK_SIZE = 200
+
 def notify_manager_unplanned_absence():
 	'''
 	Send a reminder to the reports_to if an employee was absent but did not apply for leave.
 	The reminder is based on the value in Absence Reminder Duration and only if Enable Absence Reminders is checked.
+	Penalty leaves are created in background jobs, in chunks of LEAVE_APPLICATION_CHUNK_SIZE employees.
 	'''
 	hr_settings = frappe.get_single("Beams HR Settings")
 	absence_reminder_duration = hr_settings.absence_reminder_duration
@@ -13,69 +16,70 @@ def notify_manager_unplanned_absence():
 	email_template_name = hr_settings.absence_reminder_template
 	if not email_template_name:
 		return
-	email_template = frappe.get_doc("Email Template", email_template_name)
+	subject_template, message_template = get_compiled_email_template(email_template_name)
 	target_date = add_days(nowdate(), -absence_reminder_duration)
-	absent_employees = frappe.get_all(
-		"Attendance",
-		filters={"attendance_date": target_date, "status": "Absent"},
-		fields=["employee", "employee_name", "attendance_date"]
-	)
-	if absent_employees:
-		for employee in absent_employees:
-			leave_exists = frappe.db.exists(
-				"Leave Application",
-				{
-					"employee": employee["employee"],
-					"from_date": ("<=", employee["attendance_date"]),
-					"to_date": (">=", employee["attendance_date"]),
-					"docstatus": 1,
-				}
-			)
-			if not leave_exists:
-				# Fetch the Employment Type for the employee
-				employment_type = frappe.db.get_value(
-					"Employee", employee["employee"], "employment_type"
-				)
-
-				# Fetch the penalty_leave_type from Employment Type doctype
-				leave_type = frappe.db.get_value(
-					"Employment Type", employment_type, "penalty_leave_type"
-				)
-
-				# If no penalty_leave_type is found, set leave type to Leave Without Pay (LWOP)
-				if not leave_type:
-					leave_type = "Leave Without Pay"  # Default to LWOP if no penalty leave type is set
-
-				# Create a new Leave Application document
-				leave_application = frappe.new_doc("Leave Application")
-				leave_application.employee = employee["employee"]
-				leave_application.leave_type = leave_type
-				leave_application.from_date = employee["attendance_date"]
-				leave_application.to_date = employee["attendance_date"]
-				leave_application.status = "Approved"
-				leave_application.save()
-
-				leave_application.submit()
+	absent_employees = get_unplanned_absences(target_date)
+
+	absences = []
+	for employee in absent_employees:
+		absence = {
+			"employee": employee.employee,
+			# If no penalty_leave_type is found, set leave type to Leave Without Pay (LWOP)
+			"leave_type": employee.penalty_leave_type or "Leave Without Pay",
+			"attendance_date": employee.attendance_date,
+		}
+		# Notify the supervisor
+		if employee.reports_to_email:
+			context_data = {
+				"employee_name": employee.employee_name,
+				"employee_id": employee.employee,
+				"attendance_date": employee.attendance_date,
+				"reports_to_name": employee.reports_to_name
+			}
+			absence.update({
+				"reports_to_email": employee.reports_to_email,
+				"subject": subject_template.render(context_data),
+				"message": message_template.render(context_data),
+			})
+		absences.append(absence)
+
+	for start in range(0, len(absences), LEAVE_APPLICATION_CHUNK_SIZE):
+		frappe.enqueue(
+			create_penalty_leave_applications,
+			queue="long",
+			absences=absences[start:start + LEAVE_APPLICATION_CHUNK_SIZE]
+		)
 
+def create_penalty_leave_applications(absences):
+	'''
+	Create and submit an approved penalty Leave Application for each absence and notify the supervisor.
+	A failure is logged and does not stop the rest of the chunk.
+	'''
+	for absence in absences:
+		try:
+			leave_application = frappe.new_doc("Leave Application")
+			leave_application.employee = absence["employee"]
+			leave_application.leave_type = absence["leave_type"]
+			leave_application.from_date = absence["attendance_date"]
+			leave_application.to_date = absence["attendance_date"]
+			leave_application.status = "Approved"
+			leave_application.save()
+			leave_application.submit()
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(
+				f"Penalty leave could not be created for employee {absence['employee']} on {absence['attendance_date']}",
+				"Absence Reminder"
+			)
+			continue
 
-				# Notify the supervisor
-				reports_to = frappe.db.get_value("Employee", employee["employee"], "reports_to")
-				if reports_to:
-					reports_to_email, reports_to_name = frappe.db.get_value("Employee", reports_to, ['user_id', 'employee_name'])
-					if reports_to_email:
-						context_data = {
-							"employee_name": employee["employee_name"],
-							"employee_id": employee["employee"],
-							"attendance_date": employee["attendance_date"],
-							"reports_to_name": reports_to_name
-						}
-						subject = frappe.render_template(email_template.subject, context_data)
-						message = frappe.render_template(email_template.response, context_data)
-						frappe.sendmail(
-							recipients=[reports_to_email],
-							subject=subject,
-							message=message
-						)
+		if absence.get("reports_to_email"):
+			frappe.sendmail(
+				recipients=[absence["reports_to_email"]],
+				subject=absence["subject"],
+				message=absence["message"]
+			)
 
 
 def remind_employee_unplanned_absence():
@@ -84,37 +88,20 @@ def remind_employee_unplanned_absence():
 	hr_settings = frappe.get_single("Beams HR Settings")
 	if not hr_settings.leave_application_reminder_duration:
 		return
+	email_template_name = hr_settings.leave_application_template
+	if not email_template_name:
+		return
 	absence_reminder_duration = hr_settings.leave_application_reminder_duration
 	target_date = add_days(nowdate(), -absence_reminder_duration)
-	absent_employees = frappe.get_all(
-		"Attendance",
-		filters={"attendance_date": target_date, "status": "Absent"},
-		fields=["employee", "employee_name", "attendance_date"]
-	)
+	absent_employees = get_unplanned_absences(target_date)
 	if absent_employees:
+		email_template = get_compiled_email_template(email_template_name)
 		for employee in absent_employees:
+			send_employee_absence_email(employee, email_template)
 
-			# Check if a leave application exists for the absence
-			leave_exists = frappe.db.exists(
-				"Leave Application",
-				{
-					"employee": employee["employee"],
-					"from_date": ("<=", employee["attendance_date"]),
-					"to_date": (">=", employee["attendance_date"]),
-					"docstatus": 1,  # Leave application should be submitted
-				}
-			)
-
-			if  not leave_exists:
-				send_employee_absence_email(employee)
-
-def send_employee_absence_email(employee):
+def send_employee_absence_email(employee, email_template):
 	"""Send an email reminder to the absent employee to submit a leave application."""
-	hr_settings = frappe.get_single("Beams HR Settings")
-	email_template_name = hr_settings.leave_application_template
-	if not email_template_name:
-		return
-	email_template = frappe.get_doc("Email Template", email_template_name)
+	subject_template, message_template = email_template
 
 	# Prepare context data for rendering the template
 	context_data = {
@@ -123,22 +110,51 @@ def send_employee_absence_email(employee):
 		"attendance_date": employee["attendance_date"]
 	}
 
-	subject = frappe.render_template(email_template.subject, context_data)
-	message = frappe.render_template(email_template.response, context_data)
-
-	# Get the employee's email (user_id field in the Employee DocType)
-	email = frappe.db.get_value("Employee", employee["employee"], "user_id")
+	# The employee's email (user_id field in the Employee DocType)
+	email = employee.get("user_id")
 
 	if email:
 		# Send email to the employee
 		frappe.sendmail(
 			recipients=[email],
-			subject=subject,
-			message=message
+			subject=subject_template.render(context_data),
+			message=message_template.render(context_data)
 		)
-		frappe.msgprint(f"Reminder email sent to {employee['employee_name']} ({email}).")
 	else:
 		frappe.log_error(
 			f"Email not found for employee {employee['employee_name']} ({employee['employee']})",
 			"Absence Reminder"
 		)
+
+def get_unplanned_absences(attendance_date):
+	'''
+	Absent attendances of a date that are not covered by a submitted Leave Application,
+	along with the employee's user, penalty leave type and supervisor details.
+	'''
+	return frappe.db.sql("""
+		SELECT
+			att.employee, att.employee_name, att.attendance_date,
+			emp.user_id, et.penalty_leave_type,
+			mgr.user_id AS reports_to_email, mgr.employee_name AS reports_to_name
+		FROM `tabAttendance` att
+		INNER JOIN `tabEmployee` emp ON emp.name = att.employee
+		LEFT JOIN `tabEmployment Type` et ON et.name = emp.employment_type
+		LEFT JOIN `tabEmployee` mgr ON mgr.name = emp.reports_to
+		WHERE att.attendance_date = %(attendance_date)s
+			AND att.status = 'Absent'
+			AND NOT EXISTS (
+				SELECT 1 FROM `tabLeave Application` la
+				WHERE la.employee = att.employee
+					AND la.from_date <= att.attendance_date
+					AND la.to_date >= att.attendance_date
+					AND la.docstatus = 1
+			)
+	""", {"attendance_date": attendance_date}, as_dict=True)
+
+def get_compiled_email_template(email_template_name):
+	'''
+	Returns the subject and response of an Email Template compiled once, for rendering per employee.
+	'''
+	email_template = frappe.get_doc("Email Template", email_template_name)
+	jenv = frappe.get_jenv()
+	return jenv.from_string(email_template.subject or ""), jenv.from_string(email_template.response or "")
@@ -1,6 +1,9 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
 import frappe
 from frappe import _
-from frappe.utils import format_date, get_link_to_form
+from frappe.utils import add_days, cint, format_date, get_datetime, get_link_to_form, getdate
 from hrms.hr.doctype.attendance_request.attendance_request import AttendanceRequest
 from frappe.utils import today
 from frappe.utils import date_diff, today
@@ -21,7 +24,7 @@ class AttendanceRequestOverride(AttendanceRequest):
 
 			old_status = doc.status
 			doc.db_set('attendance_request', self.name)
-			checkin_time, checkout_time = get_checkin_checkout_time(doc.employee, doc.attendance_date)
+			checkin_time, checkout_time = self.get_checkin_pairing_index().get_checkin_checkout_time(doc)
 			if not doc.in_time and checkin_time:
 				doc.db_set('in_time', checkin_time)
 			if not doc.out_time and checkout_time:
@@ -55,6 +58,14 @@ class AttendanceRequestOverride(AttendanceRequest):
 			doc.insert(ignore_permissions=True)
 			doc.submit()
 
+	def get_checkin_pairing_index(self):
+		'''
+			Check-in pairing index of the request's date window, built once per request
+		'''
+		if not getattr(self, '_checkin_pairing_index', None):
+			self._checkin_pairing_index = CheckinPairingIndex(self.employee, self.from_date, self.to_date, self.shift)
+		return self._checkin_pairing_index
+
 	def before_insert(self):
 		'''
 			Prevents the attendance request if the from date exceeds the limit configured in Beams HR Settings
@@ -69,83 +80,141 @@ def get_checkin_checkout_time(employee, attendance_date):
 	'''
 		Method to get First Checkin and Last Checkout Time based on attednace date and employee
 	'''
-	checkin_time, checkout_time = None, None
-	if frappe.db.exists('Attendance', { 'attendance_date':attendance_date, 'employee':employee }):
-		attendance_doc = frappe.get_doc('Attendance', { 'attendance_date':attendance_date, 'employee':employee })
-		if attendance_doc.in_time and not attendance_doc.out_time:
-			checkin_record = frappe.db.get_value('Employee Checkin', { 'attendance':attendance_doc.name, 'time':attendance_doc.in_time })
-			checkout_time = get_checkout_time(employee, checkin_record)
-		if attendance_doc.out_time and not attendance_doc.in_time:
-			checkout_record = frappe.db.get_value('Employee Checkin', { 'attendance':attendance_doc.name, 'time':attendance_doc.out_time })
-			checkin_time = get_checkin_time(employee, checkout_record)
-	return checkin_time, checkout_time
+	attendance_doc = frappe.db.get_value(
+		'Attendance',
+		{ 'attendance_date':attendance_date, 'employee':employee },
+		['name', 'employee', 'attendance_date', 'shift', 'in_time', 'out_time'],
+		as_dict=True
+	)
+	if not attendance_doc:
+		return None, None
+	index = CheckinPairingIndex(employee, attendance_date, attendance_date, attendance_doc.shift)
+	return index.get_checkin_checkout_time(attendance_doc)
+
 
-def get_checkout_time(employee, checkin_record):
+class CheckinPairingIndex:
 	'''
-		Fetches the last checkout time for an employee after the provided checkin record.
+		In-memory index of the unlinked check-ins of an employee for a date window.
+		The check-ins are loaded once, bounded by the shift window, and the checkout following
+		(and the check-in preceding) every position is precomputed, so each attendance of the window
+		is answered with a lookup instead of a scan of the employee's check-in history.
 	'''
-	checkout_time = None
-	if frappe.db.exists('Employee Checkin', checkin_record):
-		checkin_time = frappe.db.get_value('Employee Checkin', checkin_record, 'time')
-		checkins = frappe.get_all(
+	def __init__(self, employee, from_date, to_date, shift=None):
+		self.employee = employee
+		self.from_date = getdate(from_date)
+		self.to_date = getdate(to_date)
+		self.shift = shift
+		self.load_checkins()
+		self.load_linked_checkins()
+		self.pair_checkins()
+
+	def get_window(self):
+		'''
+			Window of check-in times covered by the index: from the earliest allowed check-in of the first shift
+			to the latest allowed check-out of the last shift, or whole days when there is no shift.
+		'''
+		start = get_datetime(self.from_date)
+		end = get_datetime(add_days(self.to_date, 1))
+		if self.shift:
+			shift_type = frappe.db.get_value(
+				'Shift Type',
+				self.shift,
+				['start_time', 'end_time', 'begin_check_in_before_shift_start_time', 'allow_check_out_after_shift_end_time'],
+				as_dict=True
+			)
+			if shift_type and shift_type.start_time is not None and shift_type.end_time is not None:
+				start = get_datetime(f'{self.from_date} {shift_type.start_time}') - timedelta(
+					minutes=cint(shift_type.begin_check_in_before_shift_start_time)
+				)
+				end = get_datetime(f'{self.to_date} {shift_type.end_time}')
+				if shift_type.end_time <= shift_type.start_time:
+					end += timedelta(days=1)
+				end += timedelta(minutes=cint(shift_type.allow_check_out_after_shift_end_time))
+				# Keep at least the whole days of the request in the window
+				start = min(start, get_datetime(self.from_date))
+				end = max(end, get_datetime(add_days(self.to_date, 1)))
+		return start, end
+
+	def load_checkins(self):
+		start, end = self.get_window()
+		self.checkins = frappe.get_all(
 			'Employee Checkin',
-			fields=[
-				'name',
-				'employee',
-				'log_type',
-				'time',
-				'shift',
-				'shift_start',
-				'shift_end',
-				'shift_actual_start',
-				'shift_actual_end'
-			],
+			fields=['name', 'log_type', 'time', 'shift'],
 			filters={
 				'skip_auto_attendance': 0,
-				'employee': employee,
+				'employee': self.employee,
 				'attendance': ('is', 'not set'),
-				'time': ('>=', checkin_time)
+				'time': ('between', [start, end])
 			},
 			order_by='time',
 		)
-		for checkin in checkins:
-			if checkin.log_type == 'OUT' and not checkin.shift:
-				checkout_time = checkin.time
-			if checkout_time and checkin.shift:
-				return checkout_time
-	return checkout_time
-
-def get_checkin_time(employee, checkout_record):
-	'''
-		 Fetches the first check-in time for an employee before the provided checkout record.
-	'''
-	checkin_time = None
-	if frappe.db.exists('Employee Checkin', checkout_record):
-		checkout_time = frappe.db.get_value('Employee Checkin', checkout_record, 'time')
-		checkins = frappe.get_all(
-			'Employee Checkin',
-			fields=[
-				'name',
-				'employee',
-				'log_type',
-				'time',
-				'shift',
-				'shift_start',
-				'shift_end',
-				'shift_actual_start',
-				'shift_actual_end'
-			],
-			filters={
-				'skip_auto_attendance': 0,
-				'employee': employee,
-				'attendance': ('is', 'not set'),
-				'time': ('<=', checkout_time)
-			},
-			order_by='time desc',
+		self.times = [checkin.time for checkin in self.checkins]
+
+	def load_linked_checkins(self):
+		'''
+			Times of the check-ins linked to the employee's attendance records of the window
+		'''
+		self.linked_checkins = set(
+			frappe.db.sql('''
+				SELECT checkin.attendance, checkin.time
+				FROM `tabEmployee Checkin` checkin
+				INNER JOIN `tabAttendance` attendance ON attendance.name = checkin.attendance
+				WHERE attendance.employee = %(employee)s
+					AND attendance.attendance_date BETWEEN %(from_date)s AND %(to_date)s
+			''', {'employee': self.employee, 'from_date': self.from_date, 'to_date': self.to_date})
 		)
-		for checkin in checkins:
-			if checkin.log_type == 'IN' and not checkin.shift:
-				checkin_time = checkin.time
-			if checkin_time and checkin.shift:
-				return checkin_time
-	return checkin_time
+
+	def pair_checkins(self):
+		'''
+			Precompute for every position the checkout found by scanning forward from it and the check-in
+			found by scanning backward from it. A scan keeps the last shiftless OUT (or IN) it meets and
+			stops at the first check-in with a shift once one has been found.
+		'''
+		count = len(self.checkins)
+		self.next_checkout = [None] * (count + 1)
+		self.previous_checkin = [None] * (count + 1)
+
+		found, result = None, None
+		for position in range(count - 1, -1, -1):
+			checkin = self.checkins[position]
+			if checkin.shift:
+				found = None
+			elif checkin.log_type == 'OUT':
+				found = found or checkin.time
+				result = found
+			self.next_checkout[position] = result
+
+		found, result = None, None
+		for position in range(count):
+			checkin = self.checkins[position]
+			if checkin.shift:
+				found = None
+			elif checkin.log_type == 'IN':
+				found = found or checkin.time
+				result = found
+			self.previous_checkin[position + 1] = result
+
+	def get_checkout_time(self, checkin_time):
+		'''
+			Last checkout time after the given checkin time
+		'''
+		return self.next_checkout[bisect_left(self.times, checkin_time)]
+
+	def get_checkin_time(self, checkout_time):
+		'''
+			First check-in time before the given checkout time
+		'''
+		return self.previous_checkin[bisect_right(self.times, checkout_time)]
+
+	def get_checkin_checkout_time(self, attendance_doc):
+		'''
+			Method to get First Checkin and Last Checkout Time of an attendance record
+		'''
+		checkin_time, checkout_time = None, None
+		if attendance_doc.in_time and not attendance_doc.out_time:
+			if (attendance_doc.name, get_datetime(attendance_doc.in_time)) in self.linked_checkins:
+				checkout_time = self.get_checkout_time(get_datetime(attendance_doc.in_time))
+		if attendance_doc.out_time and not attendance_doc.in_time:
+			if (attendance_doc.name, get_datetime(attendance_doc.out_time)) in self.linked_checkins:
+				checkin_time = self.get_checkin_time(get_datetime(attendance_doc.out_time))
+		return checkin_time, checkout_time
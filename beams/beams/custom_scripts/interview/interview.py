@@ -4,6 +4,7 @@ from frappe import _
 from six import string_types
 from frappe.utils import get_link_to_form
 from hrms.hr.doctype.interview.interview import Interview
+from beams.beams.permission_context import get_permission_context
 
 class InterviewOverride(Interview):
 	def on_submit(self):
@@ -211,24 +212,22 @@ def update_job_applicant_status(doc, method=None):
 
 @frappe.whitelist()
 def get_permission_query_conditions(user):
-	if not user:
-		user = frappe.session.user
-
-	user_roles = frappe.get_roles(user)
+	context = get_permission_context(user)
 
 	# Allow Administrator to see all interviews
-	if "System Manager" in user_roles:
+	if "System Manager" in context.roles:
 		return None
 
 	# Restrict Interviewers to see only scheduled interviews where they are assigned
-	if "Interviewer" in user_roles:
+	if "Interviewer" in context.roles:
 		conditions = """
 			EXISTS (
 				SELECT 1 FROM `tabInterview Detail` id
 				WHERE id.parent = `tabInterview`.name
-				AND id.interviewer = '{user}'
+				AND id.parenttype = 'Interview'
+				AND id.interviewer = {user}
 			)
-		""".format(user=user)
+		""".format(user=frappe.db.escape(context.user))
 		return conditions
 
 	return None
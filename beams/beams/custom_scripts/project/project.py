@@ -6,6 +6,7 @@ from frappe.model.mapper import get_mapped_doc
 from frappe.utils import nowdate
 from frappe.utils import now
 from frappe.utils import cint, now
+from beams.beams.allocation_conflicts import get_overlapping_rows
 
 
 def validate_project(doc, method):
@@ -177,33 +178,10 @@ def validate_vehicle_assignment_in_same_project(doc, method):
 	'''
 	Validate that a vehicle is not assigned to multiple times in the same project during the same time period.
 	'''
-	vehicle_assignments = {}
-
-	for row in doc.allocated_vehicle_details:
-		if not row.vehicle:
-			continue
-
-		from_date = getattr(row, 'from', None)
-		to_date = getattr(row, 'to', None)
-
-		if not from_date or not to_date:
-			continue
-
-		if row.vehicle not in vehicle_assignments:
-			vehicle_assignments[row.vehicle] = []
-
-		for existing_row in vehicle_assignments[row.vehicle]:
-			existing_from = getattr(existing_row, 'from', None)
-			existing_to = getattr(existing_row, 'to', None)
-
-			if existing_from and existing_to:
-				if (
-					(existing_from <= to_date) and
-					(existing_to >= from_date)
-				):
-					frappe.throw(f"Vehicle {row.vehicle} is already assigned for this same project ({doc.name}) during the same time period.")
-
-		vehicle_assignments[row.vehicle].append(row)
+	conflict = get_overlapping_rows(doc.allocated_vehicle_details, 'vehicle', 'from', 'to')
+	if conflict:
+		row, existing_row = conflict
+		frappe.throw(f"Vehicle {row.vehicle} is already assigned for this same project ({doc.name}) during the same time period.")
 
 
 @frappe.whitelist()
@@ -77,24 +77,9 @@ def validate_budget(self, method=None):
 	'''
 		Validating Budget for Purchase order and material request
 	'''
-	from beams.beams.overrides.budget import validate_expense_against_budget
+	from beams.beams.overrides.budget import validate_document_against_budget
 	if self.name:
-		for data in self.get("items"):
-			args = data.as_dict()
-			args.update(
-				{
-					"object": self,
-					"doctype": self.doctype,
-					"company": self.company,
-					"posting_date": (
-						self.schedule_date
-						if self.doctype == "Material Request"
-						else self.transaction_date
-					),
-				}
-			)
-
-			validate_expense_against_budget(args, 0, 1)
+		validate_document_against_budget(self, for_check=1)
 
 @frappe.whitelist()
 def fetch_department_from_cost_center(doc, method):
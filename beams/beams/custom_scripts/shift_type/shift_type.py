@@ -2,11 +2,13 @@ import frappe
 import itertools
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import cint, create_batch
+from frappe.utils import cint, create_batch, getdate, now
 from hrms.hr.doctype.shift_type.shift_type import ShiftType
 from hrms.hr.doctype.employee_checkin.employee_checkin import skip_attendance_in_checkins, update_attendance_in_checkins, handle_attendance_exception
 
 EMPLOYEE_CHUNK_SIZE = 50
+ATTENDANCE_BATCH_SIZE = 500
+ATTENDANCE_UPDATE_FIELDS = ("working_hours", "late_entry", "early_exit", "in_time", "out_time")
 
 
 class ShiftTypeOverride(ShiftType):
@@ -20,6 +22,8 @@ class ShiftTypeOverride(ShiftType):
 			return
 
 		logs = self.get_employee_checkins()
+		bulk_auto_attendance = cint(frappe.db.get_single_value("Beams HR Settings", "bulk_auto_attendance"))
+		shift_records = []
 
 		for key, group in itertools.groupby(logs, key=lambda x: (x["employee"], x["shift_start"])):
 			single_shift_logs = list(group)
@@ -38,6 +42,21 @@ class ShiftTypeOverride(ShiftType):
 				out_time,
 			) = self.get_attendance(single_shift_logs)
 
+			if bulk_auto_attendance:
+				shift_records.append(
+					frappe._dict(
+						logs=single_shift_logs,
+						attendance_status=attendance_status,
+						attendance_date=attendance_date,
+						working_hours=working_hours,
+						late_entry=late_entry,
+						early_exit=early_exit,
+						in_time=in_time,
+						out_time=out_time,
+					)
+				)
+				continue
+
 			mark_attendance_and_link_log(
 				single_shift_logs,
 				attendance_status,
@@ -50,6 +69,11 @@ class ShiftTypeOverride(ShiftType):
 				self.name,
 			)
 
+		# write attendance in batches & commit after each batch to avoid losing progress
+		for batch in create_batch(shift_records, ATTENDANCE_BATCH_SIZE):
+			mark_attendance_and_link_logs_in_bulk(batch, self.name)
+			frappe.db.commit()  # nosemgrep
+
 		# commit after processing checkin logs to avoid losing progress
 		frappe.db.commit()  # nosemgrep
 
@@ -133,3 +157,194 @@ def mark_attendance_and_link_log(
 	else:
 		frappe.throw(_("{} is an invalid Attendance Status.").format(attendance_status))
 
+
+
+def mark_attendance_and_link_logs_in_bulk(shift_records, shift=None):
+	"""Bulk variant of `mark_attendance_and_link_log` for a batch of (employee, shift) log groups.
+	Existing attendance, employees and approved leaves of the batch are preloaded in one query each, so the
+	duplicate, leave and employee status rules of Attendance are applied in memory. New attendance is inserted
+	with a single multi-row INSERT and the check-ins are linked in one statement.
+	Records of inactive employees, or dated before joining or in the future, go through the regular insert and submit.
+	If the batch cannot be written, it is rolled back and processed one record at a time.
+
+	:param shift_records: List of dicts with the logs and the values returned by `ShiftType.get_attendance`.
+	:param shift: Name of the Shift Type.
+	"""
+	for record in shift_records:
+		if record.attendance_status not in ("Present", "Absent", "Half Day", "Skip"):
+			frappe.throw(_("{} is an invalid Attendance Status.").format(record.attendance_status))
+
+	skipped_logs = [log.name for record in shift_records if record.attendance_status == "Skip" for log in record.logs]
+	if skipped_logs:
+		skip_attendance_in_checkins(skipped_logs)
+
+	shift_records = [record for record in shift_records if record.attendance_status != "Skip"]
+	if not shift_records:
+		return
+
+	try:
+		frappe.db.savepoint("bulk_attendance_creation")
+		unwritten_records = write_attendance_in_bulk(shift_records, shift)
+	except Exception:
+		frappe.db.rollback(save_point="bulk_attendance_creation")
+		unwritten_records = shift_records
+
+	for record in unwritten_records:
+		mark_attendance_and_link_log(
+			record.logs,
+			record.attendance_status,
+			record.attendance_date,
+			record.working_hours,
+			record.late_entry,
+			record.early_exit,
+			record.in_time,
+			record.out_time,
+			shift,
+		)
+
+
+def write_attendance_in_bulk(shift_records, shift=None):
+	"""Write the attendance of the batch and return the records that need the regular insert and submit."""
+	employees = list({record.logs[0].employee for record in shift_records})
+	attendance_dates = list({record.attendance_date for record in shift_records})
+
+	existing_attendance = {}
+	for attendance in frappe.get_all(
+		"Attendance",
+		filters={"employee": ["in", employees], "attendance_date": ["in", attendance_dates]},
+		fields=["name", "employee", "attendance_date"],
+		order_by="creation",
+	):
+		existing_attendance.setdefault((attendance.employee, attendance.attendance_date), attendance.name)
+
+	employee_details = {
+		employee.name: employee
+		for employee in frappe.get_all(
+			"Employee",
+			filters={"name": ["in", employees]},
+			fields=["name", "employee_name", "company", "department", "status", "date_of_joining"],
+		)
+	}
+	leave_records = get_approved_leaves(employees, min(attendance_dates), max(attendance_dates))
+	today = getdate()
+
+	new_attendance = {}
+	unwritten_records = []
+	for record in shift_records:
+		employee = record.logs[0].employee
+		key = (employee, record.attendance_date)
+		values = {fieldname: record.get(fieldname) for fieldname in ATTENDANCE_UPDATE_FIELDS}
+		details = employee_details.get(employee)
+
+		if key in existing_attendance:
+			# Checking whether there is attendance created, if yes then update the values in it
+			frappe.db.set_value("Attendance", existing_attendance[key], values)
+		elif key in new_attendance:
+			new_attendance[key]["doc"].update(values)
+		elif (
+			not details
+			or details.status == "Inactive"
+			or getdate(record.attendance_date) > today
+			or (details.date_of_joining and getdate(record.attendance_date) < getdate(details.date_of_joining))
+		):
+			# Attendance validation rejects these, leave the error handling to the regular path
+			unwritten_records.append(record)
+		else:
+			attendance = frappe.new_doc("Attendance")
+			attendance.update(
+				{
+					"employee": employee,
+					"employee_name": details.employee_name,
+					"company": details.company,
+					"department": details.department,
+					"attendance_date": record.attendance_date,
+					"status": record.attendance_status,
+					"shift": shift,
+					"docstatus": 1,
+					**values,
+				}
+			)
+			apply_leave_record(attendance, leave_records.get(employee, []))
+			attendance.set_new_name()
+			new_attendance[key] = {"doc": attendance, "logs": [log.name for log in record.logs]}
+
+	if not new_attendance:
+		return unwritten_records
+
+	timestamp = now()
+	fields = [
+		"name", "naming_series", "owner", "creation", "modified", "modified_by", "docstatus", "employee",
+		"employee_name", "company", "department", "attendance_date", "status", "leave_type", "leave_application",
+		"shift", *ATTENDANCE_UPDATE_FIELDS
+	]
+	rows = []
+	for entry in new_attendance.values():
+		attendance = entry["doc"]
+		attendance.update({
+			"owner": frappe.session.user,
+			"creation": timestamp,
+			"modified": timestamp,
+			"modified_by": frappe.session.user,
+		})
+		rows.append([attendance.get(fieldname) for fieldname in fields])
+	frappe.db.bulk_insert("Attendance", fields, rows)
+
+	for entry in new_attendance.values():
+		if entry["doc"].status == "Absent":
+			entry["doc"].add_comment(
+				text=_("Employee was marked Absent for not meeting the working hours threshold.")
+			)
+
+	link_checkins_to_attendance(
+		{log_name: entry["doc"].name for entry in new_attendance.values() for log_name in entry["logs"]}
+	)
+	return unwritten_records
+
+
+def get_approved_leaves(employees, from_date, to_date):
+	"""Approved Leave Applications of the employees overlapping the period, by employee."""
+	leave_records = {}
+	for leave in frappe.get_all(
+		"Leave Application",
+		filters={
+			"employee": ["in", employees],
+			"from_date": ["<=", to_date],
+			"to_date": [">=", from_date],
+			"status": "Approved",
+			"docstatus": 1,
+		},
+		fields=["name", "employee", "leave_type", "from_date", "to_date", "half_day", "half_day_date"],
+	):
+		leave_records.setdefault(leave.employee, []).append(leave)
+	return leave_records
+
+
+def apply_leave_record(attendance, leaves):
+	"""Same as `Attendance.check_leave_record`: an approved leave marks the day On Leave, or Half Day on its half day."""
+	attendance_date = getdate(attendance.attendance_date)
+	for leave in leaves:
+		if getdate(leave.from_date) <= attendance_date <= getdate(leave.to_date):
+			attendance.leave_type = leave.leave_type
+			attendance.leave_application = leave.name
+			if leave.half_day_date and getdate(leave.half_day_date) == attendance_date:
+				attendance.status = "Half Day"
+			else:
+				attendance.status = "On Leave"
+
+
+def link_checkins_to_attendance(attendance_by_log):
+	"""Set the attendance of every Employee Checkin in `attendance_by_log` with a single UPDATE."""
+	if not attendance_by_log:
+		return
+
+	cases = " ".join(["WHEN %s THEN %s"] * len(attendance_by_log))
+	placeholders = ", ".join(["%s"] * len(attendance_by_log))
+	values = [value for log_name, attendance in attendance_by_log.items() for value in (log_name, attendance)]
+	frappe.db.sql(
+		f"""
+		UPDATE `tabEmployee Checkin`
+		SET attendance = CASE name {cases} END
+		WHERE name IN ({placeholders})
+		""",
+		values + list(attendance_by_log),
+	)
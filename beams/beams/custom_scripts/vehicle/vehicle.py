@@ -1,20 +1,22 @@
+import time
+
 import frappe
-from frappe.utils import today, add_days, formatdate, getdate
+from frappe.utils import today, add_days, cint, flt, formatdate, getdate
 from datetime import datetime
 from frappe.utils.user import get_users_with_role
 from frappe.email.doctype.email_account.email_account import EmailAccount
 from frappe.utils import nowdate, nowtime
 
 @frappe.whitelist()
-def send_vehicle_document_reminders():
+def send_vehicle_document_reminders(dry_run=0):
 
     """
     Sends email reminders for vehicle document expiry.
 
-    This method checks all vehicles and their associated documents to identify:
-    1. Documents that are due for a reminder based on the `reminder_before` field.
+    This method checks the vehicle documents to identify:
+    1. Documents that are due for a reminder, i.e. their `next_reminder_date` (expiry date less the `reminder_before` days) is today.
     2.Documents that are overdue (past their expiry date).
-    It compiles the details into an HTML table and sends an email to all users with the "Admin" role.
+    It compiles the details of all vehicles into one HTML table and sends a single email to all users with the "Admin" role.
     Email includes:
         - License Plate
         - Model
@@ -22,70 +24,94 @@ def send_vehicle_document_reminders():
         - Expiry Date
 
     Emails are sent only if there are documents that meet the criteria for reminders.
+    With `dry_run` set, no email is sent and the number of due documents matched by the query is returned instead.
     """
-    # Fetch all Vehicle documents
-    vehicles = frappe.get_all("Vehicle", fields=["name", "license_plate", "model"])
+    start = time.monotonic()
+    documents = get_due_vehicle_documents(getdate(today()))
 
-    for vehicle in vehicles:
-        # Get the Vehicle document with child table data
-        vehicle_doc = frappe.get_doc("Vehicle", vehicle["name"])
+    reminder_details = []  # Collect reminder details for the email
+    for doc in documents:
+        reminder_details.append(
+            f"""
+            <tr>
+                <td>{doc.license_plate}</td>
+                <td>{doc.model}</td>
+                <td>{doc.document}</td>
+                <td>{doc.expiry_date}</td>
+            </tr>
+            """
+        )
 
-        reminder_details = []  # Collect reminder details for the email
+    if cint(dry_run):
+        return {
+            "rows_matched": len(documents),
+            "total_rows": frappe.db.count("Vehicle Documents", {"parenttype": "Vehicle"}),
+            "vehicles": len({doc.vehicle for doc in documents}),
+            "duration": flt(time.monotonic() - start, 4),
+        }
 
-        for doc in vehicle_doc.vehicle_documents:
-            if doc.expiry_date:
-                # Fetch the linked Vehicle Document to get the reminder_before field
-                vehicle_document = frappe.get_doc("Vehicle Document", doc.document)
-                reminder_before = vehicle_document.reminder_before or 0  # Default to 0 if not set
+    if reminder_details:
+        # Email content
+        email_content = f"""
+        <h3>Vehicle Document Expiry/Reminder</h3>
+        <p>The following vehicle documents are overdue or expiring soon:</p>
+        <table border="1" cellpadding="5" cellspacing="0">
+            <thead>
+                <tr>
+                    <th>License Plate</th>
+                    <th>Model</th>
+                    <th>Document</th>
+                    <th>Expiry Date</th>
+                </tr>
+            </thead>
+            <tbody>
+                {''.join(reminder_details)}
+            </tbody>
+        </table>
+        """
 
-                # Calculate the reminder date
-                reminder_date = add_days(doc.expiry_date, -reminder_before)
-                # Check if today matches the reminder date or the document is overdue
-                if getdate(today()) == reminder_date or doc.expiry_date <= getdate(today()):
-                    # Add details to the list
-                    reminder_details.append(
-                        f"""
-                        <tr>
-                            <td>{vehicle['license_plate']}</td>
-                            <td>{vehicle['model']}</td>
-                            <td>{doc.document}</td>
-                            <td>{doc.expiry_date}</td>
-                        </tr>
-                        """
-                    )
+        # Get admin users
+        email_recipients = get_users_with_role("Admin")
 
-        if reminder_details:
-            # Email content
-            email_content = f"""
-            <h3>Vehicle Document Expiry/Reminder</h3>
-            <p>The following vehicle documents are overdue or expiring soon:</p>
-            <table border="1" cellpadding="5" cellspacing="0">
-                <thead>
-                    <tr>
-                        <th>License Plate</th>
-                        <th>Model</th>
-                        <th>Document</th>
-                        <th>Expiry Date</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {''.join(reminder_details)}
-                </tbody>
-            </table>
-            """
-            
-            # Get admin users
-            email_recipients = get_users_with_role("Admin")
+        # Send email to all admin users
+        if email_recipients:
+            frappe.sendmail(
+                recipients=email_recipients,
+                subject="Vehicle Document Expiry Reminder",
+                message=email_content,
+            )
 
+def get_due_vehicle_documents(date):
+    """
+    Vehicle document rows due for a reminder on the given date or overdue, with their vehicle details.
+    """
+    return frappe.db.sql("""
+        SELECT
+            vd.parent AS vehicle, v.license_plate, v.model, vd.document, vd.expiry_date
+        FROM `tabVehicle Documents` vd
+        INNER JOIN `tabVehicle` v ON v.name = vd.parent
+        INNER JOIN `tabVehicle Document` d ON d.name = vd.document
+        WHERE vd.parenttype = 'Vehicle'
+            AND (vd.next_reminder_date = %(date)s OR vd.expiry_date <= %(date)s)
+        ORDER BY v.name, vd.idx
+    """, {"date": date}, as_dict=True)
 
-            # Send email to all admin users
-            if email_recipients:
-                frappe.sendmail(
-                    recipients=email_recipients,
-                    subject="Vehicle Document Expiry Reminder",
-                    message=email_content,
-                )
+def set_next_reminder_dates(doc, method=None):
+    """Set the next reminder date of the vehicle document rows from their expiry date and Reminder Before days."""
+    documents = list({row.document for row in doc.get("vehicle_documents") or [] if row.document})
+    reminder_before = dict(
+        frappe.get_all(
+            "Vehicle Document",
+            filters={"name": ["in", documents]},
+            fields=["name", "reminder_before"],
+            as_list=True
+        )
+    ) if documents else {}
 
+    for row in doc.get("vehicle_documents") or []:
+        row.next_reminder_date = (
+            add_days(row.expiry_date, -cint(reminder_before.get(row.document))) if row.expiry_date else None
+        )
 
 def create_vehicle_documents_log(doc, method):
     """Log changes to Vehicle Documents in a single log per Vehicle, appending changed rows without duplicates."""
@@ -3,10 +3,8 @@
 
 import frappe
 from frappe.model.document import Document
-import os
-import io
-from pyqrcode import create
 import json
+from beams.beams.qr_service import enqueue_qr_code, get_qr_file_name
 
 
 class AssetBundle(Document):
@@ -23,26 +21,7 @@ class AssetBundle(Document):
 		bundle_qr_code = self.get("bundle_qr_code")
 		if bundle_qr_code and frappe.db.exists({"doctype": "File", "file_url": bundle_qr_code}):
 			return
-
-		doc_url = self.get_si_file()
-		qr_image = io.BytesIO()
-		url = create(doc_url, error="L")
-		url.png(qr_image, scale=4, quiet_zone=1)
-		name = frappe.generate_hash(self.name, 5)
-		filename = f"QRCode-{name}.png".replace(os.path.sep, "__")
-		_file = frappe.get_doc(
-			{
-				"doctype": "File",
-				"file_name": filename,
-				"is_private": 0,
-				"content": qr_image.getvalue(),
-				"attached_to_doctype": self.get("doctype"),
-				"attached_to_name": self.get("name"),
-				"attached_to_field": "bundle_qr_code",
-			}
-		)
-		_file.save()
-		self.db_set("bundle_qr_code", _file.file_url)
+		enqueue_qr_code(self.doctype, self.name, "bundle_qr_code", self.get_si_file())
 
 	def validate(self):
 		self.validate_asset_locations()
@@ -54,12 +33,12 @@ class AssetBundle(Document):
 		if not self.assets:
 			return
 
-		locations = set()
-
-		for asset in self.assets:
-			asset_doc = frappe.get_doc("Asset", asset.asset)
-			if asset_doc.location:
-				locations.add(asset_doc.location)
+		locations = frappe.get_all(
+			"Asset",
+			filters={"name": ["in", [asset.asset for asset in self.assets]], "location": ["is", "set"]},
+			pluck="location",
+			distinct=True
+		)
 
 		if len(locations) > 1:
 			frappe.throw("Selected assets belong to different locations. Please select assets from the same location.")
@@ -68,25 +47,13 @@ class AssetBundle(Document):
 		return self.name
 
 	def generate_asset_bundle_qr(self):
-		doc_url = self.get_si_json()
-		qr_image = io.BytesIO()
-		url = create(doc_url, error="L")
-		url.png(qr_image, scale=4, quiet_zone=1)
-		name = frappe.generate_hash(self.name, 5)
-		filename = f"QRCode-{name}.png".replace(os.path.sep, "__")
-		_file = frappe.get_doc(
-			{
-				"doctype": "File",
-				"file_name": filename,
-				"is_private": 0,
-				"content": qr_image.getvalue(),
-				"attached_to_doctype": self.get("doctype"),
-				"attached_to_name": self.get("name"),
-				"attached_to_field": "qr_code",
-			}
-		)
-		_file.save()
-		self.db_set("qr_code", _file.file_url)
+		'''
+			Queue the QR code of the bundle contents, only when they changed since the current QR code
+		'''
+		payload = self.get_si_json()
+		if self.qr_code and self.qr_code.endswith(get_qr_file_name(payload)):
+			return
+		enqueue_qr_code(self.doctype, self.name, "qr_code", payload)
 
 	def get_si_json(self):
 	    essential_fields = {"assets": "asset", "bundles": "asset_bundle", "stock_items": ["item", "uom", "qty"]}
@@ -105,53 +72,105 @@ class AssetBundle(Document):
 	    """
 	    Prevents updating an Asset Bundle if it is currently in a Returned Asset Transfer Request.
 	    """
-	    non_returned_request_names = frappe.get_all(
-	        "Asset Transfer Request",
-	        filters={"workflow_state":["!=", "Returned"]},
-	        pluck="name"
-	    )
-	    if not non_returned_request_names:
-	        return
-	    non_returned_bundles = frappe.get_all(
-	        "Bundles",
-	        filters={"parent": ["in", non_returned_request_names]},
-	        pluck="asset_bundle"
-	    )
-	    directly_assigned_bundles = frappe.get_all(
-	        "Asset Transfer Request",
-	        filters={"name": ["in", non_returned_request_names]},
-	        pluck="bundle"
-	    )
-	    non_returned_bundles_set = set(non_returned_bundles) | set(directly_assigned_bundles)
-	    if self.name in non_returned_bundles_set:
+	    frappe.db.after_commit.add(clear_bundle_closure_cache)
+	    if is_bundle_in_open_transfer(self.name):
 	        frappe.throw(f"Cannot update Asset Bundle '{self.name}' as it is in a non Returned Asset Transfer Request")
 
+	def on_trash(self):
+	    frappe.db.after_commit.add(clear_bundle_closure_cache)
+
+	def after_rename(self, old, new, merge=False):
+	    frappe.db.after_commit.add(clear_bundle_closure_cache)
+
+
+BUNDLE_CLOSURE_KEY = "asset_bundle_closure"
+
+def is_bundle_in_open_transfer(bundle):
+    '''
+    Check if the bundle is assigned, directly or in the Bundles table, to an Asset Transfer Request that is not Returned
+    '''
+    return frappe.db.sql("""
+        SELECT
+            EXISTS (
+                SELECT 1 FROM `tabAsset Transfer Request` atr
+                WHERE atr.bundle = %(bundle)s
+                    AND IFNULL(atr.workflow_state, '') != 'Returned'
+            )
+            OR EXISTS (
+                SELECT 1 FROM `tabBundles` b
+                INNER JOIN `tabAsset Transfer Request` atr ON atr.name = b.parent
+                WHERE b.asset_bundle = %(bundle)s
+                    AND b.parenttype = 'Asset Transfer Request'
+                    AND IFNULL(atr.workflow_state, '') != 'Returned'
+            )
+    """, {"bundle": bundle})[0][0]
+
+def get_bundle_closure(names):
+    '''
+    Returns the closure of each Asset Bundle: {bundle: {"assets": [...], "bundles": [...]}}, where bundles holds the bundle
+    and all its nested bundles and assets the assets of all of them.
+    Closures are cached per bundle until an Asset Bundle changes; the missing ones are resolved in one recursive query.
+    '''
+    closures = {}
+    missing = []
+    for name in names:
+        cached = frappe.cache().hget(BUNDLE_CLOSURE_KEY, name)
+        if cached:
+            closures[name] = cached
+        else:
+            missing.append(name)
+
+    if missing:
+        rows = frappe.db.sql("""
+            WITH RECURSIVE bundle_tree (root, bundle) AS (
+                SELECT name, name FROM `tabAsset Bundle` WHERE name IN %(names)s
+                UNION
+                SELECT bundle_tree.root, b.asset_bundle
+                FROM `tabBundles` b
+                INNER JOIN bundle_tree ON b.parent = bundle_tree.bundle
+                WHERE b.parenttype = 'Asset Bundle'
+            )
+            SELECT
+                bundle_tree.root, bundle_tree.bundle, ab.name AS bundle_exists, a.asset
+            FROM bundle_tree
+            LEFT JOIN `tabAsset Bundle` ab ON ab.name = bundle_tree.bundle
+            LEFT JOIN `tabAssets` a ON a.parent = bundle_tree.bundle AND a.parenttype = 'Asset Bundle'
+        """, {"names": missing}, as_dict=True)
+
+        for row in rows:
+            if not row.bundle_exists:
+                frappe.throw(f"Asset Bundle '{row.bundle}' not found during processing.")
+            closure = closures.setdefault(row.root, {"assets": [], "bundles": []})
+            if row.bundle not in closure["bundles"]:
+                closure["bundles"].append(row.bundle)
+            if row.asset and row.asset not in closure["assets"]:
+                closure["assets"].append(row.asset)
+
+        for name in missing:
+            if name not in closures:
+                frappe.throw(f"Asset Bundle '{name}' not found. Please check the name.")
+            frappe.cache().hset(BUNDLE_CLOSURE_KEY, name, closures[name])
+
+    return closures
+
+def clear_bundle_closure_cache():
+    '''
+    Drop every cached closure, a change to a nested bundle also changes the closures of the bundles containing it.
+    '''
+    frappe.cache().delete_value(BUNDLE_CLOSURE_KEY)
 
 @frappe.whitelist()
 def bundle_asset_fetch(names):
     '''
     Fetch assets from specified Asset Bundles, including recursively retrieving assets from nested bundles.
     '''
-    names = json.loads(names)
-    assets = set()
-    processed_bundles = set()
-    def get_assets_recursive(bundle_name):
-        if bundle_name in processed_bundles:
-            return
-        processed_bundles.add(bundle_name)
-        if not frappe.db.exists("Asset Bundle", bundle_name):
-            frappe.throw(f"Asset Bundle '{bundle_name}' not found during processing.")
-        asset_bundle = frappe.get_doc("Asset Bundle", bundle_name)
-        assets.update(asset_bundle.assets)
-
-        for sub_bundle in asset_bundle.bundles:
-            get_assets_recursive(sub_bundle.asset_bundle)
-
-    for name in names:
-        if not frappe.db.exists("Asset Bundle", name):
-            frappe.throw(f"Asset Bundle '{name}' not found. Please check the name.")
-        get_assets_recursive(name)
-    return list(assets), list(processed_bundles)
+    names = json.loads(names) if isinstance(names, str) else names
+    assets = []
+    processed_bundles = []
+    for closure in get_bundle_closure(names).values():
+        assets += [asset for asset in closure["assets"] if asset not in assets]
+        processed_bundles += [bundle for bundle in closure["bundles"] if bundle not in processed_bundles]
+    return [{"asset": asset} for asset in assets], processed_bundles
 
 @frappe.whitelist()
 def get_selected_assets():
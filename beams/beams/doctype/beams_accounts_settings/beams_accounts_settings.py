@@ -5,4 +5,12 @@ import frappe
 from frappe.model.document import Document
 
 class BeamsAccountsSettings(Document):
-  pass
+  def on_update(self):
+    # Build the Budget Consumption ledger from scratch whenever it is switched on
+    if self.use_budget_consumption_ledger and self.has_value_changed("use_budget_consumption_ledger"):
+      frappe.enqueue(
+        "beams.beams.doctype.budget_consumption.budget_consumption.reconcile_budget_consumption",
+        queue="long",
+        timeout=3600,
+        enqueue_after_commit=True
+      )
@@ -0,0 +1,8 @@
+// Copyright (c) 2026, efeone and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Budget Consumption", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,429 @@
+# Copyright (c) 2026, efeone and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt, get_first_day, getdate, now
+
+from beams.beams.overrides.budget import get_budget_dimensions
+
+# Actual amounts are aggregated per key; requested and ordered amounts are kept per voucher
+CONSUMPTION_KEY = ["company", "account", "fiscal_year", "budget_against", "budget_against_value", "posting_month"]
+CONSUMPTION_FIELDS = ["actual_amount", "requested_amount", "ordered_amount"]
+VOUCHER_FIELDS = CONSUMPTION_KEY + ["item_code", "voucher_type", "voucher_no", "requested_amount", "ordered_amount"]
+
+# Open amount sources, by voucher type
+OPEN_AMOUNT_SOURCES = {
+	"Material Request": frappe._dict(
+		fieldname="requested_amount",
+		date_field="schedule_date",
+		amount="(src.stock_qty - src.ordered_qty) * src.rate",
+		conditions="""src.stock_qty > src.ordered_qty
+			and parent.material_request_type = 'Purchase' and parent.status != 'Stopped'""",
+	),
+	"Purchase Order": frappe._dict(
+		fieldname="ordered_amount",
+		date_field="transaction_date",
+		amount="src.amount - src.billed_amt",
+		conditions="src.amount > src.billed_amt and parent.status != 'Closed'",
+	),
+}
+
+
+class BudgetConsumption(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Budget Consumption", ["account", "fiscal_year", "budget_against", "budget_against_value"])
+	frappe.db.add_index("Budget Consumption", ["voucher_type", "voucher_no"])
+
+
+def is_ledger_enabled():
+	'''
+		Returns True when budget checks and reports should read from the Budget Consumption ledger.
+	'''
+	return frappe.db.get_single_value("Beams Accounts Settings", "use_budget_consumption_ledger", cache=True)
+
+
+def get_consumption_name(key):
+	'''
+		Actual amount rows are named after their key, so postings upsert on the primary key.
+	'''
+	return "BC-" + hashlib.sha256("|".join(str(key[fieldname]) for fieldname in CONSUMPTION_KEY).encode()).hexdigest()[:24]
+
+
+def get_budget_consumption_map(rows, budget_against, doctype, tree_bounds, month_end_date=None):
+	'''
+		Load the ledger amounts of all rows in one grouped query, booked on the rows' dimension values
+		or, for tree dimensions, on their descendants.
+		Returns {(account, fiscal_year): [entries]} with one entry per exact dimension value and item.
+	'''
+	filters = {
+		"fiscal_years": tuple({args.fiscal_year for args in rows}),
+		"accounts": tuple({account for args in rows for account in (args.account, args.expense_account) if account}),
+		"company": rows[0].company,
+		"budget_against": doctype,
+		"month_end_date": getdate(month_end_date) if month_end_date else "9999-12-31",
+	}
+
+	if tree_bounds:
+		tree_fields = ", d.lft, d.rgt"
+		tree_join = f"inner join `tab{doctype}` d on d.name = bc.budget_against_value"
+		conditions = "and ({})".format(
+			" or ".join(
+				f"(d.lft >= {int(bounds.lft)} and d.rgt <= {int(bounds.rgt)})" for bounds in tree_bounds.values()
+			)
+		)
+	else:
+		tree_fields, tree_join = "", ""
+		conditions = "and bc.budget_against_value in %(values)s"
+		filters["values"] = tuple({args.get(budget_against) for args in rows})
+
+	entries = frappe.db.sql(
+		f"""
+			select
+				bc.account, bc.fiscal_year, bc.budget_against_value as budget_against, ifnull(bc.item_code, '') as item_code{tree_fields},
+				sum(bc.actual_amount) as annual,
+				sum(case when bc.posting_month <= %(month_end_date)s then bc.actual_amount else 0 end) as monthly,
+				sum(bc.requested_amount) as requested,
+				sum(bc.ordered_amount) as ordered
+			from
+				`tabBudget Consumption` bc
+				{tree_join}
+			where
+				bc.company = %(company)s
+				and bc.budget_against = %(budget_against)s
+				and bc.account in %(accounts)s
+				and bc.fiscal_year in %(fiscal_years)s
+				{conditions}
+			group by
+				bc.account, bc.fiscal_year, bc.budget_against_value, bc.item_code{tree_fields}
+		""",
+		filters,
+		as_dict=True,
+	)  # nosec
+
+	consumption = {}
+	for entry in entries:
+		consumption.setdefault((entry.account, entry.fiscal_year), []).append(entry)
+
+	return consumption
+
+
+def get_row_consumption(args, consumption, bounds, is_tree):
+	'''
+		Returns the annual and monthly actual amounts of a row, booked on its dimension value or on its
+		subtree, and the requested and ordered amounts of its item on its exact dimension value,
+		as the GL Entry, Material Request and Purchase Order checks compute them.
+	'''
+	consumed = frappe._dict({"annual": 0, "monthly": 0, "requested": 0, "ordered": 0})
+	value = args.get(args.budget_against_field)
+
+	for entry in consumption.get((args.account, args.fiscal_year), []):
+		if is_tree:
+			if not bounds or not (entry.lft >= bounds.lft and entry.rgt <= bounds.rgt):
+				continue
+		elif entry.budget_against != value:
+			continue
+		consumed.annual += flt(entry.annual)
+		consumed.monthly += flt(entry.monthly)
+
+	for entry in consumption.get((args.expense_account, args.fiscal_year), []):
+		if entry.budget_against == value and entry.item_code == (args.item_code or ""):
+			consumed.requested += flt(entry.requested)
+			consumed.ordered += flt(entry.ordered)
+
+	return consumed
+
+
+def get_budget_consumption(args, upto_date=None):
+	'''
+		Returns the consumption of a single budget check row, see get_row_consumption.
+	'''
+	from beams.beams.overrides.budget import get_tree_bounds
+
+	value = args.get(args.budget_against_field)
+	tree_bounds = get_tree_bounds(args.budget_against_doctype, [value]) if args.is_tree else {}
+	if args.is_tree and not tree_bounds:
+		return frappe._dict({"annual": 0, "monthly": 0, "requested": 0, "ordered": 0})
+
+	consumption = get_budget_consumption_map(
+		[args], args.budget_against_field, args.budget_against_doctype, tree_bounds, upto_date
+	)
+	return get_row_consumption(args, consumption, tree_bounds.get(value), args.is_tree)
+
+
+def update_consumption_from_gl_entry(doc, method=None):
+	'''
+		Add a submitted GL Entry to the ledger row of every budget dimension it is booked on.
+		Cancellation posts a reversing GL Entry, which nets the original amount out.
+	'''
+	if not is_ledger_enabled():
+		return
+
+	amount = flt(doc.debit) - flt(doc.credit)
+	if not amount:
+		return
+
+	posting_month = get_first_day(doc.posting_date)
+	for dimension in get_budget_dimensions():
+		if not doc.get(dimension.get("fieldname")):
+			continue
+		add_consumption(
+			{
+				"company": doc.company,
+				"account": doc.account,
+				"fiscal_year": doc.fiscal_year,
+				"budget_against": dimension.get("document_type"),
+				"budget_against_value": doc.get(dimension.get("fieldname")),
+				"posting_month": posting_month,
+			},
+			actual_amount=amount,
+		)
+
+
+def add_consumption(key, actual_amount):
+	'''
+		Increment the actual amount of the ledger row for key, creating it when missing, in one statement.
+	'''
+	timestamp = now()
+	values = dict(
+		key,
+		name=get_consumption_name(key),
+		actual_amount=actual_amount,
+		owner=frappe.session.user,
+		creation=timestamp,
+		modified=timestamp,
+	)
+	frappe.db.sql(
+		"""
+			insert into `tabBudget Consumption`
+				(name, owner, modified_by, creation, modified, docstatus, company, account, fiscal_year,
+				budget_against, budget_against_value, posting_month, actual_amount, requested_amount, ordered_amount)
+			values
+				(%(name)s, %(owner)s, %(owner)s, %(creation)s, %(modified)s, 0, %(company)s, %(account)s, %(fiscal_year)s,
+				%(budget_against)s, %(budget_against_value)s, %(posting_month)s, %(actual_amount)s, 0, 0)
+			on duplicate key update
+				actual_amount = actual_amount + values(actual_amount),
+				modified = values(modified)
+		""",
+		values,
+	)
+
+
+def refresh_consumption_from_document(doc, method=None):
+	'''
+		Replace the open amounts of a Material Request or Purchase Order in the ledger.
+		Hooked on change, which covers submit, cancel, update after submit and the status updates
+		(Stopped, Closed, ordered and billed quantities) made with db_set.
+		A Purchase Order also refreshes the Material Requests it orders, a Purchase Invoice the Purchase Orders it bills.
+	'''
+	if not is_ledger_enabled() or doc.docstatus == 0:
+		return
+
+	if doc.doctype in OPEN_AMOUNT_SOURCES:
+		refresh_voucher_consumption(doc.doctype, [doc.name])
+
+	linked = {
+		"Purchase Order": ("Material Request", "material_request"),
+		"Purchase Invoice": ("Purchase Order", "purchase_order"),
+	}.get(doc.doctype)
+	if linked:
+		voucher_nos = list({item.get(linked[1]) for item in doc.get("items") if item.get(linked[1])})
+		if voucher_nos:
+			refresh_voucher_consumption(linked[0], voucher_nos)
+
+
+def refresh_voucher_consumption(voucher_type, voucher_nos):
+	frappe.db.delete("Budget Consumption", {"voucher_type": voucher_type, "voucher_no": ["in", voucher_nos]})
+	insert_voucher_consumption(get_open_amounts(voucher_type, frappe._dict({"voucher_nos": voucher_nos})))
+
+
+def insert_voucher_consumption(rows):
+	if not rows:
+		return
+	timestamp = now()
+	fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus"] + VOUCHER_FIELDS
+	frappe.db.bulk_insert(
+		"Budget Consumption",
+		fields,
+		[
+			[frappe.generate_hash(length=12), frappe.session.user, frappe.session.user, timestamp, timestamp, 0]
+			+ [row.get(fieldname) for fieldname in VOUCHER_FIELDS]
+			for row in rows
+		],
+	)
+
+
+def get_open_amounts(voucher_type, filters):
+	'''
+		Returns the open amounts of submitted Material Requests or Purchase Orders grouped by
+		voucher, item, expense account and month, for every budget dimension of the item rows.
+	'''
+	source = OPEN_AMOUNT_SOURCES[voucher_type]
+	conditions = source.conditions
+	if filters.voucher_nos:
+		conditions += " and parent.name in %(voucher_nos)s"
+	if filters.company:
+		conditions += " and parent.company = %(company)s"
+	if filters.fiscal_year:
+		conditions += " and fy.name = %(fiscal_year)s"
+	if filters.accounts:
+		conditions += " and src.expense_account in %(accounts)s"
+
+	rows = []
+	for dimension in get_budget_dimensions():
+		fieldname = dimension.get("fieldname")
+		if not frappe.db.has_column(f"{voucher_type} Item", fieldname):
+			continue
+
+		for d in frappe.db.sql(
+			f"""
+				select
+					parent.company, src.expense_account as account, fy.name as fiscal_year,
+					src.{fieldname} as budget_against_value, src.item_code, parent.name as voucher_no,
+					date_format(parent.{source.date_field}, '%%Y-%%m-01') as posting_month,
+					sum({source.amount}) as amount
+				from
+					`tab{voucher_type} Item` src
+					inner join `tab{voucher_type}` parent on parent.name = src.parent
+					inner join `tabFiscal Year` fy
+						on parent.{source.date_field} between fy.year_start_date and fy.year_end_date
+				where
+					parent.docstatus = 1
+					and ifnull(src.expense_account, '') != ''
+					and ifnull(src.{fieldname}, '') != ''
+					and {conditions}
+				group by
+					parent.company, src.expense_account, fy.name, src.{fieldname}, src.item_code, parent.name, posting_month
+			""",
+			{
+				"voucher_nos": tuple(filters.voucher_nos or []),
+				"company": filters.company,
+				"fiscal_year": filters.fiscal_year,
+				"accounts": tuple(filters.accounts or []),
+			},
+			as_dict=True,
+		):  # nosec
+			d.update({
+				"budget_against": dimension.get("document_type"),
+				"voucher_type": voucher_type,
+				"item_code": d.item_code or "",
+				"requested_amount": 0,
+				"ordered_amount": 0,
+			})
+			d[source.fieldname] = flt(d.amount)
+			rows.append(d)
+
+	return rows
+
+
+@frappe.whitelist()
+def rebuild_budget_consumption(company=None, fiscal_year=None):
+	'''
+		Enqueue a full reconciliation of the Budget Consumption ledger against its source tables.
+		Can also be run as `bench execute beams.beams.doctype.budget_consumption.budget_consumption.reconcile_budget_consumption`.
+	'''
+	frappe.only_for(["System Manager", "Accounts Manager"])
+	frappe.enqueue(
+		reconcile_budget_consumption,
+		queue="long",
+		timeout=3600,
+		company=company,
+		fiscal_year=fiscal_year,
+	)
+	frappe.msgprint(_("Budget Consumption rebuild has been queued."), alert=True)
+
+
+def reconcile_budget_consumption(company=None, fiscal_year=None, accounts=None):
+	'''
+		Recompute the ledger from GL Entry, Material Request and Purchase Order with grouped queries.
+		Actual amount rows are updated, inserted or cleared only where they differ, open amounts are rebuilt per voucher.
+	'''
+	filters = frappe._dict({"company": company, "fiscal_year": fiscal_year, "accounts": accounts})
+
+	expected = {}
+	for d in get_actual_amounts(filters):
+		key = dict(d, posting_month=getdate(d.posting_month))
+		expected[get_consumption_name(key)] = key
+
+	ledger_filters = {"voucher_no": ["is", "not set"]}
+	if company:
+		ledger_filters["company"] = company
+	if fiscal_year:
+		ledger_filters["fiscal_year"] = fiscal_year
+	if accounts:
+		ledger_filters["account"] = ["in", accounts]
+
+	existing = {
+		d.name: flt(d.actual_amount)
+		for d in frappe.get_all("Budget Consumption", filters=ledger_filters, fields=["name", "actual_amount"])
+	}
+
+	for name, row in expected.items():
+		if name not in existing:
+			add_consumption({fieldname: row[fieldname] for fieldname in CONSUMPTION_KEY}, flt(row.amount))
+		elif existing.pop(name) != flt(row.amount):
+			frappe.db.set_value("Budget Consumption", name, "actual_amount", flt(row.amount), update_modified=False)
+
+	# Rows left over have no GL Entry amounts any more
+	for name, amount in existing.items():
+		if amount:
+			frappe.db.set_value("Budget Consumption", name, "actual_amount", 0, update_modified=False)
+
+	voucher_filters = dict(ledger_filters, voucher_no=["is", "set"])
+	frappe.db.delete("Budget Consumption", voucher_filters)
+	for voucher_type in OPEN_AMOUNT_SOURCES:
+		insert_voucher_consumption(get_open_amounts(voucher_type, filters))
+
+
+def get_actual_amounts(filters):
+	'''
+		Returns GL Entry amounts grouped by company, account, fiscal year, exact dimension value and month,
+		for every budget dimension.
+	'''
+	conditions = ""
+	if filters.company:
+		conditions += " and gle.company = %(company)s"
+	if filters.fiscal_year:
+		conditions += " and gle.fiscal_year = %(fiscal_year)s"
+	if filters.accounts:
+		conditions += " and gle.account in %(accounts)s"
+
+	amounts = []
+	for dimension in get_budget_dimensions():
+		fieldname = dimension.get("fieldname")
+		if not frappe.db.has_column("GL Entry", fieldname):
+			continue
+
+		for d in frappe.db.sql(
+			f"""
+				select
+					gle.company, gle.account, gle.fiscal_year, gle.{fieldname} as budget_against_value,
+					date_format(gle.posting_date, '%%Y-%%m-01') as posting_month,
+					sum(gle.debit) - sum(gle.credit) as amount
+				from
+					`tabGL Entry` gle
+				where
+					gle.is_cancelled = 0
+					and gle.docstatus = 1
+					and ifnull(gle.{fieldname}, '') != ''
+					{conditions}
+				group by
+					gle.company, gle.account, gle.fiscal_year, gle.{fieldname}, posting_month
+			""",
+			{
+				"company": filters.company,
+				"fiscal_year": filters.fiscal_year,
+				"accounts": tuple(filters.accounts or []),
+			},
+			as_dict=True,
+		):  # nosec
+			d.budget_against = dimension.get("document_type")
+			amounts.append(d)
+
+	return amounts
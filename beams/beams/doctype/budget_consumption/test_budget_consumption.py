@@ -0,0 +1,195 @@
+# Copyright (c) 2026, efeone and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, nowdate
+
+from beams.beams.doctype.budget_consumption.budget_consumption import (
+	CONSUMPTION_KEY,
+	reconcile_budget_consumption,
+)
+
+COMPANY = "_Test Company"
+COST_CENTER = "_Test Cost Center - _TC"
+EXPENSE_ACCOUNT = "_Test Account Cost for Goods Sold - _TC"
+ITEM_CODE = "_Test Non Stock Item"
+
+
+class TestBudgetConsumption(FrappeTestCase):
+	def setUp(self):
+		settings = frappe.get_single("Beams Accounts Settings")
+		settings.use_budget_consumption_ledger = 1
+		settings.save()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_material_request_to_purchase_invoice(self):
+		mr = make_material_request(qty=10, rate=100)
+		self.assertEqual(get_ledger_amounts(), (0, 1000, 0))
+
+		po = make_purchase_order_from_request(mr.name)
+		self.assertEqual(get_ledger_amounts(), (0, 0, 1000))
+
+		make_purchase_invoice_from_order(po.name)
+		self.assertEqual(get_ledger_amounts(), (1000, 0, 0))
+
+	def test_partial_order_keeps_the_open_request_amount(self):
+		mr = make_material_request(qty=10, rate=100)
+		make_purchase_order_from_request(mr.name, qty=4)
+		self.assertEqual(get_ledger_amounts(), (0, 600, 400))
+
+	def test_cancel_reverses_consumption(self):
+		mr = make_material_request(qty=10, rate=100)
+		po = make_purchase_order_from_request(mr.name)
+		pi = make_purchase_invoice_from_order(po.name)
+
+		pi.cancel()
+		self.assertEqual(get_ledger_amounts(), (0, 0, 1000))
+
+		po.reload()
+		po.cancel()
+		self.assertEqual(get_ledger_amounts(), (0, 1000, 0))
+
+		mr.reload()
+		mr.cancel()
+		self.assertEqual(get_ledger_amounts(), (0, 0, 0))
+
+	def test_amended_request_replaces_the_cancelled_amount(self):
+		mr = make_material_request(qty=10, rate=100)
+		mr.cancel()
+
+		amended = frappe.copy_doc(mr)
+		amended.amended_from = mr.name
+		amended.items[0].qty = 5
+		amended.insert()
+		self.assertEqual(get_ledger_amounts(), (0, 0, 0))
+
+		amended.submit()
+		self.assertEqual(get_ledger_amounts(), (0, 500, 0))
+
+	def test_reconcile_matches_incremental_ledger(self):
+		mr = make_material_request(qty=10, rate=100)
+		po = make_purchase_order_from_request(mr.name, qty=6)
+		make_purchase_invoice_from_order(po.name)
+		make_material_request(qty=3, rate=50)
+
+		incremental = get_ledger_snapshot()
+		self.assertTrue(incremental)
+
+		frappe.db.delete("Budget Consumption", {"company": COMPANY, "account": EXPENSE_ACCOUNT})
+		reconcile_budget_consumption(company=COMPANY, accounts=[EXPENSE_ACCOUNT])
+		self.assertEqual(get_ledger_snapshot(), incremental)
+
+	def test_reconcile_corrects_drifted_rows(self):
+		mr = make_material_request(qty=10, rate=100)
+		po = make_purchase_order_from_request(mr.name)
+		make_purchase_invoice_from_order(po.name)
+
+		expected = get_ledger_snapshot()
+		frappe.db.sql(
+			"""
+				update `tabBudget Consumption`
+				set actual_amount = actual_amount + 250, requested_amount = requested_amount + 75
+				where company = %s and account = %s
+			""",
+			(COMPANY, EXPENSE_ACCOUNT),
+		)
+		self.assertNotEqual(get_ledger_snapshot(), expected)
+
+		reconcile_budget_consumption(company=COMPANY, accounts=[EXPENSE_ACCOUNT])
+		self.assertEqual(get_ledger_snapshot(), expected)
+
+
+def make_material_request(qty, rate):
+	mr = frappe.get_doc(
+		{
+			"doctype": "Material Request",
+			"material_request_type": "Purchase",
+			"company": COMPANY,
+			"transaction_date": nowdate(),
+			"schedule_date": add_days(nowdate(), 7),
+			"items": [
+				{
+					"item_code": ITEM_CODE,
+					"qty": qty,
+					"rate": rate,
+					"uom": "_Test UOM",
+					"conversion_factor": 1,
+					"schedule_date": add_days(nowdate(), 7),
+					"warehouse": "_Test Warehouse - _TC",
+					"expense_account": EXPENSE_ACCOUNT,
+					"cost_center": COST_CENTER,
+				}
+			],
+		}
+	)
+	mr.insert()
+	mr.submit()
+	return mr
+
+
+def make_purchase_order_from_request(material_request, qty=None):
+	from erpnext.stock.doctype.material_request.material_request import make_purchase_order
+
+	po = make_purchase_order(material_request)
+	po.supplier = "_Test Supplier"
+	po.transaction_date = nowdate()
+	for item in po.items:
+		if qty:
+			item.qty = qty
+		item.expense_account = EXPENSE_ACCOUNT
+		item.cost_center = COST_CENTER
+	po.insert()
+	po.submit()
+	return po
+
+
+def make_purchase_invoice_from_order(purchase_order):
+	from erpnext.buying.doctype.purchase_order.purchase_order import make_purchase_invoice
+
+	pi = make_purchase_invoice(purchase_order)
+	pi.posting_date = nowdate()
+	pi.set_posting_time = 1
+	for item in pi.items:
+		item.expense_account = EXPENSE_ACCOUNT
+		item.cost_center = COST_CENTER
+	pi.insert()
+	pi.submit()
+	return pi
+
+
+def get_ledger_amounts():
+	'''
+		Returns the (actual, requested, ordered) amounts booked on the test cost center and account
+	'''
+	amounts = frappe.db.sql(
+		"""
+			select sum(actual_amount), sum(requested_amount), sum(ordered_amount)
+			from `tabBudget Consumption`
+			where company = %s and account = %s and budget_against = 'Cost Center' and budget_against_value = %s
+		""",
+		(COMPANY, EXPENSE_ACCOUNT, COST_CENTER),
+	)[0]
+	return tuple(flt(amount) for amount in amounts)
+
+
+def get_ledger_snapshot():
+	'''
+		Returns the non zero ledger amounts of the test account by key, item and voucher
+	'''
+	fields = CONSUMPTION_KEY + ["item_code", "voucher_type", "voucher_no"]
+	snapshot = {}
+	for row in frappe.get_all(
+		"Budget Consumption",
+		filters={"company": COMPANY, "account": EXPENSE_ACCOUNT},
+		fields=fields + ["actual_amount", "requested_amount", "ordered_amount"],
+	):
+		amounts = (flt(row.actual_amount), flt(row.requested_amount), flt(row.ordered_amount))
+		if any(amounts):
+			key = tuple(str(row.get(fieldname) or "") for fieldname in fields)
+			snapshot[key] = tuple(
+				flt(total + amount) for total, amount in zip(snapshot.get(key, (0, 0, 0)), amounts)
+			)
+	return snapshot
@@ -1,6 +1,9 @@
 # Copyright (c) 2024, efeone and contributors
 # For license information, please see license.txt
 
+from bisect import bisect_right
+from itertools import accumulate
+
 import frappe
 from frappe.model.document import Document
 from frappe.utils import getdate, nowdate, add_days
@@ -13,50 +16,91 @@ class CompensatoryLeaveLog(Document):
 def expire_leave_allocation():
     '''
     Expire leave allocations for all compensatory leave logs if no leave application exists.
+    Only logs not processed by an earlier run are checked, and each log is marked processed afterwards.
     '''
     today = getdate(nowdate())
 
-    # Fetch all compensatory leave logs that are older than 30 days
+    # Fetch the expired compensatory leave logs that are not processed yet
     logs = frappe.get_all('Compensatory Leave Log', filters={
-        'end_date': ('<=', today)
-    })
+        'end_date': ('<=', today),
+        'processed': 0
+    }, fields=['name', 'employee', 'leave_type', 'start_date', 'end_date'])
+    if not logs:
+        return
+
+    applications = get_leave_application_intervals(logs)
+    allocations = get_leave_allocations(logs)
 
+    # Number of expired leaves per allocation
+    expired_leaves = {}
     for log in logs:
-        log_doc = frappe.get_doc('Compensatory Leave Log', log.name)
-
-        # Fetch all leave applications for the same employee and leave type that are approved
-        leave_application = frappe.get_all('Leave Application', filters={
-            'employee': log_doc.employee,
-            'leave_type': log_doc.leave_type,
-            'docstatus': 1  # Approved leave applications
-        })
-
-        # Check if there is any leave application that overlaps with the compensatory leave
-        overlap_found = False
-        for application in leave_application:
-            leave_app_doc = frappe.get_doc('Leave Application', application.name)
-            leave_from = getdate(leave_app_doc.from_date)
-            leave_to = getdate(leave_app_doc.to_date)
-
-            # Check if the leave application period overlaps with the compensatory leave log period
-            if (leave_from <= log_doc.end_date and leave_to >= log_doc.start_date):
-                overlap_found = True
-                break
-
-        # If there is an overlap, do not reduce leave
-        if overlap_found:
+        key = (log.employee, log.leave_type)
+
+        # If a leave application overlaps with the compensatory leave, do not reduce leave
+        if has_overlapping_application(applications.get(key), log.start_date or log.end_date, log.end_date):
             continue
-        else:
-            # Fetch the leave allocation and reduce the leave
-            leave_allocation = frappe.get_all('Leave Allocation', filters={
-                'employee': log_doc.employee,
-                'leave_type': log_doc.leave_type
-            })
-
-            if leave_allocation:
-                leave_allocation_doc = frappe.get_doc('Leave Allocation', leave_allocation[0].name)
-
-                # Ensure we are not reducing the leave if it has already been reduced to 0 or below
-                if leave_allocation_doc.new_leaves_allocated > 0:
-                    leave_allocation_doc.new_leaves_allocated -= 1  # Decrease one leave from allocation
-                    leave_allocation_doc.save()
+        if allocations.get(key):
+            expired_leaves[allocations[key]] = expired_leaves.get(allocations[key], 0) + 1
+
+    for allocation, count in expired_leaves.items():
+        leave_allocation_doc = frappe.get_doc('Leave Allocation', allocation)
+
+        # Ensure we are not reducing the leave if it has already been reduced to 0 or below
+        expired = min(count, leave_allocation_doc.new_leaves_allocated)
+        if expired > 0:
+            leave_allocation_doc.new_leaves_allocated -= expired
+            leave_allocation_doc.save()
+
+    frappe.db.set_value(
+        'Compensatory Leave Log',
+        {'name': ('in', [log.name for log in logs])},
+        'processed',
+        1,
+        update_modified=False
+    )
+
+def get_leave_application_intervals(logs):
+    '''
+    Approved leave applications of the logs' employees and leave types within the logs' date range,
+    as (from dates, running maximum of to dates) sorted by from date per (employee, leave type).
+    '''
+    applications = frappe.get_all('Leave Application', filters={
+        'employee': ('in', list({log.employee for log in logs})),
+        'leave_type': ('in', list({log.leave_type for log in logs if log.leave_type})),
+        'from_date': ('<=', max(log.end_date for log in logs)),
+        'to_date': ('>=', min(log.start_date or log.end_date for log in logs)),
+        'docstatus': 1  # Approved leave applications
+    }, fields=['employee', 'leave_type', 'from_date', 'to_date'], order_by='from_date')
+
+    intervals = {}
+    for application in applications:
+        intervals.setdefault((application.employee, application.leave_type), []).append(
+            (getdate(application.from_date), getdate(application.to_date))
+        )
+
+    return {
+        key: ([from_date for from_date, to_date in dates], list(accumulate((to_date for from_date, to_date in dates), max)))
+        for key, dates in intervals.items()
+    }
+
+def has_overlapping_application(intervals, start_date, end_date):
+    '''
+    Check if any leave application period overlaps with the compensatory leave log period
+    '''
+    if not intervals:
+        return False
+    from_dates, max_to_dates = intervals
+    position = bisect_right(from_dates, getdate(end_date))
+    return bool(position) and max_to_dates[position - 1] >= getdate(start_date)
+
+def get_leave_allocations(logs):
+    '''
+    Leave allocation to reduce per (employee, leave type)
+    '''
+    allocations = {}
+    for allocation in frappe.get_all('Leave Allocation', filters={
+        'employee': ('in', list({log.employee for log in logs})),
+        'leave_type': ('in', list({log.leave_type for log in logs if log.leave_type}))
+    }, fields=['name', 'employee', 'leave_type']):
+        allocations.setdefault((allocation.employee, allocation.leave_type), allocation.name)
+    return allocations
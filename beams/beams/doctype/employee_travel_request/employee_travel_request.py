@@ -10,6 +10,7 @@ from frappe.model.document import Document
 from frappe.utils import get_url_to_form, today, getdate
 from frappe.utils import nowdate
 from beams.beams.doctype.trip_sheet.trip_sheet import get_last_odometer
+from beams.beams.permission_context import get_permission_context, has_any_role, match_condition, department_condition
 from frappe.utils.user import get_users_with_role
 from frappe.desk.form.assign_to import add as add_assign
 
@@ -578,31 +579,18 @@ def get_permission_query_conditions(user):
 	Returns:
 		str: SQL conditions or None for unrestricted access.
 	"""
-	if not user:
-		user = frappe.session.user
+	context = get_permission_context(user)
 
-	user_roles = frappe.get_roles(user)
-
-	if "Admin" in user_roles or "System Manager" in user_roles:
+	if has_any_role(context, "Admin", "System Manager"):
 		return None
 
 	conditions = []
 
-	if "HOD" in user_roles:
-		if frappe.db.exists("Employee",{"user_id":user}):
-			department = frappe.db.get_value("Employee", {"user_id": user}, "department")
-			if department:
-				conditions.append(f"""
-					EXISTS (
-						SELECT 1 FROM `tabEmployee` e
-						WHERE e.name = `tabEmployee Travel Request`.requested_by
-						AND e.department = '{department}'
-					)
-				""")
+	if "HOD" in context.roles and context.department:
+		conditions.append(department_condition("Employee Travel Request", "requested_by", context.department))
 
-	employee_id = frappe.db.get_value("Employee", {"user_id": user}, "name")
-	if employee_id:
-		conditions.append(f"`tabEmployee Travel Request`.requested_by = '{employee_id}'")
+	if context.employee:
+		conditions.append(match_condition("Employee Travel Request", "requested_by", context.employee))
 
 	if not conditions:
 		return "1=0"
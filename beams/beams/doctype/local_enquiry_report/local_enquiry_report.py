@@ -3,7 +3,7 @@
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import getdate, add_days, today, nowdate
+from frappe.utils import getdate, add_days, today, nowdate, now
 from frappe import _
 from frappe.utils.user import get_users_with_role
 from frappe.desk.form.assign_to import add as add_assign
@@ -113,6 +113,12 @@ class LocalEnquiryReport(Document):
             self.enquiry_completion_date = nowdate()
             self.save(ignore_permissions=True)
 
+def on_doctype_update():
+    '''
+        Index used by the daily overdue sweep
+    '''
+    frappe.db.add_index('Local Enquiry Report', ['status', 'expected_completion_date'])
+
 def update_job_applicant_status(job_applicant, status):
     '''
         Method to set Job Applicant Status
@@ -123,29 +129,27 @@ def update_job_applicant_status(job_applicant, status):
 @frappe.whitelist()
 def set_status_to_overdue():
     '''
-        This function updates the status of Local Enquiry Reports. It sets the status to 'Overdue' for reports where the expected completion date is today or earlier,
-        the enquiry completion date is not set or is later than the expected completion date, and the current status is not already 'Overdue'.
+        This function updates the status of Local Enquiry Reports. It sets the status to 'Overdue' for reports where the expected completion date is earlier than today,
+        the enquiry completion date is not set, and the current status is not already 'Overdue'.
+        The reports are selected with a condition that can use the (status, expected_completion_date) index and updated by name.
+        Returns the number of reports set to Overdue.
     '''
-    today_date = getdate(today())
-
-    # Fetch Local Enquiry Reports with expected completion date on or before today and status not set to 'Overdue'
-    enquiries = frappe.get_all('Local Enquiry Report', filters={
-        'status': ['!=', 'Overdue']
-    }, fields=['name', 'expected_completion_date','enquiry_completion_date'])
-    
+    # Fetch Local Enquiry Reports with expected completion date before today and status not set to 'Overdue'
+    enquiries = frappe.db.sql('''
+        SELECT name
+        FROM `tabLocal Enquiry Report`
+        WHERE (status != 'Overdue' OR status IS NULL)
+            AND expected_completion_date < %(today)s
+            AND enquiry_completion_date IS NULL
+    ''', {'today': getdate(today())}, pluck=True)
 
     if enquiries:
-        for enquiry in enquiries:
-            expected_date = getdate(enquiry.expected_completion_date)if enquiry.expected_completion_date else None
-            completion_date = getdate(enquiry.enquiry_completion_date) if enquiry.enquiry_completion_date else None
-            if not expected_date:
-                continue
-            if expected_date and expected_date < today_date and not completion_date  :
-                frappe.db.set_value('Local Enquiry Report', enquiry.name, 'status', 'Overdue')
-
-
-
-
+        frappe.db.sql('''
+            UPDATE `tabLocal Enquiry Report`
+            SET status = 'Overdue', modified = %(modified)s, modified_by = %(user)s
+            WHERE name IN %(enquiries)s
+        ''', {'modified': now(), 'user': frappe.session.user, 'enquiries': enquiries})
+    return len(enquiries)
 
 @frappe.whitelist()
 def assign_doc_by_role(doc, role, message):
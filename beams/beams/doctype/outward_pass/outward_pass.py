@@ -4,6 +4,7 @@
 import frappe
 import json
 from frappe.model.document import Document
+from beams.beams.doctype.asset_bundle.asset_bundle import bundle_asset_fetch as asset_bundle_fetch
 
 class OutwardPass(Document):
        pass
@@ -13,27 +14,4 @@ def bundle_asset_fetch(names):
     """
     Fetches assets and processed bundles recursively from given asset bundle names
     """
-    names = json.loads(names)
-    assets = set()
-    processed_bundles = set()
-
-    def get_assets_recursive(bundle_name):
-        if bundle_name in processed_bundles:
-            return
-        processed_bundles.add(bundle_name)
-
-        if not frappe.db.exists("Asset Bundle", bundle_name):
-            frappe.throw(f"Asset Bundle '{bundle_name}' not found during processing.")
-
-        asset_bundle = frappe.get_doc("Asset Bundle", bundle_name)
-        assets.update(asset_bundle.assets)
-
-        for sub_bundle in asset_bundle.bundles:
-            get_assets_recursive(sub_bundle.asset_bundle)
-
-    for name in names:
-        if not frappe.db.exists("Asset Bundle", name):
-            frappe.throw(f"Asset Bundle '{name}' not found. Please check the name.")
-        get_assets_recursive(name)
-
-    return list(assets), list(processed_bundles)
+    return asset_bundle_fetch(names)
@@ -6,6 +6,7 @@ from frappe.utils import today, getdate
 from frappe.model.document import Document
 from frappe.utils import add_days
 from frappe.desk.form.assign_to import add as add_assign
+from beams.beams.permission_context import get_permission_context, has_any_role, match_condition
 
 class ShiftSwapRequest(Document):
 	def validate(self):
@@ -214,21 +215,16 @@ def get_permission_query_conditions(user):
 	- HOD can access requests within their department.
 	- Employees can access their own requests and those where they are the swap_with_employee.
 	'''
-	if not user: 
-		user = frappe.session.user
-	
-	user_roles = frappe.get_roles(user)
+	context = get_permission_context(user)
 
-	if user == "Administrator" or "System Manager" in user_roles or "HR Manager" in user_roles or "CEO" in user_roles:
+	if context.user == "Administrator" or has_any_role(context, "System Manager", "HR Manager", "CEO"):
 		return None
-	
-	if "HOD" in user_roles:
-		department = frappe.db.get_value("Employee", {"user_id": user}, "department")
-		if department:
-			return f"`tabShift Swap Request`.department = '{department}'"
-
-	if "Employee" in user_roles:
-		employee = frappe.db.get_value("Employee", {"user_id": user}, "name")
-		if employee:
-			return f"""(`tabShift Swap Request`.employee = '{employee}' 
-					 OR `tabShift Swap Request`.swap_with_employee = '{employee}')"""
+
+	if "HOD" in context.roles and context.department:
+		return match_condition("Shift Swap Request", "department", context.department)
+
+	if "Employee" in context.roles and context.employee:
+		return "({0} OR {1})".format(
+			match_condition("Shift Swap Request", "employee", context.employee),
+			match_condition("Shift Swap Request", "swap_with_employee", context.employee)
+		)
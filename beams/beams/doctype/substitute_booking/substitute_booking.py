@@ -10,6 +10,7 @@ from frappe.utils import getdate, add_days, date_diff
 import json
 from datetime import datetime, date, timedelta
 from frappe.utils import getdate
+from beams.beams.allocation_conflicts import get_allocation_index
 
 
 class SubstituteBooking(Document):
@@ -109,37 +110,6 @@ class SubstituteBooking(Document):
         else:
             self.total_wage = 0
 
-    @frappe.whitelist()
-    def check_leave_application(employee, dates):
-        '''
-            Checks leave applications for specified dates of an employee.
-        '''    
-        import json
-        dates = json.loads(dates)
-        leave_applications = {}
-        missing_dates = []
-
-        for date in dates:
-            formatted_date = getdate(date)
-
-            # Check if there is any approved leave application covering the date
-            leave_records = frappe.get_all('Leave Application', filters={
-                'employee': employee,
-                'status': 'Approved',
-                'from_date': ('<=', formatted_date),
-                'to_date': ('>=', formatted_date)
-            }, fields=['name', 'from_date', 'to_date'])
-
-            if leave_records:
-                leave_applications[date] = leave_records
-            else:
-                missing_dates.append(date)
-        return {
-            'leave_applications': leave_applications,
-            'missing_dates': missing_dates
-        }
-
-
     def after_insert(self):
         self.create_todo_on_creation_for_substitute_booking()
 
@@ -158,56 +128,92 @@ class SubstituteBooking(Document):
             })
 
     def validate_duplicate_assignment(self):
+        dates = [getdate(row.date) for row in self.substitution_bill_date if row.date]
+        if not dates:
+            return
+
+        # Get other Substitute Bookings for the same 'substituting_for' within the booked dates
+        booking_index = get_allocation_index(
+            "substitute", [self.substituting_for], min(dates), max(dates), exclude_parent=self.name
+        )
+
         # Iterate over each row in the child table 'substitution_bill_date'
         for row in self.substitution_bill_date:
-            # Check if any other Substitute Booking exists for the same 'substituting_for' and 'date'
-            duplicate_exists = frappe.db.sql("""
-                SELECT
-                    parent
-                FROM
-                    `tabSubstitute Booking`
-                INNER JOIN
-                    `tabSubstitution Bill Date` as sbd
-                ON
-                    sbd.parent = `tabSubstitute Booking`.name
-                WHERE
-                    `tabSubstitute Booking`.substituting_for = %s
-                AND
-                    sbd.date = %s
-                AND
-                    `tabSubstitute Booking`.name != %s
-            """, (self.substituting_for, row.date, self.name))
-
             # If a duplicate is found, raise an error
-            if duplicate_exists:
+            if row.date and booking_index.get_first_overlap(self.substituting_for, getdate(row.date), getdate(row.date)):
                 frappe.throw(_("A substitute is already assigned for {0} on {1}. No duplicate bookings are allowed.")
                              .format(self.substituting_for, row.date))
 
 
 @frappe.whitelist()
 def check_leave_application(employee, dates):
-    dates = json.loads(dates)  # Parse JSON string into Python list of dates
-    leave_applications = {}
-    missing_dates = []
-
-    # Loop through the provided dates and check for approved leave applications
-    for date in dates:
-        approved_leaves = frappe.get_all("Leave Application",
-            filters={
-                "employee": employee,
-                "status": "Approved",
-                "from_date": ["<=", date],
-                "to_date": [">=", date]
-            },
-            fields=["name", "from_date", "to_date"]
-        )
-
-        if approved_leaves:
-            leave_applications[date] = approved_leaves  # Store approved leaves by date
-        else:
-            missing_dates.append(date)  # No approved leave found for this date
+    '''
+        Checks approved leave applications of an employee for the given dates (JSON list).
+    '''
+    return check_leave_applications(json.dumps([employee]), dates)[employee]
 
-    return {
-        "leave_applications": leave_applications,
-        "missing_dates": missing_dates
-    }
+@frappe.whitelist()
+def check_leave_applications(employees, dates):
+    '''
+        Checks approved leave applications of several employees (JSON list) for the given dates (JSON list).
+        Returns the covering leave applications by date and the dates without any, per employee.
+    '''
+    employees = json.loads(employees) if isinstance(employees, str) else employees
+    dates = json.loads(dates) if isinstance(dates, str) else dates
+    coverage = get_leave_coverage(employees, dates)
+
+    result = {}
+    for employee in employees:
+        leave_applications = {}
+        missing_dates = []
+        for day_str in dates:
+            if coverage[employee].get(day_str):
+                leave_applications[day_str] = coverage[employee][day_str]  # Store approved leaves by date
+            else:
+                missing_dates.append(day_str)  # No approved leave found for this date
+        result[employee] = {
+            "leave_applications": leave_applications,
+            "missing_dates": missing_dates
+        }
+    return result
+
+def get_leave_coverage(employees, dates):
+    '''
+        Maps each date to the approved leave applications covering it, per employee.
+        All leaves intersecting the date range are fetched in one query and matched with a sorted sweep.
+    '''
+    coverage = {employee: {} for employee in employees}
+    valid_dates = [day_str for day_str in dates if day_str]
+    if not employees or not valid_dates:
+        return coverage
+
+    approved_leaves = frappe.get_all("Leave Application",
+        filters={
+            "employee": ["in", employees],
+            "status": "Approved",
+            "from_date": ["<=", max(getdate(day_str) for day_str in valid_dates)],
+            "to_date": [">=", min(getdate(day_str) for day_str in valid_dates)]
+        },
+        fields=["name", "employee", "from_date", "to_date"],
+        order_by="from_date asc"
+    )
+
+    leaves_by_employee = {}
+    for leave in approved_leaves:
+        leaves_by_employee.setdefault(leave.employee, []).append(leave)
+
+    sorted_dates = sorted(valid_dates, key=getdate)
+    for employee, leaves in leaves_by_employee.items():
+        active, position = [], 0
+        for day_str in sorted_dates:
+            day = getdate(day_str)
+            # Start the leaves beginning on or before the date and drop the ones already ended
+            while position < len(leaves) and getdate(leaves[position].from_date) <= day:
+                active.append(leaves[position])
+                position += 1
+            active = [leave for leave in active if getdate(leave.to_date) >= day]
+            if active:
+                coverage[employee][day_str] = [
+                    {"name": leave.name, "from_date": leave.from_date, "to_date": leave.to_date} for leave in active
+                ]
+    return coverage
@@ -9,6 +9,7 @@ from frappe.model.mapper import get_mapped_doc
 from frappe.utils import today
 from frappe.utils import get_datetime
 from datetime import datetime
+from beams.beams.allocation_conflicts import get_allocation_index
 
 class TechnicalRequest(Document):
 	def before_save(self):
@@ -146,35 +147,37 @@ class TechnicalRequest(Document):
 		if not self.project:
 			return
 
-		# Get allocated manpower for all projects
-		allocated_rows = frappe.get_all(
-			"Allocated Manpower Detail",
-			fields=["parent", "employee", "assigned_from", "assigned_to"]
-		)
-
-		for row in self.required_employees:
-			if not row.employee:
-				continue
-
-			for alloc in allocated_rows:
-				# Skip if same project
-				if alloc.parent == self.project:
-					continue
+		rows = [
+			row for row in self.required_employees
+			if row.employee and row.required_from and row.required_to
+		]
+		if not rows:
+			return
 
-				if alloc.employee != row.employee:
-					continue
+		# Get allocated manpower of other projects overlapping the requested period
+		allocation_index = get_allocation_index(
+			"employee",
+			[row.employee for row in rows],
+			min(get_datetime(row.required_from) for row in rows),
+			max(get_datetime(row.required_to) for row in rows),
+			exclude_parent=self.project
+		)
 
-				# Check overlapping dates
-				if (alloc.assigned_from <= row.required_to) and (alloc.assigned_to >= row.required_from):
-					employee_name = frappe.get_value("Employee", row.employee, "employee_name")
-					frappe.throw(
-						title="Allocation Error",
-						msg=(
-							f"Employee {employee_name} ({row.employee}) is already allocated "
-							f"in Project {alloc.parent} during the same time period "
-							f"({alloc.assigned_from} to {alloc.assigned_to})."
-						)
+		for row in rows:
+			# Check overlapping dates
+			alloc = allocation_index.get_first_overlap(
+				row.employee, get_datetime(row.required_from), get_datetime(row.required_to)
+			)
+			if alloc:
+				employee_name = frappe.get_value("Employee", row.employee, "employee_name")
+				frappe.throw(
+					title="Allocation Error",
+					msg=(
+						f"Employee {employee_name} ({row.employee}) is already allocated "
+						f"in Project {alloc.parent} during the same time period "
+						f"({alloc.from_date} to {alloc.to_date})."
 					)
+				)
 
 
 @frappe.whitelist()
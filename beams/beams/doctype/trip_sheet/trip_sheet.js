@@ -70,40 +70,17 @@ frappe.ui.form.on('Trip Sheet', {
 					}
 				});
 
+		// Only requests not referenced by a submitted Trip Sheet
 		frm.set_query('transportation_requests', function () {
 			return {
-				filters: {
-					name: ['not in', get_selected_requests('Transportation Request Details', 'transportation_request')]
-				}
+				query: 'beams.beams.doctype.trip_sheet.trip_sheet.get_unselected_requests'
 			};
 		});
 		frm.set_query('travel_requests', function () {
 			return {
-				filters: {
-					name: ['not in', get_selected_requests('Employee Travel Request Details', 'employee_travel_request')]
-				}
+				query: 'beams.beams.doctype.trip_sheet.trip_sheet.get_unselected_requests'
 			};
 		});
-
-
-		function get_selected_requests(child_table, fieldname) {
-			let selected_requests = [];
-			frappe.call({
-				method: 'beams.beams.doctype.trip_sheet.trip_sheet.get_selected_requests',
-				args: {
-					child_table: child_table,
-					fieldname: fieldname
-				},
-				async: false,
-				callback: function (response) {
-					if (response && response.message) {
-						selected_requests = response.message;
-					}
-				}
-			});
-
-			return selected_requests;
-		}
 	},
 	driver: function (frm) {
 		frm.set_query('travel_requests', function () {
@@ -6,6 +6,7 @@ from frappe.utils import get_datetime
 from frappe.utils import today
 from frappe import _
 from frappe.utils import getdate
+from frappe.desk.reportview import get_filters_cond, get_match_cond
 
 class TripSheet(Document):
 	def validate(self):
@@ -26,6 +27,31 @@ class TripSheet(Document):
 
 	def on_submit(self):
 		self.validate_final_odometer_reading()
+		self.update_vehicle_last_odometer()
+
+	def on_cancel(self):
+		self.update_vehicle_last_odometer()
+
+	def update_vehicle_last_odometer(self):
+		'''
+		Keep the last odometer of the Vehicle at the final reading of its latest submitted Trip Sheet.
+		When the only submitted Trip Sheet is cancelled, the reading it started from is restored.
+		'''
+		if not self.vehicle:
+			return
+		latest = frappe.db.sql("""
+			SELECT final_odometer_reading
+			FROM `tabTrip Sheet`
+			WHERE vehicle = %(vehicle)s AND docstatus = 1
+			ORDER BY starting_date_and_time DESC, creation DESC
+			LIMIT 1
+		""", {"vehicle": self.vehicle}, as_dict=True)
+		if latest:
+			last_odometer = latest[0].final_odometer_reading
+		else:
+			last_odometer = self.initial_odometer_reading
+		if last_odometer is not None:
+			frappe.db.set_value("Vehicle", self.vehicle, "last_odometer", last_odometer)
 
 	def validate_final_odometer_reading(self):
 		if self.final_odometer_reading is None:
@@ -130,22 +156,25 @@ class TripSheet(Document):
 
 
 
+def on_doctype_update():
+	frappe.db.add_index("Trip Sheet", ["vehicle", "docstatus", "starting_date_and_time"])
+
+
 @frappe.whitelist()
 def get_last_odometer(vehicle):
+	'''
+	Last odometer of the vehicle, kept on the Vehicle by Trip Sheet submit and cancel.
+	'''
 	if not vehicle:
 		return 0
+	return frappe.db.get_value("Vehicle", vehicle, "last_odometer") or 0
 
-	final_odometer = frappe.db.get_value(
-		"Trip Sheet",
-		{"vehicle": vehicle, "docstatus": 1},
-		"final_odometer_reading",
-		order_by="starting_date_and_time desc"
-	)
 
-	if final_odometer is not None:
-		return final_odometer or 0
-	vehicle_odometer = frappe.db.get_value("Vehicle", vehicle, "last_odometer") or 0
-	return vehicle_odometer
+# Trip Sheet request tables, by the requested doctype
+SELECTED_REQUEST_TABLES = {
+	"Transportation Request": ("Transportation Request Details", "transportation_request"),
+	"Employee Travel Request": ("Employee Travel Request Details", "employee_travel_request"),
+}
 
 
 @frappe.whitelist()
@@ -153,29 +182,71 @@ def get_selected_requests(child_table, fieldname):
 	'''
 	Retrieve specific field values from a child table for submitted Trip Sheet documents.
 
-	This function collects values from the specified field in a child table where the parent
-	document belongs to the "Trip Sheet" doctype and is in the submitted state (docstatus=1).
-	The values are returned as a list.
-
 	Args:
 		child_table (str): The name of the child table to retrieve data from.
 		fieldname (str): The field in the child table whose values need to be fetched.
 	Returns:
 		list: A list of values from the specified field. If no matching records are found or the field is empty, an empty list is returned..
 	'''
-	selected_requests = []
-	eligible_parents = frappe.db.get_all("Trip Sheet", {"docstatus": 1}, pluck="name")
-	result = frappe.db.get_all(
-		child_table,
-		filters={"parent": ["in", eligible_parents]},
-		fields=[fieldname]
-	)
+	if (child_table, fieldname) not in SELECTED_REQUEST_TABLES.values():
+		frappe.throw(_("Invalid request table {0}").format(child_table))
 
-	for doc in result:
-		if doc.get(fieldname):
-			selected_requests.append(doc.get(fieldname))
+	return frappe.db.sql_list("""
+		SELECT DISTINCT child.`{fieldname}`
+		FROM `tab{child_table}` child
+		INNER JOIN `tabTrip Sheet` ts ON ts.name = child.parent
+		WHERE child.parenttype = 'Trip Sheet'
+			AND ts.docstatus = 1
+			AND IFNULL(child.`{fieldname}`, '') != ''
+	""".format(child_table=child_table, fieldname=fieldname))
 
-	return selected_requests
+
+@frappe.whitelist()
+@frappe.validate_and_sanitize_search_inputs
+def get_unselected_requests(doctype, txt, searchfield, start, page_len, filters):
+	'''
+	Link query of the requests not yet referenced by a submitted Trip Sheet.
+	Matches the text against the name, title and search fields of the doctype and applies the user's permission conditions.
+	'''
+	if doctype not in SELECTED_REQUEST_TABLES:
+		return []
+	child_table, fieldname = SELECTED_REQUEST_TABLES[doctype]
+
+	meta = frappe.get_meta(doctype)
+	search_fields = meta.get_search_fields()
+	if meta.title_field and meta.title_field not in search_fields:
+		search_fields.append(meta.title_field)
+	search_fields = [field for field in search_fields if field == "name" or meta.has_field(field)]
+
+	return frappe.db.sql("""
+		SELECT {columns}
+		FROM `tab{doctype}`
+		WHERE ({search_conditions})
+			AND NOT EXISTS (
+				SELECT 1
+				FROM `tab{child_table}` child
+				INNER JOIN `tabTrip Sheet` ts ON ts.name = child.parent
+				WHERE child.`{fieldname}` = `tab{doctype}`.name
+					AND child.parenttype = 'Trip Sheet'
+					AND ts.docstatus = 1
+			)
+			{filter_conditions}
+			{match_conditions}
+		ORDER BY `tab{doctype}`.name
+		LIMIT %(start)s, %(page_len)s
+	""".format(
+		doctype=doctype,
+		child_table=child_table,
+		fieldname=fieldname,
+		columns=", ".join(f"`tab{doctype}`.`{field}`" for field in search_fields),
+		search_conditions=" OR ".join(f"`tab{doctype}`.`{field}` LIKE %(txt)s" for field in search_fields),
+		filter_conditions=get_filters_cond(doctype, filters, []),
+		match_conditions=get_match_cond(doctype),
+	), {
+		"txt": f"%{txt}%",
+		"start": start,
+		"page_len": page_len,
+	})
 
 @frappe.whitelist()
 def create_vehicle_incident_record(trip_sheet):
@@ -1,9 +1,23 @@
 # Copyright (c) 2025, efeone and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import cint
 
 
 class VehicleDocument(Document):
-	pass
+	def on_update(self):
+		if self.has_value_changed("reminder_before"):
+			update_next_reminder_dates(self.name, self.reminder_before)
+
+
+def update_next_reminder_dates(document, reminder_before):
+	'''
+		Recompute the next reminder date of every vehicle document row of the given Vehicle Document
+	'''
+	frappe.db.sql("""
+		UPDATE `tabVehicle Documents`
+		SET next_reminder_date = DATE_SUB(expiry_date, INTERVAL %(days)s DAY)
+		WHERE document = %(document)s
+	""", {"document": document, "days": cint(reminder_before)})
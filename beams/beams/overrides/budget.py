@@ -11,50 +11,20 @@ from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 )
 from erpnext.accounts.utils import get_fiscal_year
 
+MONTHS = [
+	"january", "february", "march", "april", "may", "june",
+	"july", "august", "september", "october", "november", "december"
+]
+
 def validate_expense_against_budget(args, expense_amount=0, for_check=0):
 	args = frappe._dict(args)
 	if not frappe.get_all("Budget", limit=1):
 		return
 
-
-	if args.get("company") and not args.fiscal_year:
-		args.fiscal_year = get_fiscal_year(args.get("posting_date"), company=args.get("company"))[0]
-		frappe.flags.exception_approver_role = frappe.get_cached_value(
-			"Company", args.get("company"), "exception_budget_approver_role"
-		)
-
-
-	if not frappe.get_cached_value("Budget", {"fiscal_year": args.fiscal_year, "company": args.company}):  # nosec
+	if not set_budget_args(args):
 		return
 
-
-
-	if not args.account:
-		args.account = args.get("expense_account")
-
-	if not (args.get("account") and args.get("cost_center")) and args.item_code:
-		args.cost_center, args.account = get_item_details(args)
-
-	if not args.account:
-		return
-
-
-	default_dimensions = [
-		{
-			"fieldname": "project",
-			"document_type": "Project",
-		},
-		{
-			"fieldname": "cost_center",
-			"document_type": "Cost Center",
-		},
-		{
-			"fieldname": "department",
-			"document_type": "Department",
-		},
-	]
-
-	for dimension in default_dimensions + get_accounting_dimensions(as_list=False):
+	for dimension in get_budget_dimensions():
 		budget_against = dimension.get("fieldname")
 
 		if (
@@ -102,12 +72,458 @@ def validate_expense_against_budget(args, expense_amount=0, for_check=0):
 				validate_budget_records(args, budget_records, expense_amount, for_check)
 
 
+
+def set_budget_args(args):
+	"""
+		Resolve the fiscal year and expense account of a budget check.
+		Returns False when no budget can apply to the given args.
+	"""
+	if args.get("company") and not args.fiscal_year:
+		args.fiscal_year = get_fiscal_year(args.get("posting_date"), company=args.get("company"))[0]
+		frappe.flags.exception_approver_role = frappe.get_cached_value(
+			"Company", args.get("company"), "exception_budget_approver_role"
+		)
+
+	if not frappe.get_cached_value("Budget", {"fiscal_year": args.fiscal_year, "company": args.company}):  # nosec
+		return False
+
+	if not args.account:
+		args.account = args.get("expense_account")
+
+	if not (args.get("account") and args.get("cost_center")) and args.item_code:
+		args.cost_center, args.account = get_item_details(args)
+
+	return bool(args.account)
+
+
+def get_budget_dimensions():
+	"""
+		Returns the default budget dimensions followed by the accounting dimensions.
+	"""
+	default_dimensions = [
+		{
+			"fieldname": "project",
+			"document_type": "Project",
+		},
+		{
+			"fieldname": "cost_center",
+			"document_type": "Cost Center",
+		},
+		{
+			"fieldname": "department",
+			"document_type": "Department",
+		},
+	]
+
+	return default_dimensions + get_accounting_dimensions(as_list=False)
+
+
+def validate_document_against_budget(doc, for_check=1):
+	"""
+		Batched budget check for all item rows of a Purchase Order or Material Request.
+		Rows are grouped by (account, dimension value, fiscal year); budget records and the actual,
+		requested and ordered amounts are loaded with a fixed number of grouped queries per dimension
+		and every row is then evaluated in memory with the same Stop/Warn rules as
+		validate_expense_against_budget.
+	"""
+	if not doc.get("items") or not frappe.get_all("Budget", limit=1):
+		return
+
+	posting_date = doc.schedule_date if doc.doctype == "Material Request" else doc.transaction_date
+
+	rows = []
+	for item in doc.get("items"):
+		args = frappe._dict(item.as_dict())
+		args.update(
+			{
+				"object": doc,
+				"doctype": doc.doctype,
+				"company": doc.company,
+				"posting_date": posting_date,
+			}
+		)
+		if set_budget_args(args):
+			rows.append(args)
+
+	if not rows:
+		return
+
+	unsubmitted_amounts = get_unsubmitted_amounts(doc)
+
+	for dimension in get_budget_dimensions():
+		budget_against = dimension.get("fieldname")
+		dimension_rows = [
+			args
+			for args in rows
+			if args.get(budget_against)
+			and frappe.get_cached_value("Account", args.account, "root_type") == "Expense"
+		]
+
+		if dimension_rows:
+			validate_dimension_rows(
+				dimension_rows, budget_against, dimension.get("document_type"), unsubmitted_amounts, for_check
+			)
+
+
+def validate_dimension_rows(rows, budget_against, doctype, unsubmitted_amounts, for_check):
+	"""
+		Evaluate all rows sharing a budget dimension against the budgets loaded for that dimension.
+	"""
+	from beams.beams.doctype.budget_consumption.budget_consumption import (
+		get_budget_consumption_map,
+		get_row_consumption,
+		is_ledger_enabled,
+	)
+
+	is_tree = bool(frappe.get_cached_value("DocType", doctype, "is_tree"))
+	values = list({args.get(budget_against) for args in rows})
+	tree_bounds = get_tree_bounds(doctype, values) if is_tree else {}
+
+	budget_records = get_budget_records_for_rows(rows, budget_against, doctype, tree_bounds)
+	if not budget_records:
+		return
+
+	month_end_date = get_last_day(rows[0].posting_date)
+	use_ledger = is_ledger_enabled()
+	if use_ledger:
+		consumption = get_budget_consumption_map(rows, budget_against, doctype, tree_bounds, month_end_date)
+	else:
+		actual_expenses = get_actual_expense_map(rows, budget_against, doctype, tree_bounds, month_end_date)
+		ordered_amounts = get_open_amount_map("Purchase Order", rows, budget_against, values)
+		requested_amounts = (
+			get_open_amount_map("Material Request", rows, budget_against, values)
+			if rows[0].doctype == "Material Request"
+			else {}
+		)
+
+	for args in rows:
+		args.budget_against_field = budget_against
+		args.budget_against_doctype = doctype
+		args.is_tree = is_tree
+
+		value = args.get(budget_against)
+		bounds = tree_bounds.get(value)
+		for budget in budget_records.get((args.fiscal_year, args.account), []):
+			if is_tree:
+				if not bounds or not (budget.lft <= bounds.lft and budget.rgt >= bounds.rgt):
+					continue
+			elif budget.budget_against != value:
+				continue
+
+			if use_ledger:
+				consumed = get_row_consumption(args, consumption, bounds, is_tree)
+				actual_expense = {"annual": consumed.annual, "monthly": consumed.monthly}
+				requested_amount, ordered_amount = consumed.requested, consumed.ordered
+			else:
+				open_key = (args.item_code, args.expense_account, value, args.fiscal_year)
+				actual_expense = get_row_actual_expense(args, actual_expenses, bounds, is_tree)
+				requested_amount = flt(requested_amounts.get(open_key))
+				ordered_amount = flt(ordered_amounts.get(open_key))
+
+			snapshot = frappe._dict(
+				{
+					"actual_expense": actual_expense,
+					"requested_amount": requested_amount + unsubmitted_amounts.requested_amount,
+					"ordered_amount": ordered_amount,
+					"unsubmitted_ordered_amount": unsubmitted_amounts.ordered_amount,
+				}
+			)
+			validate_budget_snapshot(args, budget, snapshot, for_check)
+
+
+def validate_budget_snapshot(args, budget, snapshot, for_check):
+	"""
+		In-memory counterpart of validate_budget_records for a single budget record.
+	"""
+	if not flt(budget.budget_amount):
+		return
+
+	yearly_action, monthly_action = get_actions(args, budget)
+	args["for_material_request"] = budget.for_material_request
+	args["for_purchase_order"] = budget.for_purchase_order
+
+	if yearly_action in ("Stop", "Warn"):
+		# Annual check does not pass for_check, as in validate_budget_records
+		args.month_end_date = None
+		set_snapshot_amounts(args, snapshot, "annual", 0)
+		check_expense_against_budget(
+			args,
+			flt(budget.budget_amount),
+			_("Annual"),
+			yearly_action,
+			budget.budget_against,
+			get_committed_amount(args),
+		)
+
+	if monthly_action in ["Stop", "Warn"]:
+		budget_amount = get_accumulated_monthly_amount(budget, args.fiscal_year, args.posting_date)
+
+		args["month_end_date"] = get_last_day(args.posting_date)
+		set_snapshot_amounts(args, snapshot, "monthly", for_check)
+		check_expense_against_budget(
+			args,
+			budget_amount,
+			_("Accumulated Monthly"),
+			monthly_action,
+			budget.budget_against,
+			get_committed_amount(args),
+			for_check,
+		)
+
+
+def set_snapshot_amounts(args, snapshot, period, for_check):
+	"""
+		Copy the preloaded amounts of a row into args for the annual or monthly check.
+	"""
+	args.actual_expense = snapshot.actual_expense[period]
+	args.requested_amount = snapshot.requested_amount
+	args.ordered_amount = snapshot.ordered_amount
+	if args.get("doctype") == "Purchase Order" and for_check:
+		args.ordered_amount += snapshot.unsubmitted_ordered_amount
+
+
+def get_unsubmitted_amounts(doc):
+	"""
+		Returns the requested and ordered amounts of the document being validated.
+	"""
+	amounts = frappe._dict({"requested_amount": 0, "ordered_amount": 0})
+
+	for item in doc.get("items"):
+		if doc.doctype == "Material Request":
+			amounts.requested_amount += (flt(item.stock_qty) - flt(item.ordered_qty)) * flt(item.rate)
+		elif doc.doctype == "Purchase Order":
+			amounts.ordered_amount += flt(item.amount) - flt(item.billed_amt)
+
+	return amounts
+
+
+def get_tree_bounds(doctype, values):
+	"""
+		Returns {name: {lft, rgt}} for the given nodes of a tree doctype.
+	"""
+	return {
+		d.name: d
+		for d in frappe.get_all(doctype, filters={"name": ["in", values]}, fields=["name", "lft", "rgt"])
+	}
+
+
+def get_budget_records_for_rows(rows, budget_against, doctype, tree_bounds):
+	"""
+		Load every submitted budget applicable to the rows in one query.
+		Returns {(fiscal_year, account): [budget records]}.
+	"""
+	filters = {
+		"fiscal_years": tuple({args.fiscal_year for args in rows}),
+		"accounts": tuple({args.account for args in rows}),
+	}
+
+	if tree_bounds:
+		# Budgets set on the node itself or on any of its ancestors
+		tree_fields = ", d.lft, d.rgt"
+		tree_join = f"inner join `tab{doctype}` d on d.name = b.{budget_against}"
+		conditions = "and ({})".format(
+			" or ".join(
+				f"(d.lft <= {int(bounds.lft)} and d.rgt >= {int(bounds.rgt)})" for bounds in tree_bounds.values()
+			)
+		)
+	elif frappe.get_cached_value("DocType", doctype, "is_tree"):
+		return {}
+	else:
+		tree_fields, tree_join = "", ""
+		conditions = f"and b.{budget_against} in %(values)s"
+		filters["values"] = tuple({args.get(budget_against) for args in rows})
+
+	month_fields = ", ".join(f"ba.{month}" for month in MONTHS)
+	budget_records = frappe.db.sql(
+		f"""
+		select
+			b.name, b.fiscal_year, ba.account, b.{budget_against} as budget_against{tree_fields},
+			ba.budget_amount, {month_fields}, b.monthly_distribution,
+			ifnull(b.applicable_on_material_request, 0) as for_material_request,
+			ifnull(b.applicable_on_purchase_order, 0) as for_purchase_order,
+			ifnull(b.applicable_on_booking_actual_expenses,0) as for_actual_expenses,
+			b.action_if_annual_budget_exceeded, b.action_if_accumulated_monthly_budget_exceeded,
+			b.action_if_annual_budget_exceeded_on_mr, b.action_if_accumulated_monthly_budget_exceeded_on_mr,
+			b.action_if_annual_budget_exceeded_on_po, b.action_if_accumulated_monthly_budget_exceeded_on_po
+		from
+			`tabBudget` b
+			inner join `tabBudget Account` ba on b.name = ba.parent and ba.parentfield = 'accounts'
+			{tree_join}
+		where
+			b.fiscal_year in %(fiscal_years)s
+			and ba.account in %(accounts)s
+			and b.docstatus = 1
+			{conditions}
+	""",
+		filters,
+		as_dict=True,
+	)  # nosec
+
+	budget_map = {}
+	for budget in budget_records:
+		budget_map.setdefault((budget.fiscal_year, budget.account), []).append(budget)
+
+	return budget_map
+
+
+def get_actual_expense_map(rows, budget_against, doctype, tree_bounds, month_end_date):
+	"""
+		Load GL Entry actuals for all rows in one grouped query.
+		Returns {(account, fiscal_year): [entries]} where every entry carries the annual amount and
+		the amount booked up to month_end_date for one dimension value.
+	"""
+	filters = {
+		"fiscal_years": tuple({args.fiscal_year for args in rows}),
+		"accounts": tuple({args.account for args in rows}),
+		"company": rows[0].company,
+		"month_end_date": month_end_date,
+	}
+
+	if tree_bounds:
+		# GL entries booked on the node itself or on any of its descendants
+		tree_fields = ", d.lft, d.rgt"
+		conditions = "and ({})".format(
+			" or ".join(
+				f"(d.lft >= {int(bounds.lft)} and d.rgt <= {int(bounds.rgt)})" for bounds in tree_bounds.values()
+			)
+		)
+	else:
+		tree_fields = ""
+		conditions = f"and gle.{budget_against} in %(values)s"
+		filters["values"] = tuple({args.get(budget_against) for args in rows})
+
+	entries = frappe.db.sql(
+		f"""
+		select
+			gle.account, gle.fiscal_year, gle.{budget_against} as budget_against{tree_fields},
+			sum(gle.debit) - sum(gle.credit) as annual,
+			sum(case when gle.posting_date <= %(month_end_date)s then gle.debit - gle.credit else 0 end) as monthly
+		from
+			`tabGL Entry` gle
+			inner join `tab{doctype}` d on d.name = gle.{budget_against}
+		where
+			gle.is_cancelled = 0
+			and gle.account in %(accounts)s
+			and gle.fiscal_year in %(fiscal_years)s
+			and gle.company = %(company)s
+			and gle.docstatus = 1
+			{conditions}
+		group by
+			gle.account, gle.fiscal_year, gle.{budget_against}{tree_fields}
+	""",
+		filters,
+		as_dict=True,
+	)  # nosec
+
+	expense_map = {}
+	for entry in entries:
+		expense_map.setdefault((entry.account, entry.fiscal_year), []).append(entry)
+
+	return expense_map
+
+
+def get_row_actual_expense(args, actual_expenses, bounds, is_tree):
+	"""
+		Returns {"annual": amount, "monthly": amount} of actual expense for a row.
+	"""
+	amounts = {"annual": 0, "monthly": 0}
+	value = args.get(args.budget_against_field)
+
+	for entry in actual_expenses.get((args.account, args.fiscal_year), []):
+		if is_tree:
+			if not bounds or not (entry.lft >= bounds.lft and entry.rgt <= bounds.rgt):
+				continue
+		elif entry.budget_against != value:
+			continue
+
+		amounts["annual"] += flt(entry.annual)
+		amounts["monthly"] += flt(entry.monthly)
+
+	return amounts
+
+
+def get_open_amount_map(for_doc, rows, budget_against, values):
+	"""
+		Load the open (unordered/unbilled) amounts of submitted Material Requests or Purchase Orders
+		for all rows in one grouped query per fiscal year.
+		Returns {(item_code, expense_account, dimension value, fiscal_year): amount}.
+	"""
+	item_codes = tuple({args.item_code for args in rows if args.item_code})
+	expense_accounts = tuple({args.expense_account for args in rows if args.expense_account})
+	if not (item_codes and expense_accounts):
+		return {}
+
+	if for_doc == "Material Request":
+		doctype, date_field = "Material Request", "schedule_date"
+		amount = "(child.stock_qty - child.ordered_qty) * child.rate"
+		conditions = """child.stock_qty > child.ordered_qty
+			and parent.material_request_type = 'Purchase' and parent.status != 'Stopped'"""
+	else:
+		doctype, date_field = "Purchase Order", "transaction_date"
+		amount = "child.amount - child.billed_amt"
+		conditions = "child.amount > child.billed_amt and parent.status != 'Closed'"
+
+	open_amounts = {}
+	for fiscal_year in {args.fiscal_year for args in rows}:
+		start_date, end_date = frappe.get_cached_value(
+			"Fiscal Year", fiscal_year, ["year_start_date", "year_end_date"]
+		)
+
+		data = frappe.db.sql(
+			f"""
+			select
+				child.item_code, child.expense_account, child.{budget_against} as budget_against,
+				ifnull(sum({amount}), 0) as amount
+			from
+				`tab{doctype} Item` child, `tab{doctype}` parent
+			where
+				parent.name = child.parent
+				and parent.docstatus = 1
+				and {conditions}
+				and child.item_code in %(item_codes)s
+				and child.expense_account in %(expense_accounts)s
+				and child.{budget_against} in %(values)s
+				and parent.{date_field} between %(start_date)s and %(end_date)s
+			group by
+				child.item_code, child.expense_account, child.{budget_against}
+		""",
+			{
+				"item_codes": item_codes,
+				"expense_accounts": expense_accounts,
+				"values": tuple(values),
+				"start_date": start_date,
+				"end_date": end_date,
+			},
+			as_dict=True,
+		)  # nosec
+
+		for d in data:
+			open_amounts[(d.item_code, d.expense_account, d.budget_against, fiscal_year)] = flt(d.amount)
+
+	return open_amounts
+
+
+def get_accumulated_monthly_amount(budget, fiscal_year, posting_date):
+	"""
+		Accumulated monthly target of a loaded budget record up to the posting month.
+	"""
+	dt = frappe.get_cached_value("Fiscal Year", fiscal_year, "year_start_date")
+	accumulated_amount = 0
+
+	while dt <= getdate(posting_date):
+		accumulated_amount += flt(budget.get(MONTHS[dt.month - 1]))
+		dt = add_months(dt, 1)
+
+	return accumulated_amount
+
+
 def validate_budget_records(args, budget_records, expense_amount, for_check):
 	for budget in budget_records:
 		if flt(budget.budget_amount):
 			yearly_action, monthly_action = get_actions(args, budget)
 			args["for_material_request"] = budget.for_material_request
 			args["for_purchase_order"] = budget.for_purchase_order
+			args["budget_name"] = budget.name
 
 			if yearly_action in ("Stop", "Warn"):
 				compare_expense_with_budget(
@@ -138,19 +554,68 @@ def validate_budget_records(args, budget_records, expense_amount, for_check):
 
 
 def compare_expense_with_budget(args, budget_amount, action_for, action, budget_against, amount=0, for_check=0):
+	from beams.beams.doctype.budget_consumption.budget_consumption import is_ledger_enabled
+
+	if args.get("budget_name") and is_ledger_enabled():
+		amount = set_amounts_from_ledger(args, amount, for_check)
+		check_expense_against_budget(args, budget_amount, action_for, action, budget_against, amount, for_check)
+		return
+
 	args.actual_expense, args.requested_amount, args.ordered_amount = get_actual_expense(args), 0, 0
 	if not amount:
 		args.requested_amount, args.ordered_amount = get_requested_amount(args), get_ordered_amount(args, for_check)
 
-		if args.get("doctype") == "Material Request" and args.for_material_request:
-			amount = args.requested_amount + args.ordered_amount
+		amount = get_committed_amount(args)
 
-		elif args.get("doctype") == "Purchase Order" and args.for_purchase_order:
-			amount = args.ordered_amount
+	check_expense_against_budget(args, budget_amount, action_for, action, budget_against, amount, for_check)
 
-	total_expense = args.actual_expense + amount
+
+def set_amounts_from_ledger(args, amount, for_check):
+	"""
+		Read actual, requested and ordered amounts of the budget from the Budget Consumption ledger.
+	"""
+	from beams.beams.doctype.budget_consumption.budget_consumption import get_budget_consumption
+
+	consumption = get_budget_consumption(args, args.get("month_end_date"))
+	args.actual_expense = flt(consumption.monthly if args.get("month_end_date") else consumption.annual)
+	args.requested_amount, args.ordered_amount = 0, 0
+
+	if not amount:
+		unsubmitted_amounts = (
+			get_unsubmitted_amounts(args.object)
+			if args.get("object")
+			else frappe._dict({"requested_amount": 0, "ordered_amount": 0})
+		)
+		args.requested_amount = flt(consumption.requested) + unsubmitted_amounts.requested_amount
+		args.ordered_amount = flt(consumption.ordered)
+		if args.get("doctype") == "Purchase Order" and for_check:
+			args.ordered_amount += unsubmitted_amounts.ordered_amount
+
+		amount = get_committed_amount(args)
+
+	return amount
+
+
+def get_committed_amount(args):
+	"""
+		Returns the requested/ordered amount that counts against the budget for the source document.
+	"""
+	if args.get("doctype") == "Material Request" and args.for_material_request:
+		return args.requested_amount + args.ordered_amount
+
+	elif args.get("doctype") == "Purchase Order" and args.for_purchase_order:
+		return args.ordered_amount
+
+	return 0
 
 
+def check_expense_against_budget(args, budget_amount, action_for, action, budget_against, amount=0, for_check=0):
+	"""
+		Compare the already resolved actual, requested and ordered amounts in args with the budget amount
+		and raise, warn or flag the source document accordingly.
+	"""
+	total_expense = args.actual_expense + amount
+
 	if total_expense > budget_amount:
 		if args.actual_expense > budget_amount:
 			error_tense = _("is already")
@@ -399,19 +864,13 @@ def get_actual_expense(args):
 
 
 def get_accumulated_monthly_budget(monthly_distribution, posting_date, fiscal_year, annual_budget):
-	# List of months explicitly defined
-	months = [
-		"january", "february", "march", "april", "may", "june",
-		"july", "august", "september", "october", "november", "december"
-	]
-
 	dt = frappe.get_cached_value("Fiscal Year", fiscal_year, "year_start_date")
 	accumulated_percentage = 0.0
 
 	accummulated_budget = 0
 
 	while dt <= getdate(posting_date):
-		accummulated_budget += frappe.db.get_value("Budget Account", {"parent":monthly_distribution}, months[dt.month - 1])
+		accummulated_budget += frappe.db.get_value("Budget Account", {"parent":monthly_distribution}, MONTHS[dt.month - 1])
 
 		dt = add_months(dt, 1)
 
@@ -0,0 +1,61 @@
+# Copyright (c) 2026, efeone and contributors
+# For license information, please see license.txt
+
+import frappe
+
+PERMISSION_CONTEXT_KEY = "beams_permission_context"
+
+
+def get_permission_context(user=None):
+	'''
+		Returns the roles, employee id and department of a user, resolved once and kept in Redis
+		until the user's Employee or User record changes.
+	'''
+	user = user or frappe.session.user
+	context = frappe.cache().hget(PERMISSION_CONTEXT_KEY, user)
+	if context is None:
+		employee = frappe.db.get_value("Employee", {"user_id": user}, ["name", "department"], as_dict=True) or {}
+		context = {
+			"user": user,
+			"roles": frappe.get_roles(user),
+			"employee": employee.get("name"),
+			"department": employee.get("department"),
+		}
+		frappe.cache().hset(PERMISSION_CONTEXT_KEY, user, context)
+
+	return frappe._dict(context)
+
+
+def clear_permission_context(doc, method=None):
+	'''
+		Drop the cached permission context of the users linked to an Employee or of a User.
+		Called on Employee and User update and delete.
+	'''
+	if doc.doctype == "User":
+		users = [doc.name]
+	else:
+		previous = doc.get_doc_before_save()
+		users = [doc.get("user_id"), previous.get("user_id") if previous else None]
+
+	for user in set(filter(None, users)):
+		frappe.cache().hdel(PERMISSION_CONTEXT_KEY, user)
+
+
+def has_any_role(context, *roles):
+	return any(role in context.roles for role in roles)
+
+
+def match_condition(doctype, fieldname, value):
+	'''
+		Condition on a field of the listed doctype, with the value escaped
+	'''
+	return f"`tab{doctype}`.`{fieldname}` = {frappe.db.escape(value)}"
+
+
+def department_condition(doctype, employee_field, department):
+	'''
+		Condition on the department of the employee linked in `employee_field`, with the value escaped
+	'''
+	return f"""`tab{doctype}`.`{employee_field}` IN (
+		SELECT e.name FROM `tabEmployee` e WHERE e.department = {frappe.db.escape(department)}
+	)"""
@@ -0,0 +1,269 @@
+# Copyright (c) 2026, efeone and contributors
+# For license information, please see license.txt
+
+import hashlib
+import io
+import json
+import time
+from functools import partial
+
+import frappe
+from pyqrcode import create
+
+QR_QUEUE_KEY = "beams_qr_code_queue"
+QR_JOB_ID = "beams_qr_code_generation"
+QR_BATCH_SIZE = 100
+QR_MAX_ATTEMPTS = 3
+
+
+def get_qr_file_name(payload):
+	'''
+		File name addressed by the payload, so an unchanged payload maps to the same File
+	'''
+	return "QRCode-{0}.png".format(hashlib.sha256(payload.encode()).hexdigest()[:20])
+
+
+def render_qr(payload):
+	qr_image = io.BytesIO()
+	create(payload, error="L").png(qr_image, scale=4, quiet_zone=1)
+	return qr_image.getvalue()
+
+
+def set_qr_code(doctype, name, fieldname, payload, existing_files=None):
+	'''
+		Attach the QR code of the payload to a document field.
+		The File of the same payload already attached to the field is reused, the PNG is rendered only when the payload changed.
+	'''
+	file_name = get_qr_file_name(payload)
+	if existing_files is None:
+		existing_files = get_existing_qr_files([(doctype, name, fieldname, file_name)])
+
+	file_url = existing_files.get((doctype, name, fieldname, file_name))
+	if not file_url:
+		_file = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": file_name,
+				"is_private": 0,
+				"content": render_qr(payload),
+				"attached_to_doctype": doctype,
+				"attached_to_name": name,
+				"attached_to_field": fieldname,
+			}
+		)
+		_file.save(ignore_permissions=True)
+		file_url = _file.file_url
+
+	if frappe.db.get_value(doctype, name, fieldname) != file_url:
+		frappe.db.set_value(doctype, name, fieldname, file_url, update_modified=False)
+	return file_url
+
+
+def get_existing_qr_files(keys):
+	'''
+		Returns the file url of the QR Files already attached, by (doctype, name, fieldname, file_name)
+	'''
+	file_names = list({key[3] for key in keys})
+	if not file_names:
+		return {}
+	files = frappe.get_all(
+		"File",
+		filters={"file_name": ["in", file_names], "attached_to_field": ["is", "set"]},
+		fields=["file_name", "file_url", "attached_to_doctype", "attached_to_name", "attached_to_field"],
+	)
+	return {
+		(f.attached_to_doctype, f.attached_to_name, f.attached_to_field, f.file_name): f.file_url
+		for f in files
+	}
+
+
+def enqueue_qr_code(doctype, name, fieldname, payload=None):
+	'''
+		Queue the QR code of a document field for background rendering, once the current transaction commits,
+		so the job never picks up a document that is not visible yet.
+		Without a payload, it is built from the document when processed (see QR_PAYLOADS).
+	'''
+	frappe.db.after_commit.add(partial(push_qr_requests, [[doctype, name, fieldname, payload]]))
+
+
+def push_qr_requests(requests, queue_key=QR_QUEUE_KEY, start=True):
+	frappe.cache().pipeline().rpush(
+		frappe.cache().make_key(queue_key), *[json.dumps(request) for request in requests]
+	).execute()
+	if start:
+		start_qr_queue_processing()
+
+
+def start_qr_queue_processing():
+	'''
+		Start the queue job unless one is already queued or running.
+		Also scheduled hourly, for requests pushed while a finishing job was past its last check.
+	'''
+	if frappe.cache().llen(QR_QUEUE_KEY):
+		frappe.enqueue(process_qr_queue, queue="long", job_id=QR_JOB_ID, deduplicate=True)
+
+
+def pop_qr_requests(queue_key=QR_QUEUE_KEY):
+	'''
+		Atomically take the next batch of requests off the queue.
+	'''
+	key = frappe.cache().make_key(queue_key)
+	pipeline = frappe.cache().pipeline()
+	pipeline.lrange(key, 0, QR_BATCH_SIZE - 1)
+	pipeline.ltrim(key, QR_BATCH_SIZE, -1)
+	entries, _trimmed = pipeline.execute()
+	return [json.loads(entry) for entry in entries]
+
+
+def process_qr_queue(queue_key=QR_QUEUE_KEY, commit=True):
+	'''
+		Render the queued QR codes in batches of QR_BATCH_SIZE, committing after each batch.
+		Each request runs in its own savepoint, so a failure leaves nothing of it behind; failed requests are pushed back
+		up to QR_MAX_ATTEMPTS times. Requests lost with a crashed worker are picked up by the daily queue_missing_qr_codes.
+		Runs until the queue is found empty, a request pushed after that is picked up by the next job.
+	'''
+	while True:
+		batch = pop_qr_requests(queue_key)
+		if not batch:
+			break
+
+		requests = []
+		for doctype, name, fieldname, payload, *attempts in batch:
+			if payload is None:
+				payload = get_document_payload(doctype, name, fieldname)
+			if payload:
+				requests.append((doctype, name, fieldname, payload, attempts[0] if attempts else 0))
+
+		existing_files = get_existing_qr_files(
+			[(doctype, name, fieldname, get_qr_file_name(payload)) for doctype, name, fieldname, payload, attempts in requests]
+		)
+		failed = []
+		for doctype, name, fieldname, payload, attempts in requests:
+			frappe.db.savepoint("qr_code")
+			try:
+				set_qr_code(doctype, name, fieldname, payload, existing_files)
+			except Exception:
+				frappe.db.rollback(save_point="qr_code")
+				frappe.log_error(frappe.get_traceback(), f"QR Code generation failed for {doctype} {name}")
+				if attempts + 1 < QR_MAX_ATTEMPTS:
+					failed.append([doctype, name, fieldname, payload, attempts + 1])
+
+		if commit:
+			frappe.db.commit()
+		if failed:
+			push_qr_requests(failed, queue_key, start=False)
+
+
+def get_document_payload(doctype, name, fieldname):
+	if not frappe.db.exists(doctype, name):
+		return None
+	doc = frappe.get_doc(doctype, name)
+	payload_method = QR_PAYLOADS[doctype][fieldname]
+	if "." in payload_method:
+		return frappe.get_attr(payload_method)(doc)
+	return doc.run_method(payload_method)
+
+
+# QR code fields and the function (dotted path) or controller method building their payload from the document
+QR_PAYLOADS = {
+	"Asset": {
+		"qr_code": "beams.beams.custom_scripts.asset.asset.get_si_json",
+		"asset_details": "beams.beams.custom_scripts.asset.asset.get_si_json_data",
+	},
+	"Asset Bundle": {
+		"qr_code": "get_si_json",
+		"bundle_qr_code": "get_si_file",
+	},
+	"Job Opening": {
+		"qr_scan_to_apply": "beams.beams.custom_scripts.job_opening.job_opening.get_job_url",
+	},
+}
+
+# Only submitted Assets carry QR codes
+QR_DOCSTATUS = {"Asset": 1}
+
+
+@frappe.whitelist()
+def regenerate_missing_qr_codes():
+	'''
+		Queue the QR codes that are not set, or whose File no longer exists.
+		Run with: bench execute beams.beams.qr_service.regenerate_missing_qr_codes
+	'''
+	frappe.only_for("System Manager")
+	return queue_missing_qr_codes()
+
+
+def queue_missing_qr_codes():
+	'''
+		Queue the QR codes that are not set, or whose File no longer exists, for every QR field in QR_PAYLOADS.
+		Scheduled daily, which also recovers the requests of a batch lost with a crashed worker.
+	'''
+	queued = 0
+	for doctype, fields in QR_PAYLOADS.items():
+		for fieldname in fields:
+			conditions = ""
+			if doctype in QR_DOCSTATUS:
+				conditions = "AND doc.docstatus = {0}".format(QR_DOCSTATUS[doctype])
+			names = frappe.db.sql_list("""
+				SELECT doc.name
+				FROM `tab{doctype}` doc
+				WHERE (
+					IFNULL(doc.`{fieldname}`, '') = ''
+					OR NOT EXISTS (SELECT 1 FROM `tabFile` f WHERE f.file_url = doc.`{fieldname}`)
+				)
+				{conditions}
+			""".format(doctype=doctype, fieldname=fieldname, conditions=conditions))
+			if names:
+				push_qr_requests([[doctype, name, fieldname, None] for name in names])
+			queued += len(names)
+
+	return queued
+
+
+def benchmark_qr_generation(doctype="Job Opening", fieldname="qr_scan_to_apply", count=200):
+	'''
+		Compares generating QR codes inline with queueing them, end to end, on existing documents of a QR field.
+		Inline is the time a request spends rendering and attaching the codes itself. Queued is the time a request spends
+		pushing them, plus the time process_qr_queue takes to drain a scratch queue with the same codes.
+		Everything is rolled back and the Files written are deleted.
+		Run with: bench execute beams.beams.qr_service.benchmark_qr_generation --kwargs "{'count': 200}"
+	'''
+	names = frappe.get_all(doctype, pluck="name", limit=count)
+	if not names:
+		return {}
+
+	def get_requests():
+		# Fresh payloads, so every code is rendered and attached
+		return [[doctype, name, fieldname, "BENCH-{0}".format(frappe.generate_hash(length=10))] for name in names]
+
+	inline_requests = get_requests()
+	started = time.monotonic()
+	for request in inline_requests:
+		set_qr_code(*request)
+	inline_time = time.monotonic() - started
+
+	scratch_key = "{0}_benchmark".format(QR_QUEUE_KEY)
+	queued_requests = get_requests()
+	started = time.monotonic()
+	push_qr_requests(queued_requests, scratch_key, start=False)
+	enqueue_time = time.monotonic() - started
+
+	started = time.monotonic()
+	process_qr_queue(scratch_key, commit=False)
+	drain_time = time.monotonic() - started
+	frappe.cache().delete_value(scratch_key)
+
+	file_names = [get_qr_file_name(request[3]) for request in inline_requests + queued_requests]
+	for name in frappe.get_all("File", filters={"file_name": ["in", file_names]}, pluck="name"):
+		frappe.delete_doc("File", name, ignore_permissions=True)
+	frappe.db.rollback()
+
+	processed = len(names)
+	return {
+		"count": processed,
+		"inline_s": round(inline_time, 4),
+		"enqueue_s": round(enqueue_time, 4),
+		"drain_s": round(drain_time, 4),
+		"inline_per_s": round(processed / inline_time, 1) if inline_time else None,
+		"queued_per_s": round(processed / (enqueue_time + drain_time), 1) if enqueue_time + drain_time else None,
+	}
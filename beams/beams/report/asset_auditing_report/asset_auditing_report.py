@@ -2,6 +2,8 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe import _
+from frappe.utils import cint
 
 def execute(filters=None):
     columns = get_columns()
@@ -30,15 +32,69 @@ def get_columns():
         {"label": "Repair Status", "fieldname": "repair_status", "fieldtype": "Select", "width": 150}
     ]
 
+ASSET_BATCH_SIZE = 5000
+
+AUDIT_FIELDS = ["name as audit_id", "has_damage", "remarks", "employee", "posting_date"]
+REPAIR_FIELDS = ["name as repair_id", "description", "repair_cost", "failure_date", "repair_status"]
+EMPTY_AUDIT = {"audit_id": None, "has_damage": None, "remarks": None, "employee": None, "posting_date": None}
+EMPTY_REPAIR = {"repair_id": None, "description": None, "repair_cost": None, "failure_date": None, "repair_status": None}
+
+EXTRA_ASSET_FIELDS = ["room", "shelf", "row", "bin"]
+
 def get_data(filters):
-    data = []
-    asset_filters = {}
+    """
+        The query report shows the whole result, for large registers use get_report_page.
+    """
+    return list(iter_asset_rows(filters, extra_asset_fields=EXTRA_ASSET_FIELDS, damaged_only=filters.get("has_damage")))
+
+@frappe.whitelist()
+def get_report_page(filters=None, after=None, page_length=ASSET_BATCH_SIZE):
+    """
+        Returns the rows of one page of assets and the cursor of the next page, for exports and integrations
+        reading registers too large to load at once.
+    """
+    filters = frappe._dict(frappe.parse_json(filters or {}))
+    return get_asset_rows_page("Asset Auditing Report", filters, after, page_length,
+        extra_asset_fields=EXTRA_ASSET_FIELDS, damaged_only=filters.get("has_damage"))
+
+def get_asset_rows_page(report_name, filters, after=None, page_length=ASSET_BATCH_SIZE, extra_asset_fields=None, damaged_only=False):
+    """
+        Rows of the assets following `after` by name, at most page_length assets.
+        next_after is the cursor of the next page, None on the last page.
+    """
+    if not frappe.get_doc("Report", report_name).is_permitted():
+        frappe.throw(_("Not permitted to view {0}").format(report_name), frappe.PermissionError)
+
+    page_length = min(cint(page_length) or ASSET_BATCH_SIZE, ASSET_BATCH_SIZE)
+    query = get_asset_query(filters, extra_asset_fields)
+    assets = next(iter_asset_batches(query.asset_filters, query.asset_fields, page_length, after), [])
+    return {
+        "rows": list(iter_batch_rows(assets, query, filters, damaged_only)),
+        "next_after": assets[-1]["asset"] if len(assets) == page_length else None
+    }
+
+def iter_asset_rows(filters, extra_asset_fields=None, damaged_only=False, batch_size=ASSET_BATCH_SIZE):
+    """
+        Yields one report row per (asset, audit, repair) combination.
+        Assets are read in keyset-paginated batches and the audits and repairs of each batch
+        are prefetched with one query each, so rows are generated instead of built per asset.
+    """
+    query = get_asset_query(filters, extra_asset_fields)
+    for assets in iter_asset_batches(query.asset_filters, query.asset_fields, batch_size):
+        yield from iter_batch_rows(assets, query, filters, damaged_only)
+
+def get_asset_query(filters, extra_asset_fields=None):
+    """
+        Filters and fields of the Asset, Asset Auditing and Asset Repair queries
+    """
+    extra_asset_fields = extra_asset_fields or []
+    asset_filters = []
     if filters.get("asset"):
-        asset_filters["name"] = filters["asset"]
+        asset_filters.append(["name", "=", filters["asset"]])
     if filters.get("item_code"):
-        asset_filters["item_code"] = filters["item_code"]
+        asset_filters.append(["item_code", "=", filters["item_code"]])
     if filters.get("location"):
-        asset_filters["location"] = filters["location"]
+        asset_filters.append(["location", "=", filters["location"]])
 
     asset_auditing_filters = {}
     if filters.get("employee"):
@@ -52,46 +108,42 @@ def get_data(filters):
     if filters.get("repair_id"):
         repair_filters["name"] = filters["repair_id"]
 
-    assets = frappe.get_all(
-        "Asset",
-        fields=[
-            "name as asset", "item_code", "total_asset_cost", "location",
-            "room", "shelf", "row", "bin"
-        ],
-        filters=asset_filters if asset_filters else None
-    )
+    return frappe._dict({
+        "asset_filters": asset_filters,
+        "asset_fields": ["name as asset", "item_code", "total_asset_cost", "location"] + extra_asset_fields,
+        "extra_asset_fields": extra_asset_fields,
+        "asset_auditing_filters": asset_auditing_filters,
+        "repair_filters": repair_filters
+    })
+
+def iter_batch_rows(assets, query, filters, damaged_only=False):
+    """
+        Yields the rows of a batch of assets, with their audits and repairs prefetched in one query each
+    """
+    if not assets:
+        return
+    extra_asset_fields = query.extra_asset_fields
+    asset_names = [asset["asset"] for asset in assets]
+    audits_by_asset = get_records_by_asset("Asset Auditing", asset_names, query.asset_auditing_filters, AUDIT_FIELDS)
+    repairs_by_asset = get_records_by_asset("Asset Repair", asset_names, query.repair_filters, REPAIR_FIELDS)
 
     for asset in assets:
-        audits = frappe.get_all(
-            "Asset Auditing",
-            filters={"asset": asset["asset"], **asset_auditing_filters},
-            fields=["name as audit_id", "has_damage", "remarks", "employee", "posting_date"]
-        )
-        repairs = frappe.get_all(
-            "Asset Repair",
-            filters={"asset": asset["asset"], **repair_filters},
-            fields=["name as repair_id", "description", "repair_cost", "failure_date", "repair_status"]
-        )
+        audits = audits_by_asset.get(asset["asset"], [])
+        repairs = repairs_by_asset.get(asset["asset"], [])
 
-        if filters.get("has_damage"):
+        if damaged_only:
             audits = [a for a in audits if a.get("has_damage")]
 
-        if not audits:
-            audits = [{"audit_id": None, "has_damage": None, "remarks": None, "employee": None, "posting_date": None}]
-        if not repairs:
-            repairs = [{"repair_id": None, "description": None, "repair_cost": None, "failure_date": None, "repair_status": None}]
-
-        for audit in audits:
-            for repair in repairs:
+        for audit in audits or [EMPTY_AUDIT]:
+            for repair in repairs or [EMPTY_REPAIR]:
                 row = {
                     "asset": asset["asset"],
                     "item_code": asset["item_code"],
                     "total_asset_cost": asset["total_asset_cost"],
                     "location": asset["location"],
-                    "room": asset.get("room"),
-                    "shelf": asset.get("shelf"),
-                    "row": asset.get("row"),
-                    "bin": asset.get("bin"),
+                }
+                row.update({field: asset.get(field) for field in extra_asset_fields})
+                row.update({
                     "audit_id": audit["audit_id"],
                     "has_damage": "Yes" if audit["has_damage"] else "No" if audit["has_damage"] is not None else None,
                     "remarks": audit["remarks"],
@@ -102,12 +154,45 @@ def get_data(filters):
                     "repair_cost": repair.get("repair_cost"),
                     "failure_date": repair.get("failure_date"),
                     "repair_status": repair.get("repair_status")
-                }
+                })
                 if (filters.get("repair_id") and not row["repair_id"]) or \
                    (filters.get("repair_status") and not row["repair_status"]) or \
                    (filters.get("employee") and not row["employee"]) or \
                    (filters.get("audit_id") and not row["audit_id"]):
                     continue
-                data.append(row)
+                yield row
+
+def iter_asset_batches(asset_filters, fields, batch_size=ASSET_BATCH_SIZE, after=None):
+    """
+        Yields batches of assets ordered by name, paginated on the last name seen instead of an offset.
+    """
+    last_asset = after
+    while True:
+        batch_filters = list(asset_filters)
+        if last_asset:
+            batch_filters.append(["name", ">", last_asset])
+
+        assets = frappe.get_all(
+            "Asset",
+            fields=fields,
+            filters=batch_filters,
+            order_by="name asc",
+            limit_page_length=batch_size
+        )
+        if not assets:
+            return
+
+        yield assets
+
+        if len(assets) < batch_size:
+            return
+        last_asset = assets[-1]["asset"]
 
-    return data
+def get_records_by_asset(doctype, assets, filters, fields):
+    """
+        Fetch the records of a doctype linked to the given assets in one query, grouped by asset.
+    """
+    records = {}
+    for record in frappe.get_all(doctype, filters={"asset": ["in", assets], **filters}, fields=["asset"] + fields):
+        records.setdefault(record["asset"], []).append(record)
+    return records
@@ -10,6 +10,12 @@ from frappe.utils import flt, formatdate
 
 from erpnext.controllers.trends import get_period_date_ranges, get_period_month_ranges
 
+from beams.beams.report.budget_comparison_report.budget_comparison_report import (
+	get_dimension_target_details,
+	get_target_distribution_details,
+)
+from beams.beams.report.budget_report_cube import get_report_cube
+
 
 def execute(filters=None):
 	if not filters:
@@ -22,7 +28,7 @@ def execute(filters=None):
 		dimensions = get_cost_centers(filters)
 
 	period_month_ranges = get_period_month_ranges(filters["period"], filters["from_fiscal_year"])
-	cam_map = get_dimension_account_month_map(filters)
+	cam_map = get_report_cube("Budget Allocation", filters, get_dimension_account_month_map)
 
 	data = []
 	for dimension in dimensions:
@@ -173,100 +179,6 @@ def get_cost_centers(filters):
 		)  # nosec
 
 
-# Get dimension & target details
-def get_dimension_target_details(filters):
-	budget_against = frappe.scrub(filters.get("budget_against"))
-	cond = ""
-	if filters.get("budget_against_filter"):
-		cond += f""" and b.{budget_against} in (%s)""" % ", ".join(
-			["%s"] * len(filters.get("budget_against_filter"))
-		)
-	if filters.get("cost_head"):
-		cond += "and ba.cost_head = '{0}'".format(filters.get("cost_head"))
-	if filters.get("cost_subhead"):
-		cond += "and ba.cost_subhead = '{0}'".format(filters.get("cost_subhead"))
-	if filters.get("cost_category"):
-		cond += "and ba.cost_category = '{0}'".format(filters.get("cost_category"))
-	if filters.get("finance_group"):
-		cond += "and b.finance_group = '{0}'".format(filters.get("finance_group"))
-
-	return frappe.db.sql(
-		f"""
-			select
-				b.{budget_against} as budget_against,
-				b.monthly_distribution,
-				ba.account,
-				ba.budget_amount,
-				ba.cost_head,
-				ba.cost_subhead,
-				ba.cost_category,  -- Added cost_category field
-				b.fiscal_year
-			from
-				`tabBudget` b,
-				`tabBudget Account` ba
-			where
-				b.name = ba.parent
-				and b.fiscal_year between %s and %s
-				and b.budget_against = %s
-				and b.company = %s
-				{cond}
-			order by
-				b.fiscal_year
-		""",
-		tuple(
-			[
-				filters.from_fiscal_year,
-				filters.to_fiscal_year,
-				filters.budget_against,
-				filters.company,
-			]
-			+ (filters.get("budget_against_filter") or [])
-		),
-		as_dict=True,
-	)
-
-
-def get_target_distribution_details(filters):
-	target_details = {}
-
-	# Loop through the Budget records to get the amounts for each month from the Budget Account child table
-	for budget in frappe.db.sql(
-		"""
-			select
-				b.name as budget_name,
-				b.fiscal_year
-			from
-				`tabBudget` b
-			where
-				b.fiscal_year between %s and %s
-		""",
-		(filters.from_fiscal_year, filters.to_fiscal_year),
-		as_dict=True,
-	):
-		# Get the Budget Account details for each budget
-		budget_accounts = frappe.get_all(
-			"Budget Account",
-			filters={"parent": budget.budget_name},
-			fields=["account", "january", "february", "march", "april", "may", "june",
-					"july", "august", "september", "october", "november", "december"]
-		)
-
-		for d in budget_accounts:
-			target_details.setdefault(d.account, {}).setdefault(budget.fiscal_year, {})
-
-			# Assign the actual amount for each month
-			for month, amount in zip(
-				["january", "february", "march", "april", "may", "june",
-				 "july", "august", "september", "october", "november", "december"],
-				[d.january, d.february, d.march, d.april, d.may, d.june,
-				 d.july, d.august, d.september, d.october, d.november, d.december]
-			):
-				target_details[d.account][budget.fiscal_year][month] = flt(amount)
-
-
-	return target_details
-
-
 def get_dimension_account_month_map(filters):
 	dimension_target_details = get_dimension_target_details(filters)
 	tdd = get_target_distribution_details(filters)
@@ -303,7 +215,9 @@ def get_dimension_account_month_map(filters):
 				else 100.0 / 12
 			)
 
-			tav_dict.target = tdd[ccd.account][ccd.fiscal_year][month_map[month]]
+			tav_dict.target = tdd.get((ccd.budget_against, ccd.account, ccd.fiscal_year), {}).get(
+				month_map[month], 0
+			)
 
 	return cam_map
 
@@ -10,6 +10,9 @@ from frappe.utils import flt, formatdate
 
 from erpnext.controllers.trends import get_period_date_ranges, get_period_month_ranges
 
+from beams.beams.doctype.budget_consumption.budget_consumption import is_ledger_enabled
+from beams.beams.report.budget_report_cube import get_report_cube
+
 
 def execute(filters=None):
 	if not filters:
@@ -22,7 +25,7 @@ def execute(filters=None):
 		dimensions = get_cost_centers(filters)
 
 	period_month_ranges = get_period_month_ranges(filters["period"], filters["from_fiscal_year"])
-	cam_map = get_dimension_account_month_map(filters)
+	cam_map = get_report_cube("Budget Comparison Report", filters, get_dimension_account_month_map)
 
 	data = []
 	for dimension in dimensions:
@@ -187,22 +190,37 @@ def get_cost_centers(filters):
 		)  # nosec
 
 
-# Get dimension & target details
-def get_dimension_target_details(filters):
+def get_budget_conditions(filters):
+	"""
+		Returns the Budget/Budget Account where clause and its values for the report filters.
+	"""
 	budget_against = frappe.scrub(filters.get("budget_against"))
 	cond = ""
+	values = {
+		"from_fiscal_year": filters.from_fiscal_year,
+		"to_fiscal_year": filters.to_fiscal_year,
+		"budget_against": filters.budget_against,
+		"company": filters.company,
+	}
+
 	if filters.get("budget_against_filter"):
-		cond += f""" and b.{budget_against} in (%s)""" % ", ".join(
-			["%s"] * len(filters.get("budget_against_filter"))
-		)
-	if filters.get("cost_head"):
-		cond += "and ba.cost_head = '{0}'".format(filters.get("cost_head"))
-	if filters.get("cost_subhead"):
-		cond += "and ba.cost_subhead = '{0}'".format(filters.get("cost_subhead"))
-	if filters.get("cost_category"):
-		cond += "and ba.cost_category = '{0}'".format(filters.get("cost_category"))
+		cond += f" and b.{budget_against} in %(budget_against_filter)s"
+		values["budget_against_filter"] = tuple(filters.get("budget_against_filter"))
+	for fieldname in ["cost_head", "cost_subhead", "cost_category"]:
+		if filters.get(fieldname):
+			cond += f" and ba.{fieldname} = %({fieldname})s"
+			values[fieldname] = filters.get(fieldname)
 	if filters.get("finance_group"):
-		cond += "and b.finance_group = '{0}'".format(filters.get("finance_group"))
+		cond += " and b.finance_group = %(finance_group)s"
+		values["finance_group"] = filters.get("finance_group")
+
+	return cond, values
+
+
+# Get dimension & target details
+def get_dimension_target_details(filters):
+	budget_against = frappe.scrub(filters.get("budget_against"))
+	cond, values = get_budget_conditions(filters)
 
 	return frappe.db.sql(
 		f"""
@@ -220,63 +238,54 @@ def get_dimension_target_details(filters):
 				`tabBudget Account` ba
 			where
 				b.name = ba.parent
-				and b.fiscal_year between %s and %s
-				and b.budget_against = %s
-				and b.company = %s
+				and b.fiscal_year between %(from_fiscal_year)s and %(to_fiscal_year)s
+				and b.budget_against = %(budget_against)s
+				and b.company = %(company)s
 				{cond}
 			order by
 				b.fiscal_year
 		""",
-		tuple(
-			[
-				filters.from_fiscal_year,
-				filters.to_fiscal_year,
-				filters.budget_against,
-				filters.company,
-			]
-			+ (filters.get("budget_against_filter") or [])
-		),
+		values,
 		as_dict=True,
 	)
 
 
 def get_target_distribution_details(filters):
-	target_details = {}
+	"""
+		Returns the monthly targets of the Budget Account rows matching the report filters,
+		keyed by (budget_against, account, fiscal_year), in a single query.
+	"""
+	budget_against = frappe.scrub(filters.get("budget_against"))
+	cond, values = get_budget_conditions(filters)
+	months = [
+		"january", "february", "march", "april", "may", "june",
+		"july", "august", "september", "october", "november", "december"
+	]
 
-	# Loop through the Budget records to get the amounts for each month from the Budget Account child table
-	for budget in frappe.db.sql(
-		"""
+	target_details = {}
+	for d in frappe.db.sql(
+		f"""
 			select
-				b.name as budget_name,
-				b.fiscal_year
+				b.{budget_against} as budget_against,
+				ba.account,
+				b.fiscal_year,
+				{", ".join("ba." + month for month in months)}
 			from
-				`tabBudget` b
+				`tabBudget` b,
+				`tabBudget Account` ba
 			where
-				b.fiscal_year between %s and %s
+				b.name = ba.parent
+				and b.fiscal_year between %(from_fiscal_year)s and %(to_fiscal_year)s
+				and b.budget_against = %(budget_against)s
+				and b.company = %(company)s
+				{cond}
 		""",
-		(filters.from_fiscal_year, filters.to_fiscal_year),
+		values,
 		as_dict=True,
 	):
-		# Get the Budget Account details for each budget
-		budget_accounts = frappe.get_all(
-			"Budget Account",
-			filters={"parent": budget.budget_name},
-			fields=["account", "january", "february", "march", "april", "may", "june",
-					"july", "august", "september", "october", "november", "december"]
-		)
-
-		for d in budget_accounts:
-			target_details.setdefault(d.account, {}).setdefault(budget.fiscal_year, {})
-
-			# Assign the actual amount for each month
-			for month, amount in zip(
-				["january", "february", "march", "april", "may", "june",
-				 "july", "august", "september", "october", "november", "december"],
-				[d.january, d.february, d.march, d.april, d.may, d.june,
-				 d.july, d.august, d.september, d.october, d.november, d.december]
-			):
-				target_details[d.account][budget.fiscal_year][month] = flt(amount)
-
+		target_details[(d.budget_against, d.account, d.fiscal_year)] = {
+			month: flt(d.get(month)) for month in months
+		}
 
 	return target_details
 
@@ -294,9 +303,12 @@ def get_dimension_account_month_map(filters):
 		"November": "november", "December": "december"
 	}
 
-	for ccd in dimension_target_details:
-		actual_details = get_actual_details(ccd.budget_against, filters)
+	if is_ledger_enabled():
+		actual_details = get_actual_details_from_ledger(filters)
+	else:
+		actual_details = get_actual_details(dimension_target_details, filters)
 
+	for ccd in dimension_target_details:
 		# Ensure cost_head, cost_subhead, and cost_category are stored at the account level
 		cam_map.setdefault(ccd.budget_against, {}).setdefault(ccd.account, {
 			"cost_head": ccd.cost_head,
@@ -319,67 +331,81 @@ def get_dimension_account_month_map(filters):
 				else 100.0 / 12
 			)
 
-			tav_dict.target = tdd[ccd.account][ccd.fiscal_year][month_map[month]]
+			tav_dict.target = tdd.get((ccd.budget_against, ccd.account, ccd.fiscal_year), {}).get(
+				month_map[month], 0
+			)
 
-			for ad in actual_details.get(ccd.account, []):
-				if ad.month_name == month and ad.fiscal_year == ccd.fiscal_year:
-					tav_dict.actual += flt(ad.debit) - flt(ad.credit)
+			tav_dict.actual += flt(actual_details.get((ccd.budget_against, ccd.account, ccd.fiscal_year, month)))
 
 	return cam_map
 
+
+# Get actual details from the Budget Consumption ledger
+def get_actual_details_from_ledger(filters):
+	ledger_details = frappe.db.sql(
+		"""
+			select
+				bc.budget_against_value as budget_against,
+				bc.account,
+				bc.fiscal_year,
+				MONTHNAME(bc.posting_month) as month_name,
+				sum(bc.actual_amount) as amount
+			from
+				`tabBudget Consumption` bc
+			where
+				bc.budget_against = %s
+				and bc.company = %s
+				and bc.fiscal_year between %s and %s
+			group by
+				bc.budget_against_value, bc.account, bc.fiscal_year, month_name
+		""",
+		(filters.budget_against, filters.company, filters.from_fiscal_year, filters.to_fiscal_year),
+		as_dict=1,
+	)
+
+	return {(d.budget_against, d.account, d.fiscal_year, d.month_name): d.amount for d in ledger_details}
+
 # Get actual details from gl entry
-def get_actual_details(name, filters):
+def get_actual_details(dimension_target_details, filters):
+	"""
+		Returns {(budget_against, account, fiscal_year, month_name): debit - credit} for all budget rows
+		in one grouped query. GL entries count towards a row when they are booked on the same dimension
+		value and on one of the row's accounts.
+	"""
 	budget_against = frappe.scrub(filters.get("budget_against"))
-	cond = ""
+	dimensions = list({d.budget_against for d in dimension_target_details if d.budget_against})
+	accounts = list({d.account for d in dimension_target_details if d.account})
 
-	if filters.get("budget_against") == "Cost Center":
-		cc_lft, cc_rgt = frappe.db.get_value("Cost Center", name, ["lft", "rgt"])
-		cond = f"""
-				and lft >= "{cc_lft}"
-				and rgt <= "{cc_rgt}"
-			"""
+	if not (dimensions and accounts):
+		return {}
 
 	ac_details = frappe.db.sql(
 		f"""
 			select
+				gl.{budget_against} as budget_against,
 				gl.account,
-				gl.debit,
-				gl.credit,
 				gl.fiscal_year,
 				MONTHNAME(gl.posting_date) as month_name,
-				b.{budget_against} as budget_against
+				sum(gl.debit) - sum(gl.credit) as amount
 			from
-				`tabGL Entry` gl,
-				`tabBudget Account` ba,
-				`tabBudget` b
+				`tabGL Entry` gl
 			where
-				b.name = ba.parent
-				and ba.account=gl.account
-				and b.{budget_against} = gl.{budget_against}
-				and gl.fiscal_year between %s and %s
-				and b.{budget_against} = %s
-				and exists(
-					select
-						name
-					from
-						`tab{filters.budget_against}`
-					where
-						name = gl.{budget_against}
-						{cond}
-				)
-				group by
-					gl.name
-				order by gl.fiscal_year
+				gl.fiscal_year between %(from_fiscal_year)s and %(to_fiscal_year)s
+				and gl.{budget_against} in %(dimensions)s
+				and gl.account in %(accounts)s
+			group by
+				gl.{budget_against}, gl.account, gl.fiscal_year, month_name
 		""",
-		(filters.from_fiscal_year, filters.to_fiscal_year, name),
+		{
+			"from_fiscal_year": filters.from_fiscal_year,
+			"to_fiscal_year": filters.to_fiscal_year,
+			"dimensions": tuple(dimensions),
+			"accounts": tuple(accounts),
+		},
 		as_dict=1,
 	)
 
-	cc_actual_details = {}
-	for d in ac_details:
-		cc_actual_details.setdefault(d.account, []).append(d)
-
-	return cc_actual_details
+	return {(d.budget_against, d.account, d.fiscal_year, d.month_name): flt(d.amount) for d in ac_details}
 
 
 def get_fiscal_years(filters):
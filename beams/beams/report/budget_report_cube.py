@@ -0,0 +1,133 @@
+# Copyright (c) 2026, efeone and contributors
+# For license information, please see license.txt
+
+import hashlib
+import time
+
+import frappe
+from frappe.utils import flt
+
+CUBE_KEY = "budget_report_cube"
+CUBE_VERSION_KEY = "budget_report_cube_version"
+CUBE_STATS_KEY = "budget_report_cube_stats"
+CUBE_EXPIRY = 6 * 60 * 60
+
+
+def get_report_cube(report, filters, build):
+	'''
+		Returns the precomputed budget cube of a report for the given filters.
+		The cube is built with build(filters) on a miss and kept in Redis until the
+		budgets or GL entries of the companies in scope change.
+	'''
+	key = get_cube_key(report, filters)
+	start = time.monotonic()
+
+	cube = frappe.cache().get_value(key)
+	hit = cube is not None
+	if not hit:
+		cube = build(filters)
+		frappe.cache().set_value(key, cube, expires_in_sec=CUBE_EXPIRY)
+
+	record_cube_timing(report, hit, time.monotonic() - start)
+	return cube
+
+
+def get_cube_key(report, filters):
+	'''
+		Cache key made of the report, the cube version of the companies in scope and the filters.
+	'''
+	filters_hash = hashlib.sha256(frappe.as_json(filters or {}).encode()).hexdigest()
+	return f"{CUBE_KEY}|{report}|{get_cube_version(filters.get('company'))}|{filters_hash}"
+
+
+def get_cube_version(company=None):
+	'''
+		Returns the version token of a company, or of all companies when no company is given.
+	'''
+	if company:
+		return frappe.cache().hget(CUBE_VERSION_KEY, company) or "0"
+
+	versions = frappe.cache().hgetall(CUBE_VERSION_KEY) or {}
+	return "-".join(f"{key}:{value}" for key, value in sorted(versions.items())) or "0"
+
+
+def invalidate_report_cube(doc, method=None):
+	'''
+		Drop the cached cubes of a company by moving it to a new version once the transaction commits.
+		Called on Budget save, submit, cancel, update after submit and delete (the reports include draft budgets)
+		and on GL Entry posting, so a voucher posting many GL Entries moves the version only once.
+	'''
+	if doc.get("company"):
+		queue_cube_invalidation([doc.company])
+
+
+def invalidate_all_report_cubes(doc=None, method=None, *args):
+	'''
+		Drop the cached cubes of every company.
+		Called when a Cost Center, Department, Division or Finance Group the cubes group by is changed, renamed or deleted.
+	'''
+	queue_cube_invalidation(frappe.get_all("Company", pluck="name"))
+
+
+def queue_cube_invalidation(companies):
+	'''
+		Collect the companies to invalidate in the current transaction.
+		The versions move after commit, so a report running meanwhile can not cache pre-commit data under the new version.
+	'''
+	if frappe.flags.report_cube_companies is None:
+		frappe.flags.report_cube_companies = set()
+		frappe.db.after_commit.add(move_cube_versions)
+		frappe.db.after_rollback.add(clear_cube_invalidation)
+	frappe.flags.report_cube_companies.update(companies)
+
+
+def move_cube_versions():
+	companies = frappe.flags.report_cube_companies or set()
+	clear_cube_invalidation()
+	for company in companies:
+		frappe.cache().hset(CUBE_VERSION_KEY, company, frappe.generate_hash(length=10))
+
+
+def clear_cube_invalidation():
+	frappe.flags.report_cube_companies = None
+
+
+def record_cube_timing(report, hit, duration):
+	stats = frappe.cache().hget(CUBE_STATS_KEY, report) or {
+		"hits": 0, "misses": 0, "warm_time": 0.0, "cold_time": 0.0
+	}
+	if hit:
+		stats["hits"] += 1
+		stats["warm_time"] += duration
+	else:
+		stats["misses"] += 1
+		stats["cold_time"] += duration
+
+	frappe.cache().hset(CUBE_STATS_KEY, report, stats)
+
+
+@frappe.whitelist()
+def get_report_cube_stats():
+	'''
+		Returns the hit ratio and the average cold (build) and warm (cached) timings per report.
+	'''
+	frappe.only_for(["System Manager", "Accounts Manager"])
+
+	report_stats = {}
+	for report, stats in (frappe.cache().hgetall(CUBE_STATS_KEY) or {}).items():
+		total = stats["hits"] + stats["misses"]
+		report_stats[report] = {
+			"hits": stats["hits"],
+			"misses": stats["misses"],
+			"hit_ratio": flt(stats["hits"] / total, 4) if total else 0,
+			"avg_cold_ms": flt(stats["cold_time"] * 1000 / stats["misses"], 2) if stats["misses"] else 0,
+			"avg_warm_ms": flt(stats["warm_time"] * 1000 / stats["hits"], 2) if stats["hits"] else 0,
+		}
+
+	return report_stats
+
+
+@frappe.whitelist()
+def reset_report_cube_stats():
+	frappe.only_for(["System Manager", "Accounts Manager"])
+	frappe.cache().delete_value(CUBE_STATS_KEY)
@@ -111,6 +111,12 @@ frappe.query_reports["Detailed Budget Allocation Report"] = {
             fieldtype: "Select",
             options: "ASC\nDESC",
             default: "DESC"
+        },
+        {
+            fieldname: "lazy_tree",
+            label: __("Load Tree on Demand"),
+            fieldtype: "Check",
+            default: 0
         }
     ],
     tree: true,
@@ -118,8 +124,21 @@ frappe.query_reports["Detailed Budget Allocation Report"] = {
     name_field: "id",
     parent_field: "parent",
     initial_depth: 4,
+    onload: function (report) {
+        // Lazy tree mode: expanding a node loads one page of its children
+        report.page.wrapper.on("click", ".budget-tree-expand", function (e) {
+            e.preventDefault();
+            load_tree_children(report, decodeURIComponent($(this).attr("data-parent")), cint($(this).attr("data-start")));
+        });
+    },
     formatter: function (value, row, column, data, default_formatter) {
+        if (data && column.fieldname === "name" && data.is_load_more) {
+            return `<a class="budget-tree-expand" data-parent="${encodeURIComponent(data.parent)}" data-start="${data.start}">${frappe.utils.escape_html(data.name)}</a>`;
+        }
         value = default_formatter(value, row, column, data);
+        if (data && column.fieldname === "name" && data.has_children && !data.children_loaded) {
+            value += ` <a class="budget-tree-expand" data-parent="${encodeURIComponent(data.id)}" data-start="0">${__("[Expand]")}</a>`;
+        }
         if (data && data.indent < 4) {
             value = $(`<span>${value}</span>`);
             var $value = $(value).css("font-weight", "bold");
@@ -128,3 +147,30 @@ frappe.query_reports["Detailed Budget Allocation Report"] = {
         return value;
     }
 };
+
+function load_tree_children(report, parent, start) {
+    frappe.call({
+        method: "beams.beams.report.detailed_budget_allocation_report.detailed_budget_allocation_report.get_tree_children",
+        args: {
+            filters: report.get_filter_values(),
+            parent: parent,
+            start: start
+        },
+        callback: function (r) {
+            let data = report.data;
+            let insert_at;
+            let more_index = data.findIndex(row => row.is_load_more && row.parent === parent);
+            if (more_index >= 0) {
+                // The next page replaces the "Load more" row
+                data.splice(more_index, 1);
+                insert_at = more_index;
+            } else {
+                let parent_index = data.findIndex(row => row.id === parent);
+                data[parent_index].children_loaded = 1;
+                insert_at = parent_index + 1;
+            }
+            data.splice(insert_at, 0, ...(r.message || []));
+            report.datatable.refresh(data);
+        }
+    });
+}
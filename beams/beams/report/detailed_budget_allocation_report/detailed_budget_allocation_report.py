@@ -1,17 +1,56 @@
 import frappe
 from frappe import _
-from frappe.utils import flt, formatdate
+from frappe.utils import cint, flt, formatdate
 from erpnext.controllers.trends import get_period_date_ranges, get_period_month_ranges
 
+from beams.beams.report.budget_report_cube import get_report_cube
+
+TREE_PAGE_LENGTH = 100
+
 def execute(filters=None):
     columns = get_columns(filters)
-    data = get_data(filters)
+    data = get_report_cube('Detailed Budget Allocation Report', filters, get_data)
 
     if not data:
         return columns, []
 
+    if filters.get('lazy_tree'):
+        # Only the top level is sent, the UI loads the children of a node when it is expanded
+        data = get_tree_page(data, '', 0)
+
     return columns, data
 
+@frappe.whitelist()
+def get_tree_children(filters, parent, start=0):
+    '''
+        Returns one page of the direct children of a tree node, read from the cached report cube
+    '''
+    frappe.has_permission('Budget', 'read', throw=True)
+    filters = frappe._dict(frappe.parse_json(filters))
+    get_columns(filters)
+    data = get_report_cube('Detailed Budget Allocation Report', filters, get_data)
+    return get_tree_page(data or [], parent, cint(start))
+
+def get_tree_page(data, parent, start):
+    '''
+        Direct children of a node from `start`, flagged with has_children,
+        followed by a row loading the next page when there are more children
+    '''
+    parents = {row['parent'] for row in data}
+    children = [row for row in data if row['parent'] == parent]
+    end = start + TREE_PAGE_LENGTH
+    page = [dict(row, has_children=row['id'] in parents) for row in children[start:end]]
+    if end < len(children):
+        page.append({
+            'id': '{0}::more'.format(parent),
+            'parent': parent,
+            'indent': children[0]['indent'],
+            'name': _('Load more ({0} remaining)').format(len(children) - end),
+            'is_load_more': 1,
+            'start': end
+        })
+    return page
+
 def get_columns(filters):
     columns = [
         {
@@ -82,66 +121,50 @@ def get_data(filters):
     currency_fields = filters.get("currency_fields", ["total_budget"])
     budget_map = {}
 
-    if filters.get('company'):
-        companies = [filters.get('company')]
-    else:
-        companies = frappe.get_all('Company', pluck='name')
+    company_filters = {'name': filters.get('company')} if filters.get('company') else {}
+    companies = frappe.get_all('Company', filters=company_filters, fields=['name', 'abbr'])
+    finance_groups = get_finance_groups(filters.get('region'))
+
+    # Load every level of the tree once and group it by parent in memory
+    departments_by_parent = get_departments(filters, [company.name for company in companies], finance_groups)
+    divisions_by_department = get_divisions(
+        [dept.name for depts in departments_by_parent.values() for dept in depts], division
+    )
+    budget_rows = get_budget_rows(
+        [div.name for divs in divisions_by_department.values() for div in divs], fiscal_year, months_order
+    )
 
     for company in companies:
-        abbr = frappe.db.get_value('Company', company, 'abbr')
-        data.append({'id': abbr, 'parent': '', 'indent': 0, 'name': company, 'total_budget': 0})
+        abbr = company.abbr
+        data.append({'id': abbr, 'parent': '', 'indent': 0, 'name': company.name, 'total_budget': 0})
         budget_map[abbr] = {field: 0 for field in currency_fields}# Initialize parent total
 
-        if filters.get('region'):
-            if filters.get('region') == 'GCC':
-                finance_groups = ['GCC']
-            else:
-                finance_groups = frappe.get_all('Finance Group', { 'name': ['!=', 'GCC'] }, pluck='name')
-        else:
-            finance_groups = frappe.get_all('Finance Group', pluck='name')
-
         for fg in finance_groups:
             fg_id = f'{fg}-{abbr}'
             data.append({'id': fg_id, 'parent': abbr, 'indent': 1, 'name': fg, 'total_budget': 0})
             budget_map[fg_id] = {field: 0 for field in currency_fields}
 
-            dept_filters = {'finance_group': fg, 'company': company}
-            if filters.get('department'):
-                filter_depts = frappe.parse_json(filters.get('department'))
-                dept_filters['name'] = ['in', filter_depts]
-            departments = frappe.db.get_all('Department', filters=dept_filters , pluck='name')
+            for dept in departments_by_parent.get((company.name, fg), []):
+                data.append({'id': dept.name, 'parent': fg_id, 'indent': 2, 'name': dept.department_name, 'total_budget': 0})
+                budget_map[dept.name] = {field: 0 for field in currency_fields}
 
-            for dept in departments:
-                dept_name = frappe.db.get_value('Department', dept, 'department_name')
-                data.append({'id': dept, 'parent': fg_id, 'indent': 2, 'name': dept_name, 'total_budget': 0})
-                budget_map[dept] = {field: 0 for field in currency_fields}
+                for div in divisions_by_department.get(dept.name, []):
+                    data.append({'id': div.name, 'parent': dept.name, 'indent': 3, 'name': div.division, 'total_budget': 0})
+                    budget_map[div.name] = {field: 0 for field in currency_fields}
 
-                division_filter = {'department': dept}
-                if division:
-                    division_filter['name'] = division
-                divisions = frappe.get_all('Division', filters=division_filter, pluck='name')
-
-                for div in divisions:
-                    division_name = frappe.db.get_value('Division', div, 'division')
-                    data.append({'id': div, 'parent': dept, 'indent': 3, 'name': division_name, 'total_budget': 0})
-                    budget_map[div] = {field: 0 for field in currency_fields}
-
-                    cost_head = filters.get('cost_head', '')
-                    cost_heads = get_cost_heads(div, fiscal_year, cost_category=cost_category, cost_head=cost_head, order_by=sort_by_filter)
+                    division_rows = budget_rows.get(div.name, [])
+                    cost_heads = get_cost_heads(division_rows, cost_category=cost_category, cost_head=filters.get('cost_head', ''), order_by=sort_by_filter)
 
                     for ch in cost_heads:
-                        ch_id = f'{div}-{ch}'
-                        data.append({'id': ch_id, 'parent': div, 'indent': 4, 'name': ch, 'total_budget': 0})
+                        ch_id = f'{div.name}-{ch}'
+                        data.append({'id': ch_id, 'parent': div.name, 'indent': 4, 'name': ch, 'total_budget': 0})
                         budget_map[ch_id] = {field: 0 for field in currency_fields}
 
-                        cost_subhead = filters.get('cost_subhead')
-                        cost_subheads = get_cost_subheads(div, ch, fiscal_year, cost_category=cost_category, cost_subhead=cost_subhead, order_by=sort_by_filter)
+                        cost_subheads = get_cost_subheads(division_rows, ch, cost_category=cost_category, cost_subhead=filters.get('cost_subhead'), order_by=sort_by_filter)
 
                         for csh in cost_subheads:
-                            csh_id = f'{div}-{ch}-{csh}'
-                            cost_details = get_cost_subhead_details(div, ch, csh, fiscal_year)
-                            total_budget = cost_details.get('total_budget', 0)
-                            row_id = cost_details.get('name', )
+                            csh_id = f'{div.name}-{ch}-{csh}'
+                            cost_details = get_cost_subhead_details(division_rows, ch, csh)
                             csh_row = {
                                 'id': csh_id,
                                 'parent': ch_id,
@@ -149,11 +172,10 @@ def get_data(filters):
                                 'name': csh,
                                 'cost_category': cost_details.get('cost_category', ''),
                                 'account': cost_details.get('account', ''),
-                                'total_budget': total_budget
+                                'total_budget': cost_details.get('total_budget', 0)
                             }
                             if period != 'Yearly':
-                                budget_column_data = get_budget_column_data(period, months_order, row_id)
-                                csh_row.update(budget_column_data)
+                                csh_row.update(get_budget_column_data(period, months_order, cost_details))
                             data.append(csh_row)
 
                             # Accumulate child budget into its parent
@@ -162,14 +184,14 @@ def get_data(filters):
 
                         # Propagate cost head budget to department
                         for field in currency_fields:
-                            budget_map[div][field] += budget_map[ch_id][field]
+                            budget_map[div.name][field] += budget_map[ch_id][field]
 
                     # Propagate division budget to departments
                     for field in currency_fields:
-                        budget_map[dept][field] += budget_map[div][field]
+                        budget_map[dept.name][field] += budget_map[div.name][field]
                 # Propagate department budget to finance group
                 for field in currency_fields:
-                    budget_map[fg_id][field] += budget_map[dept][field]
+                    budget_map[fg_id][field] += budget_map[dept.name][field]
 
             # Propagate finance group budget to company
             for field in currency_fields:
@@ -181,108 +203,125 @@ def get_data(filters):
 
     return data
 
-def get_cost_heads(division, fiscal_year, cost_category=None, cost_head=None, order_by='DESC'):
+def get_finance_groups(region=None):
     '''
-        Method to get Cost Heads based on Fiscal Year and Department
+        Method to get Finance Groups for the selected region
     '''
+    if region == 'GCC':
+        return ['GCC']
+    if region:
+        return frappe.get_all('Finance Group', { 'name': ['!=', 'GCC'] }, pluck='name')
+    return frappe.get_all('Finance Group', pluck='name')
+
+def get_departments(filters, companies, finance_groups):
+    '''
+        Method to get Departments of all companies and finance groups, grouped by (company, finance group)
+    '''
+    departments_by_parent = {}
+    if not (companies and finance_groups):
+        return departments_by_parent
+
+    dept_filters = {'finance_group': ['in', finance_groups], 'company': ['in', companies]}
+    if filters.get('department'):
+        dept_filters['name'] = ['in', frappe.parse_json(filters.get('department'))]
+
+    for dept in frappe.get_all('Department', filters=dept_filters, fields=['name', 'department_name', 'company', 'finance_group']):
+        departments_by_parent.setdefault((dept.company, dept.finance_group), []).append(dept)
+    return departments_by_parent
+
+def get_divisions(departments, division=None):
+    '''
+        Method to get Divisions of all departments, grouped by department
+    '''
+    divisions_by_department = {}
+    if not departments:
+        return divisions_by_department
+
+    division_filter = {'department': ['in', departments]}
+    if division:
+        division_filter['name'] = division
+
+    for div in frappe.get_all('Division', filters=division_filter, fields=['name', 'division', 'department']):
+        divisions_by_department.setdefault(div.department, []).append(div)
+    return divisions_by_department
+
+def get_budget_rows(divisions, fiscal_year, months_order):
+    '''
+        Method to get all Budget Account rows of the divisions for the fiscal year in one query, grouped by division
+    '''
+    budget_rows = {}
+    if not divisions:
+        return budget_rows
+
     query = '''
         SELECT
-            DISTINCT ba.cost_head
+            b.division,
+            ba.name,
+            ba.cost_head,
+            ba.cost_subhead,
+            ba.cost_category,
+            ba.account,
+            ba.budget_amount,
+            ba.budget_amount_inr as total_budget,
+            {0}
         FROM
             `tabBudget Account` ba
         JOIN
             `tabBudget` b ON ba.parent = b.name
         WHERE
-            b.division = %(division)s AND
+            b.division IN %(divisions)s AND
             b.fiscal_year = %(fiscal_year)s
+    '''.format(', '.join(f'ba.{month}' for month in months_order))
+
+    for row in frappe.db.sql(query, {'divisions': tuple(divisions), 'fiscal_year': fiscal_year}, as_dict=True):
+        budget_rows.setdefault(row.division, []).append(row)
+    return budget_rows
+
+def get_cost_heads(division_rows, cost_category=None, cost_head=None, order_by='DESC'):
     '''
-    query_filters = {
-        'division': division,
-        'fiscal_year': fiscal_year
-    }
-    if cost_category:
-        query += ' AND ba.cost_category = %(cost_category)s'
-        query_filters['cost_category'] = cost_category
-    if cost_head:
-        query += ' AND ba.cost_head = %(cost_head)s'
-        query_filters['cost_head'] = cost_head
-    query += 'GROUP BY ba.cost_head ORDER BY SUM(ba.budget_amount) {0}'.format(order_by)
-    cost_heads = frappe.db.sql(query, query_filters, as_dict=True)
-    return [row.cost_head for row in cost_heads]
-
-def get_cost_subheads(division, cost_head, fiscal_year, cost_category=None, cost_subhead=None, order_by='DESC'):
+        Method to get Cost Heads of a division ordered by their total budget
     '''
-        Method to get Cost Subeads based on Fiscal Year and Department
+    totals = {}
+    for row in division_rows:
+        if cost_category and row.cost_category != cost_category:
+            continue
+        if cost_head and row.cost_head != cost_head:
+            continue
+        totals[row.cost_head] = totals.get(row.cost_head, 0) + flt(row.budget_amount)
+    return sorted(totals, key=lambda ch: totals[ch], reverse=(order_by == 'DESC'))
+
+def get_cost_subheads(division_rows, cost_head, cost_category=None, cost_subhead=None, order_by='DESC'):
     '''
-    query = '''
-        SELECT
-            DISTINCT ba.cost_subhead
-        FROM
-            `tabBudget Account` ba
-        JOIN
-            `tabBudget` b ON ba.parent = b.name
-        WHERE
-            ba.cost_head = %(cost_head)s AND
-            b.fiscal_year = %(fiscal_year)s AND
-            b.division = %(division)s
+        Method to get Cost Subheads of a division and cost head ordered by budget amount
     '''
-    query_filters = {
-        'cost_head':cost_head,
-        'fiscal_year':fiscal_year,
-        'division':division,
-        'order_by': order_by
-    }
-    if cost_category:
-        query += ' AND ba.cost_category = %(cost_category)s'
-        query_filters['cost_category'] = cost_category
-    if cost_subhead:
-        query += ' AND ba.cost_subhead = %(cost_subhead)s'
-        query_filters['cost_subhead'] = cost_subhead
-    query += 'ORDER BY ba.budget_amount {0}'.format(order_by)
-    cost_subheads = frappe.db.sql(query, query_filters, as_dict=True)
-    return [row.cost_subhead for row in cost_subheads]
-
-def get_cost_subhead_details(division, cost_head, cost_subhead, fiscal_year):
+    amounts = {}
+    for row in division_rows:
+        if row.cost_head != cost_head:
+            continue
+        if cost_category and row.cost_category != cost_category:
+            continue
+        if cost_subhead and row.cost_subhead != cost_subhead:
+            continue
+        amounts.setdefault(row.cost_subhead, flt(row.budget_amount))
+    return sorted(amounts, key=lambda csh: amounts[csh], reverse=(order_by == 'DESC'))
+
+def get_cost_subhead_details(division_rows, cost_head, cost_subhead):
     subhead_details = {
         'cost_category': '',
         'account': '',
         'total_budget': 0
     }
-    query = '''
-        SELECT
-            ba.name,
-            ba.cost_category,
-            ba.account,
-            ba.budget_amount_inr as total_budget
-        FROM
-            `tabBudget Account` ba
-        JOIN
-            `tabBudget` b ON ba.parent = b.name
-        WHERE
-            b.division = %(division)s AND
-            b.fiscal_year = %(fiscal_year)s AND
-            ba.cost_head = %(cost_head)s AND
-            ba.cost_subhead = %(cost_subhead)s
-    '''
-    query_params = {
-        'division':division,
-        'fiscal_year':fiscal_year,
-        'cost_head':cost_head,
-        'cost_subhead':cost_subhead
-    }
-
-    details = frappe.db.sql(query, query_params, as_dict=True)
-    if details:
-        subhead_details = details[0]
+    for row in division_rows:
+        if row.cost_head == cost_head and row.cost_subhead == cost_subhead:
+            return row
     return subhead_details
 
-def get_budget_column_data(period, months_order, row_id):
+def get_budget_column_data(period, months_order, data):
     '''
         Get Columnar data specif to period
     '''
     budget_column_data = {}
-    if frappe.db.exists('Budget Account', row_id):
-        data = frappe.db.get_value('Budget Account', row_id, fieldname=months_order, as_dict=True)
+    if data.get('name'):
         if period == 'Monthly':
             for month in months_order:
                 label = 'budget_({0})'.format(month[0:3])
@@ -290,7 +329,7 @@ def get_budget_column_data(period, months_order, row_id):
         if period == 'Quarterly':
             total = 0
             for i, month in enumerate(months_order):
-                total += data.get(month)
+                total += flt(data.get(month))
                 if i in [2, 5, 8, 11]:
                     label = 'budget_({0}_{1})'.format(months_order[i-2][0:3], month[0:3])
                     budget_column_data[label] = total
@@ -298,7 +337,7 @@ def get_budget_column_data(period, months_order, row_id):
         if period == 'Half-Yearly':
             total = 0
             for i, month in enumerate(months_order):
-                total += data.get(month)
+                total += flt(data.get(month))
                 if i in [5, 11]:
                     label = 'budget_({0}_{1})'.format(months_order[i-5][0:3], month[0:3])
                     budget_column_data[label] = total
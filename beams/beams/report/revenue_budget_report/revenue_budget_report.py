@@ -82,41 +82,34 @@ def get_data(filters=None):
     currency_fields = filters.get("currency_fields", ["total_revenue"])
     revenue_map = {}
 
-    if filters.get('company'):
-        companies = [filters.get('company')]
-    else:
-        companies = frappe.get_all('Company', pluck='name')
+    company_filters = {'name': filters.get('company')} if filters.get('company') else {}
+    companies = frappe.get_all('Company', filters=company_filters, fields=['name', 'abbr'])
 
     for company in companies:
-        abbr = frappe.db.get_value('Company', company, 'abbr')
-        data.append({'id': abbr, 'parent': '', 'indent': 0, 'name': company, 'total_revenue': 0})
+        abbr = company.abbr
+        data.append({'id': abbr, 'parent': '', 'indent': 0, 'name': company.name, 'total_revenue': 0})
         revenue_map[abbr] = {field: 0 for field in currency_fields}# Initialize parent total
 
-        categories = get_categories(company, fiscal_year)
-        for cat in categories:
+        groups_by_category, centres_by_group = get_revenue_tree(company.name, fiscal_year, months_order)
+        for cat, revenue_groups in groups_by_category.items():
             data.append({'id': cat, 'parent': abbr, 'indent': 1, 'name': cat, 'total_revenue': 0})
             revenue_map[cat] = {field: 0 for field in currency_fields}
 
-            revenue_groups = get_revenue_groups(company, fiscal_year, cat)
             for group in revenue_groups:
                 data.append({'id': group, 'parent': cat, 'indent': 2, 'name': group, 'total_revenue': 0})
                 revenue_map[group] = {field: 0 for field in currency_fields}
 
-                centres = get_centers(company, fiscal_year, group)
-                for centre in centres:
+                for centre in centres_by_group.get(group, []):
                     centre_name = centre.get('revenue_centre', '')
-                    row_id = centre.get('name', '')
-                    total_revenue = centre.get('total_revenue', 0)
                     rc_row = {
                         'id': centre_name,
                         'parent': group,
                         'indent': 3,
                         'name': centre_name,
-                        'total_revenue': total_revenue
+                        'total_revenue': centre.get('total_revenue', 0)
                     }
                     if period != 'Yearly':
-                        revenue_column_data = get_revenue_column_data(period, months_order, row_id)
-                        rc_row.update(revenue_column_data)
+                        rc_row.update(get_revenue_column_data(period, months_order, centre))
                     data.append(rc_row)
 
                     for field in currency_fields:
@@ -133,99 +126,59 @@ def get_data(filters=None):
         row.update(revenue_map.get(row['id'], {}))
     return data
 
-def get_categories(company, fiscal_year):
+def get_revenue_tree(company, fiscal_year, months_order):
     '''
-        Method to get Revenue Categories
-    '''
-    query = '''
-        SELECT
-            DISTINCT br.revenue_category
-        FROM
-            `tabRevenue Budget` br
-        WHERE
-            br.fiscal_year = %(fiscal_year)s AND
-            br.company = %(company)s
-    '''
-    query_filters = {
-        'company':company,
-        'fiscal_year':fiscal_year
-    }
-    cost_categories = frappe.db.sql(query, query_filters, as_dict=True)
-    return [row.revenue_category for row in cost_categories]
-
-def get_revenue_groups(company, fiscal_year, revenue_category):
-    '''
-        Method to get Revenue Categories
-    '''
-    query = '''
-        SELECT
-            DISTINCT br.revenue_group
-        FROM
-            `tabRevenue Budget` br
-        WHERE
-            br.fiscal_year = %(fiscal_year)s AND
-            br.revenue_category = %(revenue_category)s AND
-            br.company = %(company)s
-    '''
-    query_filters = {
-        'company':company,
-        'fiscal_year':fiscal_year,
-        'revenue_category':revenue_category
-    }
-    revenue_groups = frappe.db.sql(query, query_filters, as_dict=True)
-    return [row.revenue_group for row in revenue_groups]
-
-def get_centers(company, fiscal_year, revenue_group):
-    '''
-        Method to get Revenue Centres
+        Method to get the Revenue Category > Revenue Group > Revenue Centre tree of a company with the
+        monthly Revenue Account amounts in one query
     '''
     query = '''
         SELECT
+            br.revenue_category,
+            br.revenue_group,
             ra.revenue_centre,
             ra.name,
-            ra.revenue_amount as total_revenue
+            ra.revenue_amount as total_revenue,
+            {0}
         FROM
-            `tabRevenue Account` ra
-        JOIN
-            `tabRevenue Budget` br ON ra.parent = br.name
+            `tabRevenue Budget` br
+        LEFT JOIN
+            `tabRevenue Account` ra ON ra.parent = br.name
         WHERE
             br.fiscal_year = %(fiscal_year)s AND
-            br.company = %(company)s AND
-            br.revenue_group = %(revenue_group)s
-    '''
+            br.company = %(company)s
+    '''.format(', '.join(f'ra.{month}' for month in months_order))
     query_filters = {
         'company': company,
-        'fiscal_year': fiscal_year,
-        'revenue_group': revenue_group
+        'fiscal_year': fiscal_year
     }
-    revenue_centres = frappe.db.sql(query, query_filters, as_dict=True)
-    return revenue_centres
 
-def get_revenue_column_data(period, months_order, row_id):
+    groups_by_category = {}
+    centres_by_group = {}
+    for row in frappe.db.sql(query, query_filters, as_dict=True):
+        groups = groups_by_category.setdefault(row.revenue_category, [])
+        if row.revenue_group not in groups:
+            groups.append(row.revenue_group)
+        if row.name:
+            centres_by_group.setdefault(row.revenue_group, []).append(row)
+    return groups_by_category, centres_by_group
+
+def get_revenue_column_data(period, months_order, data):
     '''
         Get Columnar data specif to period
     '''
     revenue_column_data = {}
-    if frappe.db.exists('Revenue Account', row_id):
-        data = frappe.db.get_value('Revenue Account', row_id, fieldname=months_order, as_dict=True)
-        if period == 'Monthly':
-            for month in months_order:
-                label = 'revenue_({0})'.format(month[0:3])
-                revenue_column_data[label] = data.get(month)
-        if period == 'Quarterly':
-            total = 0
-            for i, month in enumerate(months_order):
-                total += data.get(month)
-                if i in [2, 5, 8, 11]:
-                    label = 'revenue_({0}_{1})'.format(months_order[i-2][0:3], month[0:3])
-                    revenue_column_data[label] = total
-                    total = 0
-        if period == 'Half-Yearly':
-            total = 0
-            for i, month in enumerate(months_order):
-                total += data.get(month)
-                if i in [5, 11]:
-                    label = 'revenue_({0}_{1})'.format(months_order[i-5][0:3], month[0:3])
-                    revenue_column_data[label] = total
-                    total = 0
-    return revenue_column_data
\ No newline at end of file
+    if period == 'Monthly':
+        for month in months_order:
+            label = 'revenue_({0})'.format(month[0:3])
+            revenue_column_data[label] = data.get(month)
+        return revenue_column_data
+
+    # Quarterly and half-yearly buckets are sums over consecutive slices of the month columns
+    bucket_size = {'Quarterly': 3, 'Half-Yearly': 6}.get(period)
+    if bucket_size:
+        values = [flt(data.get(month)) for month in months_order]
+        for start in range(0, len(months_order), bucket_size):
+            end = start + bucket_size - 1
+            label = 'revenue_({0}_{1})'.format(months_order[start][0:3], months_order[end][0:3])
+            revenue_column_data[label] = sum(values[start:end + 1])
+    return revenue_column_data
@@ -187,7 +187,9 @@ doc_events = {
 		"autoname": "beams.beams.custom_scripts.quotation.quotation.autoname"
 	},
 	"Purchase Invoice": {
-		"before_save": "beams.beams.custom_scripts.purchase_invoice.purchase_invoice.before_save"
+		"before_save": "beams.beams.custom_scripts.purchase_invoice.purchase_invoice.before_save",
+		"on_submit": "beams.beams.doctype.budget_consumption.budget_consumption.refresh_consumption_from_document",
+		"on_cancel": "beams.beams.doctype.budget_consumption.budget_consumption.refresh_consumption_from_document"
 	},
 	"Account": {
 		"after_insert": "beams.beams.custom_scripts.account.account.create_todo_on_creation_for_account"
@@ -212,13 +214,17 @@ doc_events = {
 		"after_insert": "beams.beams.custom_scripts.purchase_order.purchase_order.create_todo_on_purchase_order_creation",
 		"before_save": "beams.beams.custom_scripts.purchase_order.purchase_order.validate_budget",
 		# "validate": "beams.beams.custom_scripts.purchase_order.purchase_order.fetch_department_from_cost_center",
-		"on_change":"beams.beams.custom_scripts.purchase_order.purchase_order.update_equipment_quantities"
+		"on_change": [
+			"beams.beams.custom_scripts.purchase_order.purchase_order.update_equipment_quantities",
+			"beams.beams.doctype.budget_consumption.budget_consumption.refresh_consumption_from_document"
+		]
 	},
 	"Material Request":{
 		"before_save":"beams.beams.custom_scripts.purchase_order.purchase_order.validate_budget",
 		"after_insert":"beams.beams.custom_scripts.material_request.material_request.notify_stock_managers",
 		"on_update": "beams.beams.custom_scripts.material_request.material_request.create_todo_for_hod",
-		"validate": "beams.beams.custom_scripts.material_request.material_request.validate"
+		"validate": "beams.beams.custom_scripts.material_request.material_request.validate",
+		"on_change": "beams.beams.doctype.budget_consumption.budget_consumption.refresh_consumption_from_document"
 	},
 	"Sales Order": {
 		"autoname": "beams.beams.custom_scripts.sales_order.sales_order.autoname",
@@ -245,6 +251,12 @@ doc_events = {
 		],
 	},
 
+	"GL Entry": {
+		"on_submit": [
+			"beams.beams.doctype.budget_consumption.budget_consumption.update_consumption_from_gl_entry",
+			"beams.beams.report.budget_report_cube.invalidate_report_cube"
+		]
+	},
 	"Journal Entry": {
 		"on_cancel": "beams.beams.custom_scripts.journal_entry.journal_entry.on_cancel"
 	},
@@ -256,7 +268,9 @@ doc_events = {
 			"beams.beams.custom_scripts.job_applicant.job_applicant.calculate_and_validate_age"
 			],
 		"after_insert":"beams.beams.custom_scripts.job_applicant.job_applicant.set_interview_rounds",
-		"autoname":"beams.beams.custom_scripts.job_applicant.job_applicant.autoname"
+		"autoname":"beams.beams.custom_scripts.job_applicant.job_applicant.autoname",
+		"on_update":"beams.www.job_portal.index.clear_job_portal_cache",
+		"on_trash":"beams.www.job_portal.index.clear_job_portal_cache"
 	},
 	"Interview": {
 		"on_submit": [
@@ -301,7 +315,13 @@ doc_events = {
 		"validate":  [
 			"beams.beams.custom_scripts.employee.employee.validate",
 			"beams.beams.custom_scripts.employee.employee.validate_offer_dates"
-		]
+		],
+		"on_update": "beams.beams.permission_context.clear_permission_context",
+		"on_trash": "beams.beams.permission_context.clear_permission_context"
+	},
+	"User": {
+		"on_update": "beams.beams.permission_context.clear_permission_context",
+		"on_trash": "beams.beams.permission_context.clear_permission_context"
 	},
 	"Job Offer" : {
 		"on_submit":"beams.beams.custom_scripts.job_offer.job_offer.make_employee",
@@ -382,8 +402,33 @@ doc_events = {
 	},
 	"Budget":{
 		"validate":"beams.beams.custom_scripts.budget.budget.beams_budget_validate",
-		"before_validate":"beams.beams.custom_scripts.budget.budget.populate_og_accounts"
+		"before_validate":"beams.beams.custom_scripts.budget.budget.populate_og_accounts",
+		"on_update": "beams.beams.report.budget_report_cube.invalidate_report_cube",
+		"on_submit": "beams.beams.report.budget_report_cube.invalidate_report_cube",
+		"on_cancel": "beams.beams.report.budget_report_cube.invalidate_report_cube",
+		"on_update_after_submit": "beams.beams.report.budget_report_cube.invalidate_report_cube",
+		"on_trash": "beams.beams.report.budget_report_cube.invalidate_report_cube"
 	 },
+	"Cost Center": {
+		"on_update": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"after_rename": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"on_trash": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes"
+	},
+	"Department": {
+		"on_update": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"after_rename": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"on_trash": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes"
+	},
+	"Division": {
+		"on_update": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"after_rename": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"on_trash": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes"
+	},
+	"Finance Group": {
+		"on_update": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"after_rename": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes",
+		"on_trash": "beams.beams.report.budget_report_cube.invalidate_all_report_cubes"
+	},
 	"Training Program": {
 		"validate": "beams.beams.custom_scripts.training_program.training_program.validate_training_program"
 	},
@@ -391,10 +436,13 @@ doc_events = {
 		"validate" :"beams.beams.custom_scripts.voucher_entry_type.voucher_entry_type.validate_repeating_companies"
 	},
 	"Vehicle" :{
+		"validate":"beams.beams.custom_scripts.vehicle.vehicle.set_next_reminder_dates",
 		"on_update":"beams.beams.custom_scripts.vehicle.vehicle.create_vehicle_documents_log"
 	},
 	"Job Opening": {
-		"after_insert": "beams.beams.custom_scripts.job_opening.job_opening.generate_qr_for_job"
+		"after_insert": "beams.beams.custom_scripts.job_opening.job_opening.generate_qr_for_job",
+		"on_update": "beams.www.job_portal.index.clear_job_portal_cache",
+		"on_trash": "beams.www.job_portal.index.clear_job_portal_cache"
 	}
 }
 
@@ -411,7 +459,9 @@ scheduler_events = {
 		"beams.beams.doctype.beams_hr_settings.beams_hr_settings.send_appraisal_reminders",
 		"beams.beams.custom_scripts.vehicle.vehicle.send_vehicle_document_reminders",
 		"beams.beams.doctype.beams_admin_settings.beams_admin_settings.send_asset_audit_reminder",
-		"beams.beams.doctype.beams_admin_settings.beams_admin_settings.send_asset_reservation_notifications"
+		"beams.beams.doctype.beams_admin_settings.beams_admin_settings.send_asset_reservation_notifications",
+		"beams.www.job_application_upload.upload_doc.clear_stale_uploads",
+		"beams.beams.qr_service.queue_missing_qr_codes"
 	],
 # "all": [
 # "beams.tasks.all"
@@ -425,6 +475,9 @@ scheduler_events = {
 # "weekly": [
 # "beams.tasks.weekly"
 # ],
+	"hourly": [
+		"beams.beams.qr_service.start_qr_queue_processing"
+	],
 	"monthly": [
 		"beams.beams.custom_scripts.asset.asset.asset_notifications"
 	],
@@ -472,6 +525,7 @@ override_doctype_dashboards = {
 # ----------------
 # before_request = ["beams.utils.before_request"]
 # after_request = ["beams.utils.after_request"]
+after_request = ["beams.api.api.set_etag_header"]
 
 # Job Events
 # ----------
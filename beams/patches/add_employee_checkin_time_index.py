@@ -0,0 +1,7 @@
+import frappe
+
+def execute():
+    '''
+        Composite index used by the check-in window lookups of Attendance Requests
+    '''
+    frappe.db.add_index('Employee Checkin', ['employee', 'time'], index_name='employee_time_index')
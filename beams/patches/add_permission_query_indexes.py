@@ -0,0 +1,8 @@
+import frappe
+
+def execute():
+    '''
+        Indexes used by the permission query conditions on HRMS and ERPNext doctypes
+    '''
+    frappe.db.add_index('Interview Detail', ['interviewer'])
+    frappe.db.add_index('Employee', ['department'])
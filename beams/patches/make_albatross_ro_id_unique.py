@@ -0,0 +1,49 @@
+import frappe
+
+def execute():
+    '''
+        Clear empty and repeated Albatross RO IDs on Quotation and add the unique index used by the Release Order API.
+        A repeated RO ID is kept on its submitted (or else first created) Quotation and cleared only on draft and cancelled ones.
+        When an RO ID is used by more than one submitted Quotation, the patch fails and lists them for manual resolution.
+    '''
+    frappe.db.sql("""
+        UPDATE `tabQuotation` SET albatross_ro_id = NULL
+        WHERE albatross_ro_id = ''
+    """)
+
+    duplicates = frappe.db.sql("""
+        SELECT name, albatross_ro_id, docstatus
+        FROM `tabQuotation`
+        WHERE albatross_ro_id IN (
+            SELECT albatross_ro_id FROM `tabQuotation`
+            WHERE albatross_ro_id IS NOT NULL
+            GROUP BY albatross_ro_id HAVING COUNT(*) > 1
+        )
+        ORDER BY albatross_ro_id, docstatus = 1 DESC, creation
+    """, as_dict=True)
+
+    submitted = {}
+    for quotation in duplicates:
+        if quotation.docstatus == 1:
+            submitted.setdefault(quotation.albatross_ro_id, []).append(quotation.name)
+    conflicts = {ro_id: names for ro_id, names in submitted.items() if len(names) > 1}
+    if conflicts:
+        frappe.throw(
+            'Albatross RO IDs used by more than one submitted Quotation, resolve them before migrating: {0}'.format(
+                '; '.join('{0}: {1}'.format(ro_id, ', '.join(names)) for ro_id, names in conflicts.items())
+            )
+        )
+
+    kept = set()
+    for quotation in duplicates:
+        if quotation.albatross_ro_id not in kept:
+            kept.add(quotation.albatross_ro_id)
+            continue
+        frappe.db.set_value('Quotation', quotation.name, 'albatross_ro_id', None, update_modified=False)
+        message = 'Albatross RO ID {0} cleared on Quotation {1}, it is already used by another Quotation'.format(
+            quotation.albatross_ro_id, quotation.name
+        )
+        frappe.get_doc('Quotation', quotation.name).add_comment('Comment', message)
+        frappe.log_error(title='Albatross RO ID cleared', message=message, reference_doctype='Quotation', reference_name=quotation.name)
+
+    frappe.db.add_unique('Quotation', ['albatross_ro_id'], constraint_name='albatross_ro_id')
@@ -0,0 +1,21 @@
+import frappe
+
+def execute():
+    '''
+        Set the last odometer of each vehicle from the final reading of its latest submitted Trip Sheet
+    '''
+    frappe.db.sql("""
+        UPDATE `tabVehicle` v
+        INNER JOIN `tabTrip Sheet` ts ON ts.vehicle = v.name AND ts.docstatus = 1
+        SET v.last_odometer = ts.final_odometer_reading
+        WHERE ts.final_odometer_reading IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM `tabTrip Sheet` later
+                WHERE later.vehicle = ts.vehicle
+                    AND later.docstatus = 1
+                    AND (
+                        later.starting_date_and_time > ts.starting_date_and_time
+                        OR (later.starting_date_and_time = ts.starting_date_and_time AND later.creation > ts.creation)
+                    )
+            )
+    """)
@@ -0,0 +1,12 @@
+import frappe
+
+def execute():
+    '''
+        Backfill the next reminder date of the existing vehicle document rows
+    '''
+    frappe.db.sql("""
+        UPDATE `tabVehicle Documents` vd
+        LEFT JOIN `tabVehicle Document` d ON d.name = vd.document
+        SET vd.next_reminder_date = DATE_SUB(vd.expiry_date, INTERVAL IFNULL(d.reminder_before, 0) DAY)
+        WHERE vd.expiry_date IS NOT NULL
+    """)
@@ -1450,7 +1450,9 @@ def get_quotation_custom_fields():
 				"fieldtype": "Data",
 				"label": "Albatross RO ID",
 				"insert_after": "albatross_details_section",
-				"read_only":1
+				"read_only":1,
+				"unique":1,
+				"no_copy":1
 			},
 			{
 				"fieldname": "ro_no",
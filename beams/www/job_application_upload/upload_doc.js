@@ -4,28 +4,82 @@ $(document).ready(function () {
 	const { get_query_params, get_query_string } = frappe.utils;
 	const applicant_id = $("#docname").val();
 
-	// Handle file selection and reading for each file input
+	// Upload each selected file in chunks and keep the returned file ids on the input
+	const UPLOAD_METHOD = "beams.www.job_application_upload.upload_doc.";
+	const CHUNK_SIZE = 1024 * 1024;
 	var $form = $('form[id="submit_application"]');
 	$form.on("change", '[type="file"]', function () {
-	var $input = $(this);
-	var input = $input.get(0);
+	var input = $(this).get(0);
 	if (input.files.length) {
-		input.filedata = { files_data: [] };
-		$.each(input.files, function (key, value) {
-		setupReader(value, input);
-		});
+		input.filedata = { files: [] };
+		input.uploading = Promise.all(
+		Array.from(input.files).map((file) =>
+			upload_file(file).then((file_id) => input.filedata.files.push(file_id))
+		)
+		);
 	}
 	});
-	function setupReader(file, input) {
-	var reader = new FileReader();
-	reader.onload = function (e) {
-		input.filedata.files_data.push({
-		__file_attachment: 1,
+
+	function call_upload_method(method, args) {
+	return new Promise((resolve, reject) => {
+		frappe.call({
+		method: UPLOAD_METHOD + method,
+		args: args,
+		callback: (r) => resolve(r.message),
+		error: reject,
+		});
+	});
+	}
+
+	function send_chunk(upload_id, file, offset) {
+	const form_data = new FormData();
+	form_data.append("upload_id", upload_id);
+	form_data.append("offset", offset);
+	form_data.append("chunk", file.slice(offset, offset + CHUNK_SIZE));
+	return fetch("/api/method/" + UPLOAD_METHOD + "upload_chunk", {
+		method: "POST",
+		headers: { "X-Frappe-CSRF-Token": frappe.csrf_token },
+		body: form_data,
+	})
+		.then((response) => {
+		if (!response.ok) throw new Error("Upload failed for " + file.name);
+		return response.json();
+		})
+		.then((r) => r.message.offset);
+	}
+
+	async function upload_file(file) {
+	let session = await call_upload_method("start_upload", {
+		docname: applicant_id,
 		filename: file.name,
-		dataurl: reader.result,
+		file_size: file.size,
+	});
+	let offset = session.offset;
+	let retries = 0;
+	while (offset < file.size) {
+		try {
+		offset = await send_chunk(session.upload_id, file, offset);
+		retries = 0;
+		} catch (err) {
+		// Resume from the offset the server has received
+		if (++retries > 3) throw err;
+		session = await call_upload_method("start_upload", {
+			docname: applicant_id,
+			filename: file.name,
+			file_size: file.size,
+			upload_id: session.upload_id,
 		});
-	};
-		reader.readAsDataURL(file);
+		offset = session.offset;
+		}
+	}
+	const r = await call_upload_method("finish_upload", { upload_id: session.upload_id });
+	return r.file;
+	}
+
+	function wait_for_uploads() {
+	return Promise.all(
+		$form.find('[type="file"]').toArray().map((input) => input.uploading || Promise.resolve())
+	);
 	}
 
   // Safely sanitize values
@@ -533,7 +587,7 @@ $(document).ready(function () {
 	});
 
 	$("#form-error").hide();
-	frappe.call({
+	wait_for_uploads().then(() => frappe.call({
 	method:
 		"beams.www.job_application_upload.upload_doc.update_register_form",
 		args: {
@@ -560,6 +614,6 @@ $(document).ready(function () {
 		error: function (err) {
 		showError("An error occurred during submission.");
 		},
-	});
+	}), () => showError("An error occurred while uploading the attachments."));
 });
 });
\ No newline at end of file
@@ -1,12 +1,22 @@
 import datetime
+import hashlib
 import json
+import mimetypes
+import os
+import shutil
+import time
 
 import frappe
 from frappe import _
-from frappe.utils import escape_html
+from frappe.handler import ALLOWED_MIMETYPES
+from frappe.utils import cint, escape_html
 from frappe.utils.file_manager import save_file
 from frappe.utils.password import decrypt
 
+UPLOAD_SESSION_KEY = 'job_application_upload'
+UPLOAD_SESSION_EXPIRY = 24 * 60 * 60
+UPLOAD_BUFFER_SIZE = 64 * 1024
+
 
 def get_context(context):
 	'''
@@ -67,6 +77,7 @@ def update_register_form(docname, form_data=None):
 			frappe.throw('Missing required field: Applicant Name')
 
 		doc = frappe.get_doc('Job Applicant', docname)
+		uploaded_files = get_uploaded_files(form_data, docname)
 
 		def sanitize(field):
 			return escape_html(form_data.get(field) or '')
@@ -144,13 +155,13 @@ def update_register_form(docname, form_data=None):
 
 		for field in ['payslip_month_1', 'payslip_month_2', 'payslip_month_3']:
 			if form_data.get(field):
-				filename = update_file(form_data[field], 'Job Applicant', docname) or ''
+				filename = get_attachment_url(form_data[field], docname, uploaded_files) or ''
 				setattr(doc, field, filename)
 
 		doc.education_qualification = []
 		for row in form_data.get('education_qualification', []):
 			if row.get('course'):
-				filename = update_file(row.get('attachments'), 'Job Applicant', docname) or ''
+				filename = get_attachment_url(row.get('attachments'), docname, uploaded_files) or ''
 				doc.append('education_qualification', {
 					'course': row.get('course'),
 					'name_of_school_college': row.get('name_of_school_college'),
@@ -164,7 +175,7 @@ def update_register_form(docname, form_data=None):
 		doc.professional_certification = []
 		for row in form_data.get('professional_certification', []):
 			if row.get('course'):
-				filename = update_file(row.get('attachments'), 'Job Applicant', docname) or ''
+				filename = get_attachment_url(row.get('attachments'), docname, uploaded_files) or ''
 				doc.append('professional_certification', {
 					'course': row.get('course'),
 					'institute_name': row.get('institute_name'),
@@ -178,7 +189,7 @@ def update_register_form(docname, form_data=None):
 		doc.prev_emp_his = []
 		for row in form_data.get('prev_emp_his', []):
 			if row.get('name_of_org'):
-				filename = update_file(row.get('attachments'), 'Job Applicant', docname) or ''
+				filename = get_attachment_url(row.get('attachments'), docname, uploaded_files) or ''
 				doc.append('prev_emp_his', {
 					'name_of_org': row.get('name_of_org'),
 					'prev_designation': row.get('prev_designation'),
@@ -204,12 +215,47 @@ def update_register_form(docname, form_data=None):
 		return {'message': 'success', 'docname': doc.name}
 
 	except Exception as e:
+		frappe.db.rollback()
 		frappe.log_error(
 			title='Job Application Update Failed',
 			message=f'Error updating applicant \'{docname}\'\nException: {str(e)}'
 		)
 		return {'message': str(e)}
 
+def get_uploaded_files(form_data, docname):
+	'''
+		Returns the file url of every uploaded file referenced in the form data, loaded in one query.
+		Only files attached to the Job Applicant are resolved.
+	'''
+	attachments = [form_data.get(field) for field in ['payslip_month_1', 'payslip_month_2', 'payslip_month_3']]
+	for table in ['education_qualification', 'professional_certification', 'prev_emp_his']:
+		attachments += [row.get('attachments') for row in form_data.get(table, [])]
+
+	file_ids = [file_id for filedata in attachments if filedata for file_id in filedata.get('files') or []]
+	if not file_ids:
+		return {}
+	return dict(frappe.get_all(
+		'File',
+		filters={
+			'name': ['in', file_ids],
+			'attached_to_doctype': 'Job Applicant',
+			'attached_to_name': docname
+		},
+		fields=['name', 'file_url'],
+		as_list=True
+	))
+
+def get_attachment_url(filedata, docname, uploaded_files):
+	'''
+		Returns the file url of an attachment field, either uploaded in chunks (file ids) or sent inline as data urls
+	'''
+	if not filedata:
+		return None
+	if filedata.get('files'):
+		file_urls = [uploaded_files.get(file_id) for file_id in filedata['files'] if uploaded_files.get(file_id)]
+		return file_urls[-1] if file_urls else None
+	return update_file(filedata, 'Job Applicant', docname)
+
 @frappe.whitelist(allow_guest=True)
 def update_file(filedata, doctype, docname):
 	file_name = None
@@ -225,5 +271,129 @@ def update_file(filedata, doctype, docname):
 				is_private=0
 			)
 			file_name = filedoc.file_url
-	frappe.db.commit()
 	return file_name
+
+def validate_upload_applicant(docname):
+	'''
+		Allow uploads only for an existing Job Applicant whose form is not submitted yet
+	'''
+	is_form_submitted = frappe.db.get_value('Job Applicant', docname, 'is_form_submitted')
+	if is_form_submitted is None:
+		frappe.throw(_('Sorry, couldn\'t find any matching Job Applicant'), frappe.PermissionError)
+	if cint(is_form_submitted):
+		frappe.throw(_('Sorry, Form is already Submitted'), frappe.PermissionError)
+
+def get_upload_dir():
+	upload_dir = frappe.get_site_path('private', 'job_application_uploads')
+	os.makedirs(upload_dir, exist_ok=True)
+	return upload_dir
+
+def get_upload_session(upload_id):
+	session = frappe.cache().get_value('{0}|{1}'.format(UPLOAD_SESSION_KEY, upload_id))
+	if not session:
+		frappe.throw(_('Upload session not found or expired, please select the file again'))
+	return session
+
+@frappe.whitelist(allow_guest=True)
+def start_upload(docname, filename, file_size, upload_id=None):
+	'''
+		Starts (or resumes, when upload_id is given) a chunked upload of a Job Applicant attachment.
+		Returns the upload id and the offset from which the next chunk is expected.
+	'''
+	validate_upload_applicant(docname)
+	max_file_size = cint(frappe.conf.get('max_file_size')) or 25 * 1024 * 1024
+	if cint(file_size) > max_file_size:
+		frappe.throw(_('File size exceeded the maximum allowed size of {0} MB').format(max_file_size / 1048576))
+
+	if upload_id:
+		session = get_upload_session(upload_id)
+		if session['docname'] == docname and session['filename'] == filename and session['file_size'] == cint(file_size):
+			return {'upload_id': upload_id, 'offset': os.path.getsize(session['path']) if os.path.exists(session['path']) else 0}
+
+	upload_id = frappe.generate_hash(length=20)
+	session = {
+		'docname': docname,
+		'filename': os.path.basename(filename),
+		'file_size': cint(file_size),
+		'path': os.path.join(get_upload_dir(), upload_id)
+	}
+	frappe.cache().set_value('{0}|{1}'.format(UPLOAD_SESSION_KEY, upload_id), session, expires_in_sec=UPLOAD_SESSION_EXPIRY)
+	return {'upload_id': upload_id, 'offset': 0}
+
+@frappe.whitelist(allow_guest=True)
+def upload_chunk(upload_id, offset):
+	'''
+		Appends the `chunk` file of the request to the upload, streaming it to disk.
+		A chunk sent for a different offset than the one received so far is ignored, and the expected offset is returned.
+	'''
+	session = get_upload_session(upload_id)
+	received = os.path.getsize(session['path']) if os.path.exists(session['path']) else 0
+	chunk = frappe.request.files.get('chunk')
+	if not chunk or cint(offset) != received:
+		return {'offset': received}
+
+	with open(session['path'], 'ab') as upload:
+		shutil.copyfileobj(chunk.stream, upload, UPLOAD_BUFFER_SIZE)
+
+	received = os.path.getsize(session['path'])
+	if received > session['file_size']:
+		os.remove(session['path'])
+		frappe.throw(_('Uploaded data exceeds the declared file size'))
+	return {'offset': received}
+
+@frappe.whitelist(allow_guest=True)
+def finish_upload(upload_id):
+	'''
+		Completes an upload: the file is deduplicated by content hash against the files of the Job Applicant,
+		otherwise saved as a private File, so its name, extension and size go through the File validations.
+		Returns the File id to be referenced in the form submission.
+	'''
+	session = get_upload_session(upload_id)
+	validate_upload_applicant(session['docname'])
+	if not os.path.exists(session['path']) or os.path.getsize(session['path']) != session['file_size']:
+		frappe.throw(_('Upload of {0} is incomplete').format(session['filename']))
+
+	content_type = mimetypes.guess_type(session['filename'])[0]
+	if content_type not in ALLOWED_MIMETYPES:
+		os.remove(session['path'])
+		frappe.cache().delete_value('{0}|{1}'.format(UPLOAD_SESSION_KEY, upload_id))
+		frappe.throw(_('You can only upload JPG, PNG, PDF, TXT or Microsoft documents.'))
+
+	with open(session['path'], 'rb') as upload:
+		content = upload.read()
+	os.remove(session['path'])
+	frappe.cache().delete_value('{0}|{1}'.format(UPLOAD_SESSION_KEY, upload_id))
+
+	existing_file = frappe.db.get_value(
+		'File',
+		{
+			'content_hash': hashlib.md5(content).hexdigest(),
+			'attached_to_doctype': 'Job Applicant',
+			'attached_to_name': session['docname']
+		},
+		'name'
+	)
+	if existing_file:
+		return {'file': existing_file}
+
+	file_doc = frappe.get_doc({
+		'doctype': 'File',
+		'file_name': session['filename'],
+		'content': content,
+		'attached_to_doctype': 'Job Applicant',
+		'attached_to_name': session['docname'],
+		'is_private': 1
+	})
+	file_doc.flags.ignore_permissions = True
+	file_doc.insert()
+	return {'file': file_doc.name}
+
+def clear_stale_uploads():
+	'''
+		Removes partial uploads whose session has expired
+	'''
+	upload_dir = get_upload_dir()
+	for upload_id in os.listdir(upload_dir):
+		path = os.path.join(upload_dir, upload_id)
+		if time.time() - os.path.getmtime(path) > UPLOAD_SESSION_EXPIRY:
+			os.remove(path)
@@ -1,63 +1,105 @@
+import hashlib
+
 import frappe
 from frappe.utils import fmt_money
 
+JOB_PORTAL_CACHE_KEY = "job_portal"
+JOB_PORTAL_CACHE_EXPIRY = 60 * 60
+
 def get_context(context):
 	context.no_cache = 1
 	# Get designation, location, and job_type from the request form data
 	designation, location, employment_type = frappe.form_dict.get('designation'), frappe.form_dict.get('location'), frappe.form_dict.get('employment_type')
 
+	filters = {
+		'designation': designation,
+		'location': location,
+		'employment_type': employment_type
+	}
+	listing = get_cached_listing(filters)
+
+	context.designations = listing.designations
+	context.job_locations = listing.job_locations
+	context.employment_types = listing.employment_types
+	context.jobs = listing.jobs
+	context.designation = designation
+	context.job_location = location
+	context.employment_type = employment_type
+
+	return {
+		"context": context
+	}
+
+def get_cached_listing(filters):
+	'''
+		Method to get the Job Openings and the filter options for a filter combination, cached until a Job Opening or Job Applicant changes
+	'''
+	filters_hash = hashlib.sha256(frappe.as_json(filters).encode()).hexdigest()
+	key = '{0}|{1}'.format(JOB_PORTAL_CACHE_KEY, filters_hash)
+	listing = frappe.cache().get_value(key)
+	if listing is None:
+		listing = frappe._dict({
+			'jobs': get_jobs(filters),
+			'designations': get_job_designation(),
+			'job_locations': get_job_locations(),
+			'employment_types': get_employment_types()
+		})
+		frappe.cache().set_value(key, listing, expires_in_sec=JOB_PORTAL_CACHE_EXPIRY)
+	return listing
+
+def clear_job_portal_cache(doc=None, method=None):
+	'''
+		Method to clear the cached Job Portal listings, triggered on Job Opening and Job Applicant changes
+	'''
+	frappe.cache().delete_keys(JOB_PORTAL_CACHE_KEY)
+
+def get_jobs(filters):
+	'''
+		Method to get the published open Job Openings with their applicant count and salary range
+	'''
 	conditions = ""
-	has_filter = False
 
 	# Check each filter value and add conditions to the list
-	if designation:
-		conditions += 'AND designation = "{0}"'.format(designation)
-		has_filter = True
-	if location:
-		conditions +='AND preffered_location = "{0}"'.format(location)
-		has_filter = True
-	if employment_type:
-		conditions +='AND employment_type = "{0}"'.format(employment_type)
-		has_filter = True
+	if filters.get('designation'):
+		conditions += ' AND jo.designation = %(designation)s'
+	if filters.get('location'):
+		conditions += ' AND jo.preffered_location = %(location)s'
+	if filters.get('employment_type'):
+		conditions += ' AND jo.employment_type = %(employment_type)s'
 
 	query = '''
 		SELECT
-			name,
-			job_title,
-			preffered_location as location,
-			designation,
-			employment_type,
-			publish_applications_received,
-			closes_on,
-			publish_salary_range
+			jo.name,
+			jo.job_title,
+			jo.preffered_location as location,
+			jo.designation,
+			jo.employment_type,
+			jo.publish_applications_received,
+			jo.closes_on,
+			jo.publish_salary_range,
+			jo.lower_range,
+			jo.upper_range,
+			jo.currency,
+			jo.salary_per,
+			COUNT(ja.name) as no_of_applications
 		FROM
-			`tabJob Opening`
+			`tabJob Opening` jo
+			LEFT JOIN `tabJob Applicant` ja
+				ON ja.job_title = jo.name
 		WHERE
-			publish = 1 AND
-			status = 'Open'
-	'''
-	if has_filter:
-		query += conditions
+			jo.publish = 1 AND
+			jo.status = 'Open'
+			{conditions}
+		GROUP BY
+			jo.name
+		ORDER BY
+			jo.creation DESC
+	'''.format(conditions=conditions)
 
-	# Sort by latest created job first
-	query += " ORDER BY creation DESC"
-
-	jobs = frappe.db.sql(query, as_dict=True)
+	jobs = frappe.db.sql(query, filters, as_dict=True)
 	for job in jobs:
-		job['no_of_applications'] = get_job_applicant_count(job.get('name'))
-		job['salary_range'] = get_salary_range(job.get('name'))
-
-	context.designations = get_job_designation()
-	context.job_locations = get_job_locations()
-	context.employment_types = get_employment_types()
-	context.jobs = jobs
-	context.designation = designation
-	context.job_location = location
-	context.employment_type = employment_type
-
-	return {
-		"context": context
-	}
+		job['salary_range'] = format_salary_range(job)
+	return jobs
 
 def get_job_designation():
 	'''
@@ -105,23 +147,28 @@ def get_job_applicant_count(job_opening):
 	'''
 		Method to get total Job Applicant Counts on the selected Job Opening
 	'''
-	applicants = frappe.db.get_all('Job Applicant', { 'job_title':job_opening })
-	return len(applicants)
+	return frappe.db.count('Job Applicant', { 'job_title':job_opening })
 
 def get_salary_range(job_opening):
 	'''
 		Method to get Salary Range for a Job Opening
 	'''
+	job = frappe.db.get_value('Job Opening', job_opening, ['lower_range', 'upper_range', 'currency', 'salary_per'], as_dict=True)
+	return format_salary_range(job) if job else ''
+
+def format_salary_range(job):
+	'''
+		Method to format the Salary Range from the salary fields of a Job Opening
+	'''
 	salary_range = ''
-	if frappe.db.exists('Job Opening', job_opening):
-		lower_range, upper_range = frappe.db.get_value('Job Opening', job_opening, ['lower_range', 'upper_range'])
-		currency , salary_per = frappe.db.get_value('Job Opening', job_opening, ['currency', 'salary_per'])
-		if currency:
-			if lower_range and upper_range:
-				salary_range = '{0} - {1}'.format(fmt_money(lower_range, 0, currency), fmt_money(upper_range, 0, currency))
-			if lower_range:
-				salary_range = '{0}'.format(fmt_money(lower_range, 0, currency))
-			if upper_range:
-				salary_range = '{0}'.format(fmt_money(upper_range, 0, currency))
-			salary_range += ' /{0}'.format(salary_per)
+	lower_range, upper_range = job.get('lower_range'), job.get('upper_range')
+	currency, salary_per = job.get('currency'), job.get('salary_per')
+	if currency:
+		if lower_range and upper_range:
+			salary_range = '{0} - {1}'.format(fmt_money(lower_range, 0, currency), fmt_money(upper_range, 0, currency))
+		if lower_range:
+			salary_range = '{0}'.format(fmt_money(lower_range, 0, currency))
+		if upper_range:
+			salary_range = '{0}'.format(fmt_money(upper_range, 0, currency))
+		salary_range += ' /{0}'.format(salary_per)
 	return salary_range